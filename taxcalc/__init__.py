@@ -4,12 +4,14 @@ Specify what is available to import from the taxcalc package.
 from taxcalc.calculator import *
 from taxcalc.consumption import *
 from taxcalc.data import *
-from taxcalc.decorators import iterate_jit, JIT
+from taxcalc.decorators import iterate_jit, JIT, KernelProfile, profile_kernels
 from taxcalc.growfactors import *
 from taxcalc.growdiff import *
 from taxcalc.parameters import *
 from taxcalc.policy import *
 from taxcalc.records import *
+from taxcalc.recordscache import *
+from taxcalc.sweep import *
 from taxcalc.taxcalcio import *
 from taxcalc.utils import *
 from taxcalc.cli import *
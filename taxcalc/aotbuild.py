@@ -0,0 +1,82 @@
+"""
+Build the optional ahead-of-time compiled bundle of the functions that the
+decorators.py module generates to apply the calcfunctions.py functions to
+all the filing units, so that a new Python process can do its first tax
+calculations without waiting for numba to JIT-compile those functions.
+
+The bundle is built in the taxcalc package directory by executing:
+  python -m taxcalc.aotbuild
+and needs to be rebuilt whenever calcfunctions.py is changed, because the
+functions generated from a changed calcfunctions.py have different names
+and are, therefore, JIT-compiled rather than found in an outdated bundle.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle aotbuild.py
+# pylint --disable=locally-disabled aotbuild.py
+
+import os
+import sys
+import json
+import pandas as pd
+from numba.pycc import CC
+from taxcalc import decorators
+from taxcalc.policy import Policy
+from taxcalc.records import Records
+from taxcalc.calculator import Calculator
+
+
+def build_aot_bundle(output_dir=None):
+    """
+    Compile into an extension module (and write the argument types of its
+    functions to a JSON file) each generated function for the argument
+    types that are used by the Records and Policy classes.
+
+    Parameters
+    ----------
+    output_dir: None or string
+        directory in which the bundle files are written; None implies the
+        taxcalc package directory, which is where decorators.py looks for
+        the bundle.
+
+    Returns
+    -------
+    list of names of the functions in the bundle
+    """
+    if decorators.JIT is decorators.id_wrapper:
+        raise ValueError('cannot build bundle when NOTAXCALCJIT is set')
+    if output_dir is None:
+        output_dir = os.path.dirname(decorators.__file__)
+    # jit every generated function for the argument types of the Records
+    # variables and Policy parameters by doing the calculations for a
+    # one-record sample, with and without the fused kernel
+    decorators.USE_AOT_BUNDLE = False
+    recs = Records(data=pd.DataFrame({'RECID': [1], 'MARS': [1]}),
+                   start_year=Policy.JSON_START_YEAR,
+                   gfactors=None, weights=None)
+    for fused_kernel in [False, True]:
+        calc = Calculator(policy=Policy(), records=recs,
+                          fused_kernel=fused_kernel, parallel=False)
+        calc.calc_all()
+    # compile those functions ahead of time
+    bundle = CC(decorators.AOT_BUNDLE_NAME)
+    bundle.output_dir = output_dir
+    arg_types = {}
+    for dispatcher in decorators.GENERATED_DISPATCHERS:
+        name = dispatcher.py_func.generated_name
+        signatures = [cres.signature
+                      for cres in dispatcher.overloads.values()]
+        if name in arg_types or len(signatures) != 1:
+            continue
+        bundle.export(name, signatures[0])(dispatcher.py_func)
+        arg_types[name] = [str(argtype) for argtype in signatures[0].args]
+    bundle.compile()
+    types_path = os.path.join(output_dir,
+                              decorators.AOT_BUNDLE_NAME + '.json')
+    with open(types_path, 'w', encoding='utf-8') as tfile:
+        json.dump(arg_types, tfile, indent=1, sort_keys=True)
+    return sorted(arg_types)
+
+
+if __name__ == '__main__':
+    NAMES = build_aot_bundle()
+    sys.stdout.write(f'compiled {len(NAMES)} functions into bundle\n')
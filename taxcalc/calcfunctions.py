@@ -20,11 +20,11 @@ indexing).
 # pylint: disable=too-many-locals
 
 import math
-import copy
 import numpy as np
-from taxcalc.decorators import iterate_jit, JIT
+from taxcalc.decorators import iterate_jit, JIT, profiled
 
 
+@profiled
 def BenefitPrograms(calc):
     """
     Calculate total government cost and consumption value of benefits
@@ -3619,6 +3619,7 @@ def Taxes(income, MARS, tbrk_base,
             rate8 * max(0., income - brk7))
 
 
+@profiled
 def ComputeBenefit(calc, ID_switch):
     """
     Calculates the value of the benefits accrued from itemizing.
@@ -3637,27 +3638,21 @@ def ComputeBenefit(calc, ID_switch):
     """
     # compute income tax liability with no itemized deductions allowed for
     # the types of itemized deductions covered under the BenefitSurtax
-    no_ID_calc = copy.deepcopy(calc)
-    if ID_switch[0]:
-        no_ID_calc.policy_param('ID_Medical_hc', [1.])
-    if ID_switch[1]:
-        no_ID_calc.policy_param('ID_StateLocalTax_hc', [1.])
-    if ID_switch[2]:
-        no_ID_calc.policy_param('ID_RealEstate_hc', [1.])
-    if ID_switch[3]:
-        no_ID_calc.policy_param('ID_Casualty_hc', [1.])
-    if ID_switch[4]:
-        no_ID_calc.policy_param('ID_Miscellaneous_hc', [1.])
-    if ID_switch[5]:
-        no_ID_calc.policy_param('ID_InterestPaid_hc', [1.])
-    if ID_switch[6]:
-        no_ID_calc.policy_param('ID_Charity_hc', [1.])
-    no_ID_calc._calc_one_year()  # pylint: disable=protected-access
+    # (using a Calculator object that shares its inputs with calc)
+    hc_names = ['ID_Medical_hc', 'ID_StateLocalTax_hc', 'ID_RealEstate_hc',
+                'ID_Casualty_hc', 'ID_Miscellaneous_hc', 'ID_InterestPaid_hc',
+                'ID_Charity_hc']
+    no_ID_params = {hc_name: [1.]
+                    for hc_name, switch in zip(hc_names, ID_switch) if switch}
+    # pylint: disable=protected-access
+    no_ID_calc = calc._overlay(no_ID_params)
+    no_ID_calc._calc_one_year()
     diff_iitax = no_ID_calc.array('iitax') - calc.array('iitax')
     benefit = np.where(diff_iitax > 0., diff_iitax, 0.)
     return benefit
 
 
+@profiled
 def BenefitSurtax(calc):
     """
     Computes itemized-deduction-benefit surtax and adds the surtax amount
@@ -3689,6 +3684,7 @@ def BenefitSurtax(calc):
         calc.incarray('surtax', ben_surtax)
 
 
+@profiled
 def BenefitLimitation(calc):
     """
     Limits the benefits of select itemized deductions to a fraction of
@@ -8,6 +8,7 @@ Tax-Calculator federal income and payroll tax Calculator class.
 # pylint: disable=too-many-lines,no-value-for-parameter
 
 import copy
+import collections
 import numpy as np
 import pandas as pd
 import paramtools
@@ -30,8 +31,16 @@ from taxcalc.records import Records
 from taxcalc.consumption import Consumption
 from taxcalc.growdiff import GrowDiff
 from taxcalc.growfactors import GrowFactors
+from taxcalc.decorators import (fused_jit, parallel_apply, PARALLEL,
+                                vectorized_apply, VECTORIZED,
+                                KernelProfile, profile_kernels,
+                                kernel_variables)
 from taxcalc.utils import (DIST_VARIABLES, create_distribution_table,
                            DIFF_VARIABLES, create_difference_table,
+                           DIST_TABLE_COLUMNS,
+                           create_distribution_table_from_sums,
+                           create_difference_table_from_sums,
+                           STANDARD_INCOME_BINS, SOI_AGI_BINS,
                            create_diagnostic_table,
                            ce_aftertax_expanded_income,
                            mtr_graph_data, atr_graph_data, xtr_graph_plot,
@@ -39,6 +48,124 @@ from taxcalc.utils import (DIST_VARIABLES, create_distribution_table,
 # import pdb
 
 
+INCOME_TO_STDDED_FUNCTIONS = [EI_PayrollTax, DependentCare, Adj,
+                              ALD_InvInc_ec_base, CapGains, SSBenefits, AGI,
+                              ItemDedCap, ItemDed, AdditionalMedicareTax,
+                              StdDed]
+CREDITS_TO_IITAX_FUNCTIONS = [F2441, EITC, RefundablePayrollTaxCredit,
+                              PersonalTaxCredit, AmOppCreditParts, SchR,
+                              EducationTaxCredit, CharityCredit,
+                              ChildDepTaxCredit, NonrefundableCredits,
+                              AdditionalCTC, C1040, CTC_new, IITAX]
+ITEMDED_VARIABLES = ['c04470', 'c21060', 'c21040']
+ITEMDED_COMPONENT_VARIABLES = ['c17000', 'c18300', 'c19200',
+                               'c19700', 'c20500', 'c20800']
+TAXINC_TO_AMT_FUNCTIONS = [TaxInc, SchXYZTax, GainsTax,
+                           AGIsurtax, NetInvIncTax, AMT]
+# Variables calculated by the TAXINC_TO_AMT_FUNCTIONS before AMT, whose
+# values do not depend on the itemized deduction components, so that their
+# values for the chosen deduction are those calculated for that deduction
+TAXINC_TO_NIIT_VARIABLES = ['c04800', 'qbided', 'c05200', 'dwks10',
+                            'dwks13', 'dwks14', 'dwks19', 'dwks43',
+                            'c05700', 'taxbc', 'niit']
+
+
+def _assign(target, value, names):
+    """
+    Return string of code that contains an assignment statement for each
+    variable name in names, where the target and value strings of each
+    statement are formatted with the variable name.
+    """
+    return '\n'.join(target.format(name) + ' = ' + value.format(name)
+                     for name in names)
+
+
+# Steps of the fused function (see fused_jit in decorators.py) that does,
+# one filing unit at a time, all the calculations done by _calc_one_year,
+# including the choice between the standard and itemized deductions,
+# which keeps the deduction amounts in local variables with a _kept suffix
+# and the standard-deduction values of the TAXINC_TO_NIIT_VARIABLES in
+# local variables with a _std suffix
+CALC_ONE_YEAR_STEPS = (
+    INCOME_TO_STDDED_FUNCTIONS +
+    # calculate taxes with standard deduction
+    [_assign('{}_kept', '{}', (['standard'] + ITEMDED_VARIABLES +
+                               ITEMDED_COMPONENT_VARIABLES)),
+     _assign('{}', '0.', ITEMDED_VARIABLES + ITEMDED_COMPONENT_VARIABLES)] +
+    TAXINC_TO_AMT_FUNCTIONS +
+    # calculate taxes with itemized deduction
+    ['std_taxes_kept = c05800\nstandard = 0.',
+     _assign('{}_std', '{}', TAXINC_TO_NIIT_VARIABLES),
+     _assign('{}', '{}_kept', ITEMDED_VARIABLES)] +
+    TAXINC_TO_AMT_FUNCTIONS +
+    # complete taxes with the deduction that minimizes taxes
+    [('c05800 < std_taxes_kept',
+      ['standard = 0.',
+       _assign('{}', '{}_kept',
+               ITEMDED_VARIABLES + ITEMDED_COMPONENT_VARIABLES)],
+      ['standard = standard_kept',
+       _assign('{}', '0.', ITEMDED_VARIABLES + ITEMDED_COMPONENT_VARIABLES),
+       _assign('{}', '{}_std', TAXINC_TO_NIIT_VARIABLES)]),
+     'taxbc_kept = taxbc', AGIsurtax, 'taxbc = taxbc_kept', AMT] +
+    CREDITS_TO_IITAX_FUNCTIONS
+)
+# pylint: disable-next=invalid-name
+CALC_ONE_YEAR_FUSED = fused_jit(CALC_ONE_YEAR_STEPS)
+
+# A stage of the calculations done by the calc_all method, which calls
+# function with arguments and which reads the Records variables named in
+# the inputs set and writes those named in the outputs set
+Stage = collections.namedtuple(
+    'Stage', ['function', 'arguments', 'inputs', 'outputs']
+)
+
+
+def _stages_to_rerun(stages, changed):
+    """
+    Return list of the stages that must be called again, in the order of
+    the stages list, to update the results of all the stages after the
+    values of the variables in the changed set have changed.
+
+    These are the stages that read a changed variable or a variable that
+    is written by one of these stages, plus the stages that must also be
+    called so that each of the stages reads the same values it would read
+    and leaves the same values it would leave if all the stages were
+    called again (for example, the earlier stages that write a variable
+    that a stage adds to).
+    """
+    rerun = set()
+    dirty = set(changed)
+    for idx, stage in enumerate(stages):
+        if stage.inputs & dirty:
+            rerun.add(idx)
+            dirty |= stage.outputs
+    writers = collections.defaultdict(list)
+    for idx, stage in enumerate(stages):
+        for name in stage.outputs:
+            writers[name].append(idx)
+    while True:
+        needed = set()
+        for idx in rerun:
+            # a stage reads the value written by the last earlier writer,
+            # which is not the value in the array after the calls when the
+            # stage or a later stage writes the variable or when another
+            # earlier writer is called again
+            for name in stages[idx].inputs:
+                earlier = [wdx for wdx in writers[name] if wdx < idx]
+                if earlier and (writers[name][-1] >= idx or
+                                any(wdx in rerun for wdx in earlier)):
+                    needed.add(earlier[-1])
+            # the last writer of a variable must be called again for the
+            # array to hold its final value after the calls
+            for name in stages[idx].outputs:
+                needed.add(writers[name][-1])
+        needed -= rerun
+        if not needed:
+            break
+        rerun |= needed
+    return [stage for idx, stage in enumerate(stages) if idx in rerun]
+
+
 class Calculator():
     """
     Constructor for the Calculator class.
@@ -68,6 +195,38 @@ class Calculator():
         consumption values specified implying consumption value is equal to
         government cost of providing the in-kind benefits
 
+    fused_kernel: boolean
+        specifies whether or not the calculations done for each filing unit
+        by the calc_all method (except those done before and after the main
+        income tax calculations) are done in a single pass over the filing
+        units by one compiled function; default value is false, which
+        implies each calc-style function makes its own pass over the
+        filing units.  Both ways produce exactly the same results.
+
+    parallel: None or boolean
+        specifies whether or not the calc_all method loops over the filing
+        units in parallel threads; default value is None, which implies
+        looping in parallel only when the TAXCALCPARALLEL environment
+        variable is set.  Parallel and serial looping produce exactly the
+        same results.
+
+    vectorized: None or boolean
+        specifies whether or not the calc_all method does the calculations
+        of each calc-style function for all filing units at once using
+        NumPy operations on whole arrays instead of looping over the filing
+        units; default value is None, which implies vectorized calculations
+        only when the NOTAXCALCJIT environment variable is set.  This is
+        much faster than looping over the filing units when numba is not
+        used and produces the same results.
+
+    profile: boolean
+        specifies whether or not the calc_all method records the number of
+        calls, the wall-clock time, the number of filing units, and the
+        bytes of argument arrays of each tax-calculation function it calls,
+        which are accumulated across calc_all calls and are returned by the
+        kernel_profile property; default value is false, which implies no
+        recording and no recording overhead.
+
     Raises
     ------
     ValueError:
@@ -89,10 +248,11 @@ class Calculator():
     All calculations are done on the internal copies of the Policy and
     Records objects passed to each of the two Calculator constructors.
     """
-    # pylint: disable=too-many-public-methods
+    # pylint: disable=too-many-public-methods,too-many-instance-attributes
 
     def __init__(self, policy=None, records=None, verbose=False,
-                 sync_years=True, consumption=None):
+                 sync_years=True, consumption=None, fused_kernel=False,
+                 parallel=None, vectorized=None, profile=False):
         # pylint: disable=too-many-arguments,too-many-positional-arguments
         # pylint: disable=too-many-branches
         if isinstance(policy, Policy):
@@ -138,7 +298,16 @@ class Calculator():
                       'extrapolate your data.')
         assert self.__policy.current_year == self.__records.current_year
         assert self.__policy.current_year == self.__consumption.current_year
+        self.__fused_kernel = fused_kernel
+        if parallel is None:
+            parallel = PARALLEL
+        self.__parallel = bool(parallel)
+        if vectorized is None:
+            vectorized = VECTORIZED
+        self.__vectorized = bool(vectorized)
+        self.__profile = KernelProfile() if profile else None
         self.__stored_records = None
+        self.__records_buffers = {}
 
     def increment_year(self):
         """
@@ -149,34 +318,192 @@ class Calculator():
         self.__policy.set_year(next_year)
         self.__consumption.set_year(next_year)
 
-    def advance_to_year(self, year):
+    def advance_to_year(self, year, direct=False):
         """
         The advance_to_year function gives an optional way of implementing
         increment year functionality by immediately specifying the year
         as input.  New year must be at least the current year.
+        When direct is True, the embedded Records object is extrapolated
+        to the new year in one pass using the cumulative growth factors
+        of all the years (see Records.increment_year) rather than in one
+        pass for each year, which gives the same results except for
+        floating-point rounding.
         """
         iteration = year - self.current_year
         if iteration < 0:
             raise ValueError('New current year must be ' +
                              'greater than or equal to current year!')
-        for _ in range(iteration):
-            self.increment_year()
+        if direct and iteration > 0:
+            self.__records.increment_year(iteration)
+            self.__policy.set_year(year)
+            self.__consumption.set_year(year)
+        else:
+            for _ in range(iteration):
+                self.increment_year()
         assert self.current_year == year
 
-    def calc_all(self, zero_out_calc_vars=False):
+    def calc_all(self, zero_out_calc_vars=False, changed=None, rows=None):
         """
         Call all tax-calculation functions for the current_year.
+
+        Parameters
+        ----------
+        zero_out_calc_vars: boolean
+            specifies whether or not the calculated variables are set to
+            zero before the income tax calculations.
+
+        changed: None or collection of strings
+            specifies the names of the Records variables whose values have
+            changed since the results of a calc_all() call for the
+            current_year and policy, in which case only the functions that
+            depend on those variables are called again, which produces the
+            same results as calling all the functions; default value is
+            None, which implies all the functions are called.
+
+        rows: None or slice or numpy array
+            specifies the filing units for which the calculations are done
+            as a slice, boolean mask, or integer index array (see the
+            Records row_subset method), leaving the calculated variables of
+            the other filing units unchanged; default value is None, which
+            implies all filing units.  Only a slice with a step
+            of one (or a mask or index array that selects consecutive
+            filing units) avoids copying the Records arrays; other rows
+            imply copying the values of the selected filing units of the
+            variables used by the calculations, which is faster than
+            calculating for all filing units only when few are selected.
+
+        Notes
+        -----
+        The arguments zero_out_calc_vars and changed cannot both be used.
         """
+        assert not zero_out_calc_vars or changed is None
+        if rows is not None:
+            self._calc_all_rows(rows, zero_out_calc_vars, changed)
+            return
+        stages = self._calc_all_stages(zero_out_calc_vars)
+        if changed is not None:
+            stages = _stages_to_rerun(stages, changed)
         # conducts static analysis of Calculator object for current_year
-        UBI(self.__policy, self.__records)
-        BenefitPrograms(self)
-        self._calc_one_year(zero_out_calc_vars)
-        BenefitSurtax(self)
-        BenefitLimitation(self)
-        FairShareTax(self.__policy, self.__records)
-        LumpSumTax(self.__policy, self.__records)
-        ExpandIncome(self.__policy, self.__records)
-        AfterTaxIncome(self.__policy, self.__records)
+        with parallel_apply(self.__parallel), \
+                vectorized_apply(self.__vectorized), \
+                profile_kernels(self.__profile):
+            for stage in stages:
+                stage.function(*stage.arguments)
+
+    @staticmethod
+    def calc_chunks(policy, records_chunks, year=None, **kwargs):
+        """
+        Generator that returns, one at a time, a Calculator object for each
+        of the Records objects in records_chunks after calling its
+        calc_all() method for the specified year, so that input data that
+        do not fit in memory can be processed one block of records at a
+        time.  Only one block of records is held by the generator at any
+        time, so the returned Calculator objects should be discarded after
+        their results have been used (for example, by adding them to a
+        ChunkTotals object).
+
+        Parameters
+        ----------
+        policy: Policy class object
+            used for every block of records
+
+        records_chunks: iterable of Records class objects
+            typically the generator returned by Records.read_chunks()
+
+        year: None or integer
+            calendar year for which taxes are calculated; default value is
+            None, which implies the current year of the Calculator objects
+
+        kwargs: dictionary
+            other arguments of the Calculator class constructor
+
+        Returns
+        -------
+        generator of Calculator class objects
+        """
+        for records in records_chunks:
+            calc = Calculator(policy=policy, records=records, **kwargs)
+            del records
+            if year is not None:
+                calc.advance_to_year(year)
+            calc.calc_all()
+            yield calc
+
+    @staticmethod
+    def calc_batch(policies, records, year, variable_list,
+                   dataframe=False, **kwargs):
+        """
+        Calculate taxes for the specified year under each of several
+        policies using the same records and return the values of the
+        listed variables for each policy.
+
+        The records are copied and extrapolated to the specified year only
+        once, rather than once for each policy as when a Calculator object
+        is constructed for each policy.  The calculations for each policy
+        share the extrapolated Records input arrays and have their own
+        copies of only the Records arrays that are written by the
+        calc_all() method, which are discarded after the listed variables
+        have been saved.  The results are exactly the same as those of a
+        Calculator object constructed for each policy.
+
+        Parameters
+        ----------
+        policies: list of Policy class objects
+            each object is copied for internal use
+
+        records: Records class object
+            this object is copied once for internal use
+
+        year: integer
+            calendar year for which taxes are calculated
+
+        variable_list: list of strings
+            names of the Records variables whose values are returned
+
+        dataframe: boolean
+            specifies whether the results are returned as a long-format
+            Pandas DataFrame or as a numpy ndarray; default value is false.
+
+        kwargs: dictionary
+            other arguments of the Calculator class constructor
+
+        Returns
+        -------
+        When dataframe is false, a numpy ndarray with shape
+        (len(policies), len(variable_list), number of filing units) that
+        contains the value of each listed variable for each filing unit
+        under each policy.  When dataframe is true, a Pandas DataFrame that
+        contains a row for each filing unit under each policy and that has
+        a 'policy' column containing the index of the policy in policies
+        followed by a column for each listed variable.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=protected-access
+        assert isinstance(variable_list, list)
+        if not policies:
+            raise ValueError('policies contains no Policy objects')
+        for policy in policies:
+            if not isinstance(policy, Policy):
+                raise ValueError('policies contains a non-Policy object')
+        base = Calculator(policy=policies[0], records=records, **kwargs)
+        base.advance_to_year(year)
+        results = np.empty((len(policies), len(variable_list),
+                            base.array_len))
+        for idx, policy in enumerate(policies):
+            calc = base._with_policy(policy)
+            calc.calc_all()
+            for vdx, varname in enumerate(variable_list):
+                results[idx, vdx] = calc.array(varname)
+            del calc
+        if not dataframe:
+            return results
+        dframe = pd.DataFrame(
+            data=results.transpose(0, 2, 1).reshape(-1, len(variable_list)),
+            columns=variable_list
+        )
+        dframe.insert(0, 'policy',
+                      np.repeat(np.arange(len(policies)), base.array_len))
+        return dframe
 
     def weighted_total(self, variable_name):
         """
@@ -251,23 +578,61 @@ class Calculator():
 
     def store_records(self):
         """
-        Make internal copy of embedded Records object that can then be
-        restored after interim calculations that make temporary changes
-        to the embedded Records object.
+        Save the state of the embedded Records object so that it can be
+        restored by calling the restore_records() method after interim
+        calculations that make temporary changes to the embedded Records
+        object.  The values of the arrays that the calculations change in
+        place (the calculated variables and the consumption response
+        variables) are copied into buffers that are reused by later calls;
+        all the other attributes are saved by reference because interim
+        calculations replace, rather than change in place, the other arrays.
         """
         assert self.__stored_records is None
-        self.__stored_records = copy.deepcopy(self.__records)
+        changing_vars = (self.__records.CALCULATED_VARS |
+                         Consumption.RESPONSE_VARS)
+        # arrays mapped read-only from NPY files cannot be restored in place
+        # pylint: disable=protected-access
+        self.__records._unmap(changing_vars)
+        attributes = dict(vars(self.__records))
+        for name in changing_vars:
+            value = attributes.get(name)
+            if value is None:
+                continue
+            buffer = self.__records_buffers.get(name)
+            if (buffer is None or buffer.shape != value.shape or
+                    buffer.dtype != value.dtype):
+                buffer = np.empty_like(value)
+                self.__records_buffers[name] = buffer
+            np.copyto(buffer, value)
+        self.__stored_records = attributes
 
     def restore_records(self):
         """
-        Set the embedded Records object to the stored Records object
-        that was saved in the last call to the store_records() method.
+        Restore the state of the embedded Records object that was saved in
+        the last call to the store_records() method.  The arrays that were
+        changed in place are restored in place, so any reference to one of
+        them obtained during the interim calculations refers to restored
+        values after this call.
         """
-        assert isinstance(self.__stored_records, Records)
-        self.__records = copy.deepcopy(self.__stored_records)
-        del self.__stored_records
+        assert isinstance(self.__stored_records, dict)
+        attributes = self.__stored_records
+        for name, buffer in self.__records_buffers.items():
+            if name in attributes:
+                np.copyto(attributes[name], buffer)
+        record_attributes = vars(self.__records)
+        record_attributes.clear()
+        record_attributes.update(attributes)
         self.__stored_records = None
 
+    @property
+    def kernel_profile(self):
+        """
+        KernelProfile object containing the statistics recorded by the
+        calc_all method when Calculator was created with profile=True;
+        otherwise None.
+        """
+        return self.__profile
+
     @property
     def array_len(self):
         """
@@ -539,6 +904,14 @@ class Calculator():
                            'e19800', 'e20100',
                            'k1bx14p']
 
+    # variables that include an MTR variable and so are increased with it
+    MTR_AGGREGATE_VARIABLES = {'e00200p': ['e00200'],
+                               'e00200s': ['e00200'],
+                               'e00900p': ['e00900'],
+                               'e00650': ['e00600'],
+                               'e26270': ['e02000'],
+                               'k1bx14p': ['e02000', 'e26270']}
+
     def mtr(self, variable_str='e00200p',
             negative_finite_diff=False,
             zero_out_calculated_vars=False,
@@ -585,7 +958,9 @@ class Calculator():
             specifies whether self has already had its Calculor.calc_all()
             method called, in which case this method will not do a final
             calc_all() call but use the incoming embedded Records object
-            as the outgoing Records object embedding in self.
+            as the outgoing Records object embedding in self, and will do
+            again only the calculations that depend on variable_str when
+            calculating the taxes after its marginal increase.
 
         wrt_full_compensation: boolean
             specifies whether or not marginal tax rates on earned income
@@ -627,116 +1002,93 @@ class Calculator():
         'k1bx14p', Partnership income (also included in e26270 and e02000).
         """
         # pylint: disable=too-many-arguments,too-many-positional-arguments
-        # pylint: disable=too-many-locals,too-many-branches,too-many-statements
         assert not zero_out_calculated_vars or not calc_all_already_called
         # check validity of variable_str parameter
         if variable_str not in Calculator.MTR_VALID_VARIABLES:
             msg = 'mtr variable_str="{}" is not valid'
             raise ValueError(msg.format(variable_str))
-        # specify value for finite_diff parameter
-        finite_diff = 0.01  # a one-cent difference
-        if negative_finite_diff:
-            finite_diff *= -1.0
-        # remember records object in order to restore it after mtr computations
-        self.store_records()
-        # extract variable array(s) from embedded records object
-        variable = self.array(variable_str)
-        if variable_str == 'e00200p':
-            earnings_var = self.array('e00200')
-        elif variable_str == 'e00200s':
-            earnings_var = self.array('e00200')
-        elif variable_str == 'e00900p':
-            seincome_var = self.array('e00900')
-        elif variable_str == 'e00650':
-            divincome_var = self.array('e00600')
-        elif variable_str == 'e26270':
-            scheincome_var = self.array('e02000')
-        elif variable_str == 'k1bx14p':
-            scheincome_var = self.array('e02000')
-            scorpincome_var = self.array('e26270')
+        finite_diff = Calculator._mtr_finite_diff(negative_finite_diff)
         # calculate level of taxes after a marginal increase in income
-        self.array(variable_str, variable + finite_diff)
-        if variable_str == 'e00200p':
-            self.array('e00200', earnings_var + finite_diff)
-        elif variable_str == 'e00200s':
-            self.array('e00200', earnings_var + finite_diff)
-        elif variable_str == 'e00900p':
-            self.array('e00900', seincome_var + finite_diff)
-        elif variable_str == 'e00650':
-            self.array('e00600', divincome_var + finite_diff)
-        elif variable_str == 'e26270':
-            self.array('e02000', scheincome_var + finite_diff)
-        elif variable_str == 'k1bx14p':
-            self.array('e02000', scheincome_var + finite_diff)
-            self.array('e26270', scorpincome_var + finite_diff)
-        if self.__consumption.has_response():
-            self.__consumption.response(self.__records, finite_diff)
-        self.calc_all(zero_out_calc_vars=zero_out_calculated_vars)
-        payrolltax_chng = self.array('payrolltax')
-        incometax_chng = self.array('iitax')
-        combined_taxes_chng = incometax_chng + payrolltax_chng
+        taxes_chng = self._mtr_perturbed_taxes(variable_str, finite_diff,
+                                               zero_out_calculated_vars,
+                                               calc_all_already_called)
         # calculate base level of taxes after restoring records object
-        self.restore_records()
         if not calc_all_already_called or zero_out_calculated_vars:
             self.calc_all(zero_out_calc_vars=zero_out_calculated_vars)
-        payrolltax_base = self.array('payrolltax')
-        incometax_base = self.array('iitax')
-        combined_taxes_base = incometax_base + payrolltax_base
-        # compute marginal changes in combined tax liability
-        payrolltax_diff = payrolltax_chng - payrolltax_base
-        incometax_diff = incometax_chng - incometax_base
-        combined_diff = combined_taxes_chng - combined_taxes_base
-        # specify optional adjustment for employer (er) OASDI+HI payroll taxes
-        mtr_on_earnings = variable_str in ('e00200p', 'e00200s')
-        if wrt_full_compensation and mtr_on_earnings:
-            oasdi_taxed = np.logical_or(
-                variable < self.policy_param('SS_Earnings_c'),
-                variable >= self.policy_param('SS_Earnings_thd')
-            )
-            adj = np.where(oasdi_taxed,
-                           0.5 * (self.policy_param('FICA_ss_trt_employer') +
-                                  self.policy_param('FICA_ss_trt_employee') +
-                                  self.policy_param('FICA_mc_trt_employer') +
-                                  self.policy_param('FICA_mc_trt_employee')),
-                           0.5 * (self.policy_param('FICA_mc_trt_employer') +
-                                  self.policy_param('FICA_mc_trt_employee')))
-        else:
-            adj = 0.0
-        # compute marginal tax rates
-        mtr_payrolltax = payrolltax_diff / (finite_diff * (1.0 + adj))
-        mtr_incometax = incometax_diff / (finite_diff * (1.0 + adj))
-        mtr_combined = combined_diff / (finite_diff * (1.0 + adj))
-        # if variable_str is e00200s, set MTR to NaN for units without a spouse
-        if variable_str == 'e00200s':
-            mars = self.array('MARS')
-            mtr_payrolltax = np.where(mars == 2, mtr_payrolltax, np.nan)
-            mtr_incometax = np.where(mars == 2, mtr_incometax, np.nan)
-            mtr_combined = np.where(mars == 2, mtr_combined, np.nan)
-        # delete intermediate variables
-        del variable
-        if variable_str in ('e00200p', 'e00200s'):
-            del earnings_var
-        elif variable_str == 'e00900p':
-            del seincome_var
-        elif variable_str == 'e00650':
-            del divincome_var
-        elif variable_str == 'e26270':
-            del scheincome_var
-        elif variable_str == 'k1bx14p':
-            del scheincome_var
-            del scorpincome_var
-        del payrolltax_chng
-        del incometax_chng
-        del combined_taxes_chng
-        del payrolltax_base
-        del incometax_base
-        del combined_taxes_base
-        del payrolltax_diff
-        del incometax_diff
-        del combined_diff
-        del adj
-        # return the three marginal tax rate arrays
-        return (mtr_payrolltax, mtr_incometax, mtr_combined)
+        taxes_base = (self.array('payrolltax'), self.array('iitax'))
+        return self._mtr_rates(variable_str, finite_diff,
+                               wrt_full_compensation,
+                               taxes_chng, taxes_base)
+
+    def mtrs(self, variables=None,
+             negative_finite_diff=False,
+             zero_out_calculated_vars=False,
+             calc_all_already_called=False,
+             wrt_full_compensation=True):
+        """
+        Calculates the marginal payroll, individual income, and combined
+        tax rates for every tax filing unit with respect to each of several
+        variables, leaving the Calculator object in exactly the same state
+        as it would be in after a calc_all() call.
+
+        The result for each variable is the same as the result of calling
+        the mtr() method with that variable_str and with the other arguments
+        of this method, but the base level of taxes is calculated only once
+        (or not at all when calc_all_already_called is true) rather than
+        once for each variable, and the level of taxes after the increase
+        in each variable is calculated by doing again only the calculations
+        that depend on that variable (see the changed argument of the
+        calc_all() method) unless zero_out_calculated_vars is true.
+
+        Parameters
+        ----------
+        variables: list of strings or None
+            specifies the variables for which marginal tax rates are
+            computed; None implies all the Calculator.MTR_VALID_VARIABLES.
+
+        negative_finite_diff: boolean
+            see documentation of Calculator.mtr() method.
+
+        zero_out_calculated_vars: boolean
+            see documentation of Calculator.mtr() method.
+
+        calc_all_already_called: boolean
+            see documentation of Calculator.mtr() method.
+
+        wrt_full_compensation: boolean
+            see documentation of Calculator.mtr() method.
+
+        Returns
+        -------
+        A dictionary indexed by variable containing, for each variable,
+        the (mtr_payrolltax, mtr_incometax, mtr_combined) tuple of numpy
+        arrays returned by the Calculator.mtr() method.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        assert not zero_out_calculated_vars or not calc_all_already_called
+        if variables is None:
+            variables = Calculator.MTR_VALID_VARIABLES
+        # check validity of variables parameter
+        for variable_str in variables:
+            if variable_str not in Calculator.MTR_VALID_VARIABLES:
+                msg = 'mtrs variable "{}" is not valid'
+                raise ValueError(msg.format(variable_str))
+        finite_diff = Calculator._mtr_finite_diff(negative_finite_diff)
+        # calculate base level of taxes once for all the variables
+        if not calc_all_already_called or zero_out_calculated_vars:
+            self.calc_all(zero_out_calc_vars=zero_out_calculated_vars)
+        taxes_base = (self.array('payrolltax').copy(),
+                      self.array('iitax').copy())
+        # calculate level of taxes after a marginal increase in each variable
+        mtrs = {}
+        for variable_str in variables:
+            taxes_chng = self._mtr_perturbed_taxes(variable_str, finite_diff,
+                                                   zero_out_calculated_vars,
+                                                   incremental=True)
+            mtrs[variable_str] = self._mtr_rates(variable_str, finite_diff,
+                                                 wrt_full_compensation,
+                                                 taxes_chng, taxes_base)
+        return mtrs
 
     def mtr_graph(self, calc,
                   mars='ALL',
@@ -1362,6 +1714,271 @@ class Calculator():
 
     # ----- begin private methods of Calculator class -----
 
+    @staticmethod
+    def _mtr_finite_diff(negative_finite_diff):
+        """
+        Return the small change in an MTR variable used to compute the
+        marginal tax rates.
+        """
+        finite_diff = 0.01  # a one-cent difference
+        if negative_finite_diff:
+            finite_diff *= -1.0
+        return finite_diff
+
+    def _mtr_perturbed_taxes(self, variable_str, finite_diff,
+                             zero_out_calculated_vars, incremental=False):
+        """
+        Return (payrolltax, iitax) tuple of arrays calculated after adding
+        finite_diff to the variable_str variable (and to the variables that
+        include it), leaving the embedded Records object in the same state
+        as it was before this method was called.  When incremental is true,
+        the embedded Records object contains the results of a calc_all()
+        call, so only the calculations that depend on the changed variables
+        are done again.
+        """
+        # remember records object in order to restore it after computations
+        self.store_records()
+        changed = ([variable_str] +
+                   Calculator.MTR_AGGREGATE_VARIABLES.get(variable_str, []))
+        for name in changed:
+            # the sum is float64 even when the variable is stored as float32
+            # (see Records compact argument), which is too coarse for one cent
+            self.array(name, np.add(self.array(name), finite_diff,
+                                    dtype=np.float64))
+        if self.__consumption.has_response():
+            self.__consumption.response(self.__records, finite_diff)
+            changed.extend(Consumption.RESPONSE_VARS)
+        if incremental and not zero_out_calculated_vars:
+            self.calc_all(changed=changed)
+        else:
+            self.calc_all(zero_out_calc_vars=zero_out_calculated_vars)
+        taxes_chng = (self.array('payrolltax').copy(),
+                      self.array('iitax').copy())
+        self.restore_records()
+        return taxes_chng
+
+    def _mtr_rates(self, variable_str, finite_diff, wrt_full_compensation,
+                   taxes_chng, taxes_base):
+        """
+        Return (mtr_payrolltax, mtr_incometax, mtr_combined) tuple of arrays
+        computed from the (payrolltax, iitax) tuples of arrays calculated
+        with and without the finite_diff increase in variable_str.
+        """
+        # pylint: disable=too-many-locals
+        (payrolltax_chng, incometax_chng) = taxes_chng
+        (payrolltax_base, incometax_base) = taxes_base
+        # compute marginal changes in combined tax liability
+        payrolltax_diff = payrolltax_chng - payrolltax_base
+        incometax_diff = incometax_chng - incometax_base
+        combined_diff = ((incometax_chng + payrolltax_chng) -
+                         (incometax_base + payrolltax_base))
+        # specify optional adjustment for employer (er) OASDI+HI payroll taxes
+        mtr_on_earnings = variable_str in ('e00200p', 'e00200s')
+        if wrt_full_compensation and mtr_on_earnings:
+            variable = self.array(variable_str)
+            oasdi_taxed = np.logical_or(
+                variable < self.policy_param('SS_Earnings_c'),
+                variable >= self.policy_param('SS_Earnings_thd')
+            )
+            adj = np.where(oasdi_taxed,
+                           0.5 * (self.policy_param('FICA_ss_trt_employer') +
+                                  self.policy_param('FICA_ss_trt_employee') +
+                                  self.policy_param('FICA_mc_trt_employer') +
+                                  self.policy_param('FICA_mc_trt_employee')),
+                           0.5 * (self.policy_param('FICA_mc_trt_employer') +
+                                  self.policy_param('FICA_mc_trt_employee')))
+        else:
+            adj = 0.0
+        # compute marginal tax rates
+        mtr_payrolltax = payrolltax_diff / (finite_diff * (1.0 + adj))
+        mtr_incometax = incometax_diff / (finite_diff * (1.0 + adj))
+        mtr_combined = combined_diff / (finite_diff * (1.0 + adj))
+        # if variable_str is e00200s, set MTR to NaN for units without a spouse
+        if variable_str == 'e00200s':
+            mars = self.array('MARS')
+            mtr_payrolltax = np.where(mars == 2, mtr_payrolltax, np.nan)
+            mtr_incometax = np.where(mars == 2, mtr_incometax, np.nan)
+            mtr_combined = np.where(mars == 2, mtr_combined, np.nan)
+        return (mtr_payrolltax, mtr_incometax, mtr_combined)
+
+    def _overlay(self, policy_params):
+        """
+        Return Calculator object whose _calc_one_year() method calculates
+        with the parameter values in the policy_params dictionary (indexed
+        by parameter name) without changing self.  The returned object
+        shares the policy parameter values and the Records input arrays
+        with self, and has its own copies of only the Records arrays that
+        are written by the _calc_one_year() method.
+        """
+        # pylint: disable=unused-private-member,protected-access
+        overlay = copy.copy(self)
+        overlay.__policy = copy.copy(self.__policy)
+        for param_name, param_value in policy_params.items():
+            setattr(overlay.__policy, param_name, param_value)
+        overlay.__records = copy.copy(self.__records)
+        for stage in self._calc_one_year_stages():
+            for name in stage.outputs:
+                setattr(overlay.__records, name,
+                        getattr(self.__records, name).copy())
+        overlay.__stored_records = None
+        overlay.__records_buffers = {}
+        return overlay
+
+    def _with_policy(self, policy):
+        """
+        Return Calculator object that embeds a copy of the specified policy
+        set to the current year without changing self.  The returned object
+        shares the Records input arrays with self, and has its own copies of
+        only the Records arrays that are written by the calc_all() method
+        and of those that are changed by the consumption response in the
+        mtr() method, as well as its own copy of the Consumption object.
+        Neither self nor the returned object should be advanced to another
+        year because that changes the shared input arrays.
+        """
+        # pylint: disable=unused-private-member,protected-access
+        other = copy.copy(self)
+        other.__policy = copy.deepcopy(policy)
+        other.__policy.set_year(self.current_year)
+        other.__consumption = copy.deepcopy(self.__consumption)
+        other.__records = copy.copy(self.__records)
+        changing_vars = set(Consumption.RESPONSE_VARS).union(*[
+            stage.outputs for stage in other._calc_all_stages()
+        ])
+        for name in changing_vars:
+            setattr(other.__records, name,
+                    np.array(getattr(self.__records, name)))
+        other.__stored_records = None
+        other.__records_buffers = {}
+        return other
+
+    def _calc_all_rows(self, rows, zero_out_calc_vars, changed):
+        """
+        Call calc_all() for a Calculator object that embeds only the
+        specified rows of the embedded Records object and copy the values
+        of the variables it writes into those rows.  When the rows are a
+        slice with a step of one (or an index array or boolean mask that
+        selects consecutive rows), the arrays of the subset are views of
+        the arrays of self, so nothing is copied except when a function
+        replaces an array instead of writing into it.  Otherwise, the
+        subset contains copies of the selected rows of only the variables
+        read or written by the stages that are called, whose results are
+        copied back into the selected rows, which pays off only when the
+        rows are a small fraction of all the rows.
+        """
+        # pylint: disable=unused-private-member,protected-access
+        if not isinstance(rows, slice):
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)  # which selects rows faster
+            if rows.size > 0 and np.all(np.diff(rows) == 1):
+                rows = slice(rows[0], rows[-1] + 1)
+        views = isinstance(rows, slice) and rows.step in (None, 1)
+        stages = self._calc_all_stages(zero_out_calc_vars)
+        if changed is not None:
+            stages = _stages_to_rerun(stages, changed)
+        outputs = frozenset().union(*[stage.outputs for stage in stages])
+        if views:
+            varnames = None
+        else:
+            varnames = outputs.union(*[stage.inputs for stage in stages])
+        subset_calc = copy.copy(self)
+        subset_calc.__records = self.__records.row_subset(rows, varnames)
+        subset_calc.__stored_records = None
+        subset_calc.__records_buffers = {}
+        subset_arrays = {name: getattr(subset_calc.__records, name)
+                         for name in outputs}
+        subset_calc.calc_all(zero_out_calc_vars, changed)
+        for name in outputs:
+            value = getattr(subset_calc.__records, name)
+            if not views or value is not subset_arrays[name]:
+                self.__records._unmap([name])
+                getattr(self.__records, name)[rows] = value
+
+    def _kernel_stage(self, func):
+        """
+        Return Stage that calls the func function created by the
+        iterate_jit decorator.
+        """
+        inputs, outputs = kernel_variables(func)
+        return Stage(func, (self.__policy, self.__records), inputs, outputs)
+
+    def _calc_all_stages(self, zero_out_calc_vars=False):
+        """
+        Return list of the stages of the calc_all() method.
+        """
+        one_year_stages = self._calc_one_year_stages(zero_out_calc_vars)
+        # the benefit surtax and limitation, when they are in effect, call
+        # the _calc_one_year() method (see ComputeBenefit) and add to taxes
+        one_year_vars = frozenset().union(*[stage.inputs | stage.outputs
+                                            for stage in one_year_stages])
+        taxes = frozenset(['iitax', 'combined', 'surtax'])
+        no_vars = frozenset()
+        surtax_vars = no_vars
+        if self.policy_param('ID_BenefitSurtax_crt') != 1.:
+            surtax_vars = taxes
+        limitation_vars = no_vars
+        if self.policy_param('ID_BenefitCap_rt') != 1.:
+            limitation_vars = taxes
+        benefits = frozenset(['housing_ben', 'ssi_ben', 'snap_ben',
+                              'tanf_ben', 'vet_ben', 'wic_ben', 'mcare_ben',
+                              'mcaid_ben', 'e02400', 'e02300', 'other_ben'])
+        return (
+            [self._kernel_stage(UBI),
+             Stage(BenefitPrograms, (self,), benefits | {'ubi'},
+                   benefits | {'benefit_cost_total', 'benefit_value_total'})] +
+            one_year_stages +
+            [Stage(BenefitSurtax, (self,),
+                   one_year_vars if surtax_vars else no_vars, surtax_vars),
+             Stage(BenefitLimitation, (self,),
+                   one_year_vars if limitation_vars else no_vars,
+                   limitation_vars)] +
+            [self._kernel_stage(func)
+             for func in [FairShareTax, LumpSumTax, ExpandIncome,
+                          AfterTaxIncome]]
+        )
+
+    def _calc_one_year_stages(self, zero_out_calc_vars=False):
+        """
+        Return list of the stages of the _calc_one_year() method.
+        """
+        stages = []
+        if zero_out_calc_vars:
+            stages.append(Stage(
+                self.__records.zero_out_changing_calculated_vars, (),
+                frozenset(),
+                frozenset(self.__records.CHANGING_CALCULATED_VARS)
+            ))
+        deduction_vars = frozenset(['standard'] + ITEMDED_VARIABLES +
+                                   ITEMDED_COMPONENT_VARIABLES)
+        if self.__fused_kernel:
+            kernel_stages = [self._kernel_stage(func) for func in (
+                INCOME_TO_STDDED_FUNCTIONS + TAXINC_TO_AMT_FUNCTIONS +
+                CREDITS_TO_IITAX_FUNCTIONS
+            )]
+            stages.append(Stage(
+                CALC_ONE_YEAR_FUSED, (self.__policy, self.__records),
+                deduction_vars.union(*[stage.inputs
+                                       for stage in kernel_stages]),
+                deduction_vars.union(*[stage.outputs
+                                       for stage in kernel_stages])
+            ))
+            return stages
+        taxinc_to_amt_stages = [self._kernel_stage(func)
+                                for func in TAXINC_TO_AMT_FUNCTIONS]
+        choose_deduction_stage = Stage(
+            self._choose_deduction, (),
+            deduction_vars.union(*[stage.inputs
+                                   for stage in taxinc_to_amt_stages]),
+            deduction_vars.union(*[stage.outputs
+                                   for stage in taxinc_to_amt_stages])
+        )
+        return (stages +
+                [self._kernel_stage(func)
+                 for func in INCOME_TO_STDDED_FUNCTIONS] +
+                [choose_deduction_stage] +
+                [self._kernel_stage(func)
+                 for func in CREDITS_TO_IITAX_FUNCTIONS])
+
     def _taxinc_to_amt(self):
         """
         Call TaxInc through AMT functions.
@@ -1373,82 +1990,457 @@ class Calculator():
         NetInvIncTax(self.__policy, self.__records)
         AMT(self.__policy, self.__records)
 
-    def _calc_one_year(self, zero_out_calc_vars=False):
+    def _choose_deduction(self):
         """
-        Call all the functions except those in the calc_all() method.
+        Calculate taxes with the standard and with the itemized deduction
+        and choose the deduction that minimizes taxes.
         """
-        # pylint: disable=too-many-statements
-        if zero_out_calc_vars:
-            self.__records.zero_out_changing_calculated_vars()
-        # pdb.set_trace()
-        EI_PayrollTax(self.__policy, self.__records)
-        DependentCare(self.__policy, self.__records)
-        Adj(self.__policy, self.__records)
-        ALD_InvInc_ec_base(self.__policy, self.__records)
-        CapGains(self.__policy, self.__records)
-        SSBenefits(self.__policy, self.__records)
-        AGI(self.__policy, self.__records)
-        ItemDedCap(self.__policy, self.__records)
-        ItemDed(self.__policy, self.__records)
-        AdditionalMedicareTax(self.__policy, self.__records)
-        StdDed(self.__policy, self.__records)
-        # Store calculated standard deduction, calculate
-        # taxes with standard deduction, store AMT + Regular Tax
+        # Store calculated standard and itemized deductions, and
+        # calculate taxes with standard deduction
         std = self.array('standard').copy()
-        item = self.array('c04470').copy()
-        item_no_limit = self.array('c21060').copy()
-        item_phaseout = self.array('c21040').copy()
-        item_component_variable_names = ['c17000', 'c18300', 'c19200',
-                                         'c19700', 'c20500', 'c20800']
-        item_cvar = {}
-        for cvname in item_component_variable_names:
-            item_cvar[cvname] = self.array(cvname).copy()
-        self.zeroarray('c04470')
-        self.zeroarray('c21060')
-        self.zeroarray('c21040')
-        for cvname in item_component_variable_names:
-            self.zeroarray(cvname)
+        item = {}
+        for vname in ITEMDED_VARIABLES + ITEMDED_COMPONENT_VARIABLES:
+            item[vname] = self.array(vname).copy()
+            self.array(vname).fill(0.)
         self._taxinc_to_amt()
         std_taxes = self.array('c05800').copy()
-        # Set standard deduction to zero, calculate taxes w/o
-        # standard deduction, and store AMT + Regular Tax
-        self.zeroarray('standard')
-        self.array('c21060', item_no_limit)
-        self.array('c21040', item_phaseout)
-        self.array('c04470', item)
+        std_values = {}
+        for vname in TAXINC_TO_NIIT_VARIABLES:
+            std_values[vname] = self.array(vname).copy()
+        # Set standard deduction to zero and calculate taxes with
+        # itemized deduction (but without its components)
+        self.array('standard').fill(0.)
+        for vname in ITEMDED_VARIABLES:
+            np.copyto(self.array(vname), item[vname])
         self._taxinc_to_amt()
-        item_taxes = self.array('c05800').copy()
-        # Replace standard deduction with zero so the filing unit
-        # would always be better off itemizing
-        self.array('standard', np.where(item_taxes < std_taxes,
-                                        0., std))
-        self.array('c04470', np.where(item_taxes < std_taxes,
-                                      item, 0.))
-        self.array('c21060', np.where(item_taxes < std_taxes,
-                                      item_no_limit, 0.))
-        self.array('c21040', np.where(item_taxes < std_taxes,
-                                      item_phaseout, 0.))
-        for cvname in item_component_variable_names:
-            self.array(cvname, np.where(item_taxes < std_taxes,
-                                        item_cvar[cvname], 0.))
+        # Choose the deduction that minimizes taxes, using for each filing
+        # unit the values calculated for the chosen deduction, which makes
+        # it unnecessary to call TaxInc through NetInvIncTax a third time
+        itemizing = self.array('c05800') < std_taxes
+        not_itemizing = ~itemizing
+        np.copyto(self.array('standard'), std, where=not_itemizing)
+        for vname in ITEMDED_VARIABLES:
+            self.array(vname)[not_itemizing] = 0.
+        for vname in ITEMDED_COMPONENT_VARIABLES:
+            np.copyto(self.array(vname), item[vname], where=itemizing)
+        for vname in TAXINC_TO_NIIT_VARIABLES:
+            np.copyto(self.array(vname), std_values[vname],
+                      where=not_itemizing)
         del std
         del item
-        del item_no_limit
-        del item_phaseout
-        del item_cvar
-        # Calculate taxes with optimal itemized deduction
-        self._taxinc_to_amt()
-        F2441(self.__policy, self.__records)
-        EITC(self.__policy, self.__records)
-        RefundablePayrollTaxCredit(self.__policy, self.__records)
-        PersonalTaxCredit(self.__policy, self.__records)
-        AmOppCreditParts(self.__policy, self.__records)
-        SchR(self.__policy, self.__records)
-        EducationTaxCredit(self.__policy, self.__records)
-        CharityCredit(self.__policy, self.__records)
-        ChildDepTaxCredit(self.__policy, self.__records)
-        NonrefundableCredits(self.__policy, self.__records)
-        AdditionalCTC(self.__policy, self.__records)
-        C1040(self.__policy, self.__records)
-        CTC_new(self.__policy, self.__records)
-        IITAX(self.__policy, self.__records)
+        del std_values
+        # Complete taxes with the chosen deduction: AGIsurtax adds to the
+        # surtax amount in each call (but the taxbc values are already
+        # those for the chosen deduction), and AMT uses the components
+        taxbc = self.array('taxbc').copy()
+        AGIsurtax(self.__policy, self.__records)
+        self.array('taxbc', taxbc)
+        AMT(self.__policy, self.__records)
+
+    def _calc_one_year(self, zero_out_calc_vars=False):
+        """
+        Call all the functions except those in the calc_all() method.
+        """
+        for stage in self._calc_one_year_stages(zero_out_calc_vars):
+            stage.function(*stage.arguments)
+
+
+class ChunkTotals():
+    """
+    Constructor for the ChunkTotals class, which accumulates the results of
+    Calculator objects that each contain a block of the filing units (see
+    the Calculator.calc_chunks method) so that weighted totals and tables
+    for all the filing units can be computed when the input data of all
+    the filing units cannot be held in memory at once.
+
+    Parameters
+    ----------
+    variables: None or list of strings
+        names of the Records variables whose weighted totals are
+        accumulated in addition to those of the DIST_VARIABLES and
+        DIFF_VARIABLES when groupby is not None; default value is None,
+        which implies no other variables.
+
+    groupby: None or string
+        options for input: 'weighted_deciles', 'standard_income_bins',
+        'soi_agi_bins'; determines the rows of the tables returned by the
+        distribution_tables and difference_table methods; default value is
+        None, which implies that no table sums are accumulated.
+
+    pop_quantiles: boolean
+        specifies whether or not weighted_deciles contain an equal number
+        of people (True) or an equal number of filing units (False);
+        default value is false.
+
+    Returns
+    -------
+    class instance: ChunkTotals
+
+    Notes
+    -----
+    Typical usage to compare a reform with current law is as follows:
+        totals1 = ChunkTotals(groupby='weighted_deciles')
+        totals2 = ChunkTotals(groupby='weighted_deciles')
+        for calc1, calc2 in zip(
+                Calculator.calc_chunks(pol1, Records.read_chunks(...)),
+                Calculator.calc_chunks(pol2, Records.read_chunks(...))):
+            totals1.add(calc1)
+            totals2.add(calc2, baseline=calc1)
+        dist1, dist2 = totals1.distribution_tables(totals2)
+        diff = totals1.difference_table(totals2, 'iitax')
+    Only the table sums for each income range are kept, so the memory used
+    does not grow with the number of filing units.  The weighted totals and
+    the tables for income bins are those of a Calculator object containing
+    all the filing units except for floating-point rounding of the sums.
+    The weighted-decile edges are not known until all the filing units have
+    been added, so the sums are kept for narrow income ranges (a thousand
+    for each factor of ten in income) and the sums of a range that contains
+    a decile edge are split between the two table rows in proportion to
+    the weighted count on each side of the edge.  So the weighted-decile
+    tables are close to, but not the same as, those of a Calculator object,
+    which puts each filing unit in one table row (and puts the last filing
+    unit with negative income in the 0-10z row).
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    # narrow income ranges of each sign used for weighted deciles
+    CELLS_PER_DECADE = 1000
+    NUM_MAGNITUDE_CELLS = 10 * CELLS_PER_DECADE + 1
+
+    DIST_SUMS_COLUMNS = DIST_TABLE_COLUMNS + ['s006']
+
+    TAXES_TO_DIFF = ['iitax', 'payrolltax', 'combined']
+
+    DIFF_SUMS_COLUMNS = ['count', 'ubi', 'benefit_cost_total',
+                         'benefit_value_total', 'atinc1', 'atinc2', 's006'] + [
+        f'{stat}_{tax}'
+        for tax in TAXES_TO_DIFF
+        for stat in ['tax_cut', 'tax_inc', 'tot_change']
+    ]
+
+    def __init__(self, variables=None, groupby=None, pop_quantiles=False):
+        assert groupby in (None, 'weighted_deciles', 'standard_income_bins',
+                           'soi_agi_bins')
+        if pop_quantiles:
+            assert groupby == 'weighted_deciles'
+        self.__groupby = groupby
+        self.__pop_quantiles = pop_quantiles
+        total_vars = list(variables or [])
+        if groupby is not None:
+            total_vars += DIST_VARIABLES + DIFF_VARIABLES
+        self.__totals = dict.fromkeys(total_vars, 0.)
+        self.__total_weight = 0.
+        self.__sums = {}
+        self.__baseline_income = 0.
+        self.__incomes_differ = False
+        self.__array_len = 0
+        self.__current_year = None
+        self.__benval_params = None
+
+    def add(self, calc, baseline=None):
+        """
+        Add the results of the specified Calculator object, calc, whose
+        calc_all() method has been called, to the accumulated results.
+        When this object is the totals argument of the distribution_tables
+        or difference_table method of another ChunkTotals object, baseline
+        must be the Calculator object that contains the same filing units
+        and was added to the other object; otherwise, baseline is None.
+        """
+        assert isinstance(calc, Calculator)
+        if self.__current_year is None:
+            self.__current_year = calc.current_year
+            self.__benval_params = calc.consump_benval_params()
+        assert calc.current_year == self.__current_year
+        assert np.allclose(calc.consump_benval_params(),
+                           self.__benval_params)
+        if baseline is not None:
+            assert isinstance(baseline, Calculator)
+            assert baseline.current_year == calc.current_year
+            assert np.allclose(baseline.array('s006'), calc.array('s006'))
+        # either all or none of the blocks are added with a baseline
+        assert self.__array_len == 0 or (
+            (baseline is not None) == ('diff' in self.__sums)
+        )
+        for vname in self.__totals:
+            self.__totals[vname] += calc.weighted_total(vname)
+        self.__total_weight += calc.total_weight()
+        if self.__groupby is not None:
+            self._add_sums(calc, baseline)
+        self.__array_len += calc.array_len
+
+    @property
+    def array_len(self):
+        """
+        Number of filing units in the accumulated results.
+        """
+        return self.__array_len
+
+    @property
+    def current_year(self):
+        """
+        Calendar year of the accumulated results.
+        """
+        return self.__current_year
+
+    @property
+    def groupby(self):
+        """
+        Table rows of the accumulated table sums.
+        """
+        return self.__groupby
+
+    @property
+    def pop_quantiles(self):
+        """
+        Whether or not weighted_deciles contain an equal number of people.
+        """
+        return self.__pop_quantiles
+
+    def consump_benval_params(self):
+        """
+        Return list of benefit-consumption-value parameter values of the
+        accumulated results.
+        """
+        return self.__benval_params
+
+    def weighted_total(self, variable_name):
+        """
+        Return all-filing-unit weighted total of named Records variable.
+        """
+        if variable_name not in self.__totals:
+            msg = f'weighted total of {variable_name} is not accumulated'
+            raise ValueError(msg)
+        return self.__totals[variable_name]
+
+    def total_weight(self):
+        """
+        Return all-filing-unit total of sampling weights.
+        """
+        return self.__total_weight
+
+    def distribution_tables(self, totals, scaling=True):
+        """
+        Return the pair of distribution tables that are returned by the
+        Calculator.distribution_tables method for Calculator objects that
+        contain all the filing units in self and in totals, which is None
+        or a ChunkTotals object to which each Calculator object added to
+        self was added as the baseline (see add method).
+        """
+        # pylint: disable=protected-access
+        if self.__groupby is None:
+            raise ValueError('no table sums are accumulated')
+        dt1 = create_distribution_table_from_sums(
+            self._table_sums('own')[DIST_TABLE_COLUMNS], self.__groupby,
+            scaling)
+        if totals is None:
+            return (dt1, None)
+        assert isinstance(totals, ChunkTotals)
+        dt2 = create_distribution_table_from_sums(
+            totals._reform_table_sums(self, 'dist')[DIST_TABLE_COLUMNS],
+            self.__groupby, scaling)
+        return (dt1, dt2)
+
+    def difference_table(self, totals, tax_to_diff):
+        """
+        Return the difference table that is returned by the
+        Calculator.difference_table method for Calculator objects that
+        contain all the filing units in self and in totals, which is a
+        ChunkTotals object to which each Calculator object added to self
+        was added as the baseline (see add method).
+        """
+        # pylint: disable=protected-access
+        assert isinstance(totals, ChunkTotals)
+        assert tax_to_diff in self.TAXES_TO_DIFF
+        if self.__groupby is None:
+            raise ValueError('no table sums are accumulated')
+        sums = totals._reform_table_sums(self, 'diff')
+        for stat in ['tax_cut', 'tax_inc', 'tot_change']:
+            sums[stat] = sums[f'{stat}_{tax_to_diff}']
+        return create_difference_table_from_sums(
+            sums[['count', 'tax_cut', 'tax_inc', 'tot_change', 'ubi',
+                  'benefit_cost_total', 'benefit_value_total',
+                  'atinc1', 'atinc2']],
+            self.__groupby)
+
+    # ----- begin private methods of ChunkTotals class -----
+
+    def _reform_table_sums(self, baseline_totals, name):
+        """
+        Return the table sums for each table row of the distribution table
+        (when name is 'dist') or the difference table (when name is 'diff')
+        of this object, to which each Calculator object added to the
+        baseline_totals object was added as the baseline (see add method).
+
+        Raises
+        ------
+        ValueError:
+            if this object is not accumulated with a baseline.
+        """
+        if 'diff' not in self.__sums:
+            raise ValueError('totals are not accumulated with a baseline')
+        assert baseline_totals.groupby == self.__groupby
+        assert baseline_totals.pop_quantiles == self.__pop_quantiles
+        assert baseline_totals.current_year == self.current_year
+        assert baseline_totals.array_len == self.array_len
+        assert np.allclose(baseline_totals.consump_benval_params(),
+                           self.consump_benval_params())
+        assert np.allclose(baseline_totals.total_weight(),
+                           self.total_weight())
+        assert np.allclose(baseline_totals.weighted_total('expanded_income'),
+                           self.__baseline_income)
+        if name == 'diff':
+            return self._table_sums('diff')
+        # use the baseline expanded_income only if somebody's
+        # expanded_income differs by more than one cent
+        if self.__incomes_differ:
+            return self._table_sums('baseline')
+        return self._table_sums('own')
+
+    def _add_sums(self, calc, baseline):
+        """
+        Add the table sums of each income range of the filing units in
+        calc, whose baseline is None or the baseline Calculator object.
+        """
+        weight = calc.array('s006')
+        if self.__pop_quantiles:
+            count = weight * calc.array('XTOT')
+        else:
+            count = weight
+        # weighted counts of those with a positive value of the variable
+        count_vars = {'count_StandardDed': 'standard',
+                      'count_ItemDed': 'c04470',
+                      'count_AMT': 'c09600'}
+        columns = {}
+        for col in self.DIST_SUMS_COLUMNS:
+            if col == 'count':
+                columns[col] = count
+            elif col in count_vars:
+                columns[col] = count * (calc.array(count_vars[col]) > 0.)
+            elif col == 's006':
+                columns[col] = weight
+            else:
+                columns[col] = calc.array(col) * weight
+        self._add_cell_sums('own', self._income_cells(calc), columns)
+        if baseline is None:
+            return
+        baseline_cells = self._income_cells(baseline)
+        self._add_cell_sums('baseline', baseline_cells, columns)
+        columns = {'count': count}
+        for vname in ['ubi', 'benefit_cost_total', 'benefit_value_total']:
+            columns[vname] = (calc.array(vname) -
+                              baseline.array(vname)) * weight
+        columns['atinc1'] = baseline.array('aftertax_income') * weight
+        columns['atinc2'] = calc.array('aftertax_income') * weight
+        columns['s006'] = weight
+        for tax in self.TAXES_TO_DIFF:
+            tax_diff = calc.array(tax) - baseline.array(tax)
+            columns[f'tax_cut_{tax}'] = count * (tax_diff < -0.001)
+            columns[f'tax_inc_{tax}'] = count * (tax_diff > 0.001)
+            columns[f'tot_change_{tax}'] = tax_diff * weight
+        self._add_cell_sums('diff', baseline_cells, columns)
+        self.__baseline_income += baseline.weighted_total('expanded_income')
+        if not np.allclose(calc.array('expanded_income'),
+                           baseline.array('expanded_income'),
+                           rtol=0.0, atol=0.01):
+            self.__incomes_differ = True
+
+    def _income_cells(self, calc):
+        """
+        Return array containing the index of the income range of each
+        filing unit in calc, where the income ranges are the table rows
+        for income bins and are ordered narrow ranges of the (adjusted)
+        income for weighted deciles, as in add_quantile_table_row_variable
+        utility function: ranges of negative income from the most negative,
+        then the range of zero income, then ranges of positive income.
+        """
+        income = calc.array('expanded_income')
+        if self.__groupby == 'standard_income_bins':
+            bin_edges = STANDARD_INCOME_BINS
+        elif self.__groupby == 'soi_agi_bins':
+            bin_edges = SOI_AGI_BINS
+        else:
+            adj_income = income
+            if self.__pop_quantiles:
+                xtot = calc.array('XTOT')
+                adj_income = income / np.sqrt(np.where(xtot == 0, 1, xtot))
+            magnitude = np.log10(np.maximum(np.abs(adj_income), 1.))
+            mag_cell = np.minimum(
+                (magnitude * self.CELLS_PER_DECADE).astype(np.int64),
+                self.NUM_MAGNITUDE_CELLS - 1
+            )
+            num = self.NUM_MAGNITUDE_CELLS
+            return np.where(income <= -1e-9, num - 1 - mag_cell,
+                            np.where(income < 1e-9, num, num + 1 + mag_cell))
+        # bins are left inclusive as in add_income_table_row_variable
+        return np.clip(np.searchsorted(bin_edges, income, side='right') - 1,
+                       0, len(bin_edges) - 2)
+
+    def _add_cell_sums(self, name, cells, columns):
+        """
+        Add the sums of the columns of each income range in cells to the
+        table sums with the specified name.
+        """
+        if self.__groupby == 'weighted_deciles':
+            num_cells = 2 * self.NUM_MAGNITUDE_CELLS + 1
+        elif self.__groupby == 'standard_income_bins':
+            num_cells = len(STANDARD_INCOME_BINS) - 1
+        else:
+            num_cells = len(SOI_AGI_BINS) - 1
+        sums = np.column_stack([
+            np.bincount(cells, weights=values, minlength=num_cells)
+            for values in columns.values()
+        ])
+        if name in self.__sums:
+            self.__sums[name] += sums
+        else:
+            self.__sums[name] = sums
+
+    def _table_sums(self, name):
+        """
+        Return Pandas DataFrame containing the table sums with the specified
+        name for each table row.
+        """
+        if name == 'diff':
+            columns = self.DIFF_SUMS_COLUMNS
+        else:
+            columns = self.DIST_SUMS_COLUMNS
+        sums = self.__sums[name]
+        if self.__groupby == 'weighted_deciles':
+            sums = ChunkTotals._decile_fractions(
+                sums[:, columns.index('count')],
+                sums[:, columns.index('s006')]
+            ) @ sums
+        return pd.DataFrame(data=sums, columns=columns)
+
+    @staticmethod
+    def _decile_fractions(count, weight):
+        """
+        Return array whose [row, cell] element is the fraction of the
+        weighted count of the cell income range that is in the table row,
+        where the rows are the weighted deciles with the bottom and top
+        deciles split as in the add_quantile_table_row_variable utility
+        function with decile_details=True, given the count and s006 sums
+        of the ordered income ranges.
+        """
+        num = ChunkTotals.NUM_MAGNITUDE_CELLS
+        width = count.sum() / 10.
+        assert width > 1e-9
+        edges = np.array(
+            [-9e99, weight[:num].sum(), weight[:num + 1].sum()] +
+            [width * decile for decile in range(1, 10)] +
+            [9.5 * width, 9.9 * width, 9e99]
+        )
+        end = np.cumsum(count)
+        start = end - count
+        overlap = np.maximum(
+            np.minimum(end, edges[1:, np.newaxis]) -
+            np.maximum(start, edges[:-1, np.newaxis]),
+            0.
+        )
+        fractions = np.divide(overlap, count, out=np.zeros_like(overlap),
+                              where=count > 0.)
+        # a range with zero weighted count is in the row containing it
+        empty = np.flatnonzero(count <= 0.)
+        rows = np.searchsorted(edges, start[empty], side='right') - 1
+        fractions[rows, empty] = 1.
+        return fractions
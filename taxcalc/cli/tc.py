@@ -46,9 +46,10 @@ def cli_tc_main():
                      'CSV-formatted file that contains tax information for '
                      'each INPUT filing unit under the reform(s).'))
     parser.add_argument('INPUT', nargs='?',
-                        help=('INPUT is name of CSV-formatted file that '
-                              'contains for each filing unit variables used '
-                              'to compute taxes for TAXYEAR. Specifying '
+                        help=('INPUT is name of CSV-formatted file (or of '
+                              'Parquet or Feather file) that contains for '
+                              'each filing unit variables used to compute '
+                              'taxes for TAXYEAR. Specifying '
                               '"cps.csv" uses CPS input files included in '
                               'the taxcalc package.'),
                         default='')
@@ -91,8 +92,10 @@ def cli_tc_main():
                         default=False,
                         action="store_true")
     parser.add_argument('--timings',
-                        help=('optional flag that causes execution times to '
-                              'be written to stdout.'),
+                        help=('optional flag that causes execution times, '
+                              'including a breakdown of calc time by '
+                              'tax-calculation function, to be written '
+                              'to stdout.'),
                         default=False,
                         action="store_true")
     parser.add_argument('--dump',
@@ -127,6 +130,14 @@ def cli_tc_main():
                               'No --outdir implies output files are written '
                               'in the current directory.'),
                         default=None)
+    parser.add_argument('--cachedir',
+                        help=('CACHEDIR is name of optional directory in '
+                              'which INPUT data extrapolated to TAXYEAR are '
+                              'cached, so that later runs with the same '
+                              'INPUT, TAXYEAR and ASSUMP files skip reading '
+                              'and extrapolating the INPUT data.  No '
+                              '--cachedir implies no caching.'),
+                        default=None)
     parser.add_argument('--test',
                         help=('optional flag that conducts installation '
                               'test, writes test result to stdout, '
@@ -183,7 +194,8 @@ def cli_tc_main():
               baseline=args.baseline,
               reform=args.reform, assump=args.assump,
               aging_input_data=aging,
-              exact_calculations=args.exact)
+              exact_calculations=args.exact,
+              cache_dir=args.cachedir)
     if args.timings:
         xtime = time.time() - stime
         sys.stdout.write(f'TIMINGS: init time = {xtime:.2f} secs\n')
@@ -209,15 +221,20 @@ def cli_tc_main():
     # conduct tax analysis
     if args.timings:
         stime = time.time()
-    tcio.analyze(writing_output_file=True,
-                 output_tables=args.tables,
-                 output_graphs=args.graphs,
-                 dump_varset=dumpvar_set,
-                 output_dump=args.dump,
-                 output_sqldb=args.sqldb)
+    with tc.profile_kernels(tc.KernelProfile() if args.timings else None) \
+            as profile:
+        tcio.analyze(writing_output_file=True,
+                     output_tables=args.tables,
+                     output_graphs=args.graphs,
+                     dump_varset=dumpvar_set,
+                     output_dump=args.dump,
+                     output_sqldb=args.sqldb)
     if args.timings:
         xtime = time.time() - stime
         sys.stdout.write(f'TIMINGS: calc time = {xtime:.2f} secs\n')
+        sys.stdout.write('TIMINGS: calc time by function:\n')
+        for line in profile.report().splitlines():
+            sys.stdout.write(f'TIMINGS: {line}\n')
     # compare test output with expected test output if --test option specified
     if args.test:
         retcode = _compare_test_output_files()
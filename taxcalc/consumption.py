@@ -82,6 +82,8 @@ class Consumption(Parameters):
         """
         if not isinstance(records, Records):
             raise ValueError('records is not a Records object')
+        # pylint: disable=protected-access
+        records._unmap(Consumption.RESPONSE_VARS)
         for var in Consumption.RESPONSE_VARS:
             records_var = getattr(records, var)
             mpc_var = getattr(self, f'MPC_{var}')
@@ -7,8 +7,15 @@ Tax-Calculator abstract base data class.
 
 import os
 import abc
+import copy
 import numpy as np
 import pandas as pd
+try:
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None  # pylint: disable=invalid-name
 from taxcalc.growfactors import GrowFactors
 from taxcalc.utils import read_egg_csv, read_egg_json, json_to_dict
 
@@ -22,7 +29,13 @@ class Data():
     Parameters
     ----------
     data: string or Pandas DataFrame
-        string describes CSV file in which data reside;
+        string describes CSV file in which data reside, or a Parquet or
+        Feather (Arrow IPC) file when the string ends in one of the
+        COLUMNAR_SUFFIXES, in which case only the USABLE_READ_VARS columns
+        are read from the file (reading such a file requires pyarrow),
+        or a directory of NPY files written by the write_npy_files method,
+        in which case the arrays are memory-mapped read-only and are shared
+        with every other process that maps the same files;
         DataFrame already contains cross-sectional data for start_year.
         NOTE: data=None is allowed but the returned instance contains only
               the data variable information in the specified VARINFO file.
@@ -82,6 +95,7 @@ class Data():
         self.CHANGING_CALCULATED_VARS = set()
         self.INTEGER_VARS = set()
         self._read_var_info()
+        self.__read_vars = None
         if data is not None:
             # check consistency of specified gfactors and weights
             if gfactors is None and weights is None:
@@ -131,6 +145,13 @@ class Data():
         """
         return self.__data_year
 
+    def _set_data_year(self, data_year):
+        """
+        Specify the original data year of data that were extrapolated to
+        the current year before they were read (see recordscache.py).
+        """
+        self.__data_year = data_year
+
     @property
     def current_year(self):
         """
@@ -145,16 +166,27 @@ class Data():
         """
         return self.__dim
 
-    def increment_year(self):
+    def increment_year(self, num_years=1):
         """
         Add one to current year; and also does
         extrapolation & reweighting for new current year if aged_data is True.
+        When num_years is greater than one, add num_years to current year
+        and extrapolate the data in one pass with the growth factors of all
+        the years, which gives the same results as num_years calls except
+        for floating-point rounding.
         """
+        if not isinstance(num_years, int) or num_years < 1:
+            raise ValueError('num_years is not a positive integer')
+        self._unmap()
         # move to next year
-        self.__current_year += 1
+        first_year = self.__current_year + 1
+        self.__current_year += num_years
         if self.__aging_data:
             # ... apply variable extrapolation growth factors
-            self._extrapolate(self.__current_year)
+            if num_years == 1:
+                self._extrapolate(self.__current_year)
+            else:
+                self._extrapolate(self.__current_year, first_year=first_year)
             # ... specify current-year sample weights
             wt_colname = f'WT{self.__current_year}'
             assert wt_colname in self.WT.columns, (
@@ -162,8 +194,100 @@ class Data():
             )
             self.s006 = self.WT[wt_colname] * self.weights_scale
 
+    def row_subset(self, rows, varnames=None):
+        """
+        Return a shallow copy of this object in which each variable array
+        contains only the specified rows of the array in this object.
+
+        Parameters
+        ----------
+        rows: slice or numpy array
+            slice, boolean mask, or integer index array that specifies the
+            rows; when rows is a slice with a step of one, each variable
+            array in the returned object is a view of (rather than a copy
+            of) the array in this object.
+
+        varnames: None or collection of strings
+            names of the variables whose arrays are in the returned object,
+            in which the arrays of the other variables are None; default
+            value is None, which implies all the variables.
+
+        Returns
+        -------
+        class instance: an object of the same class as this object
+        """
+        # pylint: disable=unused-private-member,protected-access
+        if isinstance(rows, slice) and rows.step not in (None, 1):
+            rows = np.arange(self.__dim)[rows]
+        subset = copy.copy(self)
+        allvars = self.USABLE_READ_VARS | self.CALCULATED_VARS
+        if varnames is not None:
+            for varname in allvars - set(varnames):
+                setattr(subset, varname, None)
+            allvars = allvars & set(varnames)
+        if isinstance(rows, slice):
+            subset.__dim = len(range(self.__dim)[rows])
+        else:
+            rows = np.asarray(rows)
+            subset.__dim = (np.count_nonzero(rows) if rows.dtype == bool
+                            else len(rows))
+        for varname in allvars:
+            value = getattr(self, varname)
+            if isinstance(value, pd.Series):
+                value = value.iloc[rows]
+            else:
+                value = value[rows]
+            setattr(subset, varname, value)
+        return subset
+
+    def write_npy_files(self, directory):
+        """
+        Write the current-year values of each variable read from the data
+        to a NPY file named after the variable in the specified directory,
+        which is created if it does not exist.  The directory can then be
+        used as the data argument of the class constructor, which maps the
+        NPY files into memory instead of reading them.
+        """
+        if self.__read_vars is None:
+            raise ValueError('no data were read, so no NPY files to write')
+        os.makedirs(directory, exist_ok=True)
+        for varname in sorted(self.__read_vars):
+            np.save(os.path.join(directory, f'{varname}.npy'),
+                    np.asarray(getattr(self, varname)))
+
+    def __deepcopy__(self, memo):
+        """
+        Return a deep copy of this object that shares with this object the
+        read-only arrays mapped from NPY files, whose values cannot change.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        memo[id(self)] = clone
+        for name, value in vars(self).items():
+            if not Data._is_mapped(value):
+                value = copy.deepcopy(value, memo)
+            setattr(clone, name, value)
+        return clone
+
     # ----- begin private methods of Data class -----
 
+    @staticmethod
+    def _is_mapped(value):
+        """
+        Return True if value is a read-only array mapped from a NPY file.
+        """
+        return isinstance(value, np.memmap) and not value.flags.writeable
+
+    def _unmap(self, varnames=None):
+        """
+        Replace each read-only array mapped from a NPY file (or only those
+        of the variables in varnames) with a private copy that can change.
+        """
+        for varname, value in list(vars(self).items()):
+            if varnames is not None and varname not in varnames:
+                continue
+            if Data._is_mapped(value):
+                setattr(self, varname, np.array(value))
+
     def _read_var_info(self):
         """
         Read Data variables metadata from JSON file and
@@ -200,6 +324,81 @@ class Data():
         self.CHANGING_CALCULATED_VARS = FLOAT_CALCULATED_VARS
         self.INTEGER_VARS = self.INTEGER_READ_VARS | INT_CALCULATED_VARS
 
+    COLUMNAR_SUFFIXES = ('.parquet', '.feather', '.arrow')
+
+    @staticmethod
+    def _read_columnar(path, usable_vars, integer_vars):
+        """
+        Read from the specified Parquet or Feather file only the columns
+        whose names are in usable_vars, converting each one directly into
+        an int32 array (when its name is in integer_vars) or a float64 array.
+        Returns a tuple containing an empty DataFrame, whose columns are the
+        names of all the columns in the file and whose index matches the
+        rows in the file, and a dictionary containing the arrays.
+        """
+        if pyarrow is None:
+            msg = f'reading {path} requires the pyarrow package'
+            raise ValueError(msg)
+        if path.endswith('.parquet'):
+            file_vars = pyarrow.parquet.read_schema(path).names
+            read_vars = [name for name in file_vars if name in usable_vars]
+            table = pyarrow.parquet.read_table(path, columns=read_vars)
+        else:
+            with pyarrow.ipc.open_file(path) as reader:
+                file_vars = reader.schema.names
+            read_vars = [name for name in file_vars if name in usable_vars]
+            table = pyarrow.feather.read_table(path, columns=read_vars)
+        arrays = {}
+        for name in read_vars:
+            dtype = np.int32 if name in integer_vars else np.float64
+            arrays[name] = np.array(table.column(name).to_numpy(), dtype=dtype)
+        taxdf = pd.DataFrame(columns=file_vars,
+                             index=pd.RangeIndex(table.num_rows))
+        return taxdf, arrays
+
+    def _read_dtypes(self):
+        """
+        Return dictionary that contains for each of the USABLE_READ_VARS
+        the dtype of its array after the data have been read, which is the
+        dtype of the array in a NPY file written by the write_npy_files
+        method.
+        """
+        return {name: (np.int32 if name in self.INTEGER_READ_VARS
+                       else np.float64)
+                for name in self.USABLE_READ_VARS}
+
+    @staticmethod
+    def _read_npy_files(directory, dtypes):
+        """
+        Map read-only into memory each NPY file in the specified directory
+        whose name (without its .npy suffix) is in the dtypes dictionary,
+        checking that it contains a one-dimensional array whose dtype is
+        the value of its name in dtypes.  Returns a tuple like the one
+        returned by the _read_columnar method.
+        """
+        file_vars = sorted(fname[:-len('.npy')]
+                           for fname in os.listdir(directory)
+                           if fname.endswith('.npy'))
+        arrays = {}
+        for name in file_vars:
+            if name not in dtypes:
+                continue
+            dtype = dtypes[name]
+            array = np.load(os.path.join(directory, f'{name}.npy'),
+                            mmap_mode='r')
+            if array.dtype != dtype or array.ndim != 1:
+                msg = (f'{name}.npy does not contain a one-dimensional '
+                       f'{np.dtype(dtype).name} array')
+                raise ValueError(msg)
+            arrays[name] = array
+        lengths = set(len(array) for array in arrays.values())
+        if len(lengths) > 1:
+            msg = f'NPY files in {directory} have different lengths'
+            raise ValueError(msg)
+        taxdf = pd.DataFrame(columns=file_vars,
+                             index=pd.RangeIndex(max(lengths, default=0)))
+        return taxdf, arrays
+
     def _read_data(self, data):
         """
         Read data from file or use specified DataFrame as data.
@@ -208,10 +407,18 @@ class Data():
         if data is None:
             return  # because there are no data to read
         # read specified data
+        arrays = None
         if isinstance(data, pd.DataFrame):
             taxdf = data
         elif isinstance(data, str):
-            if os.path.isfile(data):
+            if data.endswith(Data.COLUMNAR_SUFFIXES):
+                taxdf, arrays = Data._read_columnar(
+                    data, self.USABLE_READ_VARS, self.INTEGER_READ_VARS
+                )
+            elif os.path.isdir(data):
+                taxdf, arrays = Data._read_npy_files(data,
+                                                     self._read_dtypes())
+            elif os.path.isfile(data):
                 taxdf = pd.read_csv(data)
             else:  # find file in conda package
                 taxdf = read_egg_csv(data)  # pragma: no cover
@@ -226,7 +433,9 @@ class Data():
         for varname in list(taxdf.columns.values):
             if varname in self.USABLE_READ_VARS:
                 READ_VARS.add(varname)
-                if varname in self.INTEGER_READ_VARS:
+                if arrays is not None:
+                    setattr(self, varname, arrays[varname])
+                elif varname in self.INTEGER_READ_VARS:
                     setattr(self, varname,
                             taxdf[varname].astype(np.int32).values)
                 else:
@@ -251,6 +460,7 @@ class Data():
                 setattr(self, varname,
                         np.zeros(self.array_length, dtype=np.float64))
         # delete intermediate variables
+        self.__read_vars = frozenset(READ_VARS)
         del READ_VARS
         del UNREAD_VARS
         del ZEROED_VARS
@@ -287,8 +497,10 @@ class Data():
         setattr(self, 'WT', WT.astype(np.float64))
         del WT
 
-    def _extrapolate(self, year):
+    def _extrapolate(self, year, first_year=None):
         """
-        Apply to data variables the growth factor values for specified year.
+        Apply to data variables the growth factor values for specified year
+        or, when first_year is not None, for each year from first_year
+        through year.
         """
         # Override this empty method in subclass
@@ -5,13 +5,25 @@ of Tax-Calculator functions in the calcfunctions.py module.
 # CODING-STYLE CHECKS:
 # pycodestyle decorators.py
 # pylint --disable=locally-disabled decorators.py
+# pylint: disable=too-many-lines
 
 import os
 import io
+import sys
+import json
+import time
 import ast
 import inspect
+import hashlib
+import functools
+import collections
+import contextlib
+import importlib.util
 import numba
+import numpy as np
+import pandas as pd
 from taxcalc.policy import Policy
+from taxcalc.vectorize import vectorize, vectorize_source
 
 
 DO_JIT = True
@@ -30,6 +42,7 @@ def id_wrapper(*dec_args, **dec_kwargs):  # pylint: disable=unused-argument
         """
         wrap function nested in id_wrapper function.
         """
+        @functools.wraps(fnc)
         def wrapped_f(*args, **kwargs):
             """
             wrapped_f function nested in wrap function.
@@ -44,6 +57,342 @@ if DO_JIT is False or 'NOTAXCALCJIT' in os.environ:
 else:
     JIT = numba.jit
 
+# Loop over filing units in parallel threads (using numba.prange) when the
+# TAXCALCPARALLEL environment variable is set or when within the scope of
+# a parallel_apply(True) context manager (as used by the Calculator class)
+PARALLEL = 'TAXCALCPARALLEL' in os.environ
+
+
+@contextlib.contextmanager
+def parallel_apply(parallel):
+    """
+    Context manager that specifies whether or not the functions created by
+    the iterate_jit decorator and by the fused_jit function loop over the
+    filing units in parallel while in its scope.  Each loop iteration does
+    the calculations for a different filing unit, so the results are the
+    same as those of a serial loop.
+    """
+    global PARALLEL  # pylint: disable=global-statement
+    saved_parallel = PARALLEL
+    PARALLEL = bool(parallel)
+    try:
+        yield
+    finally:
+        PARALLEL = saved_parallel
+
+
+# Do the calculations of each calc-style function for all the filing units
+# at once using its vectorized version (see vectorize.py) instead of looping
+# over the filing units, which is the default when the NOTAXCALCJIT
+# environment variable is set (because a loop that is not jitted is very
+# slow) and which can be changed using the vectorized_apply context manager
+VECTORIZED = 'NOTAXCALCJIT' in os.environ
+
+
+@contextlib.contextmanager
+def vectorized_apply(vectorized):
+    """
+    Context manager that specifies whether or not the functions created by
+    the iterate_jit decorator and by the fused_jit function do their
+    calculations using the vectorized versions of the calc-style functions
+    while in its scope.  The vectorized version of a calc-style function
+    computes the same values for each filing unit as a loop over the filing
+    units does.
+    """
+    global VECTORIZED  # pylint: disable=global-statement
+    saved_vectorized = VECTORIZED
+    VECTORIZED = bool(vectorized)
+    try:
+        yield
+    finally:
+        VECTORIZED = saved_vectorized
+
+
+class KernelProfile():
+    """
+    Accumulator of the number of calls, the wall-clock time, the number of
+    filing units, and the bytes of argument arrays of each function called
+    while the KernelProfile object is in use (see profile_kernels).
+
+    The time of a function includes the time of the profiled functions it
+    calls (for example, BenefitSurtax calls calc_all on a Calculator copy),
+    while its self time excludes them.  Bytes are counted only for the
+    functions created by iterate_jit and fused_jit.  Copies of a
+    KernelProfile object (such as those in a deepcopy of a Calculator
+    object) are the object itself, so their calls are also accumulated.
+    """
+
+    COLUMNS = ['calls', 'seconds', 'self_seconds', 'records', 'bytes']
+
+    def __init__(self):
+        self.stats = {}
+        self._child_seconds = []
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def call(self, name, records, nbytes, func, *args, **kwargs):
+        """
+        Return func(*args, **kwargs) after adding its call to the
+        statistics for the name, where records and nbytes are the number
+        of filing units and the bytes of argument arrays for the call.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self._child_seconds.append(0.)
+        stime = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - stime
+            child_seconds = self._child_seconds.pop()
+            if self._child_seconds:
+                self._child_seconds[-1] += seconds
+            stats = self.stats.setdefault(name, [0, 0., 0., 0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] += seconds - child_seconds
+            stats[3] += records
+            stats[4] += nbytes
+
+    def dataframe(self):
+        """
+        Return Pandas DataFrame containing the statistics indexed by
+        function name and sorted by decreasing self time.
+        """
+        dframe = pd.DataFrame.from_dict(self.stats, orient='index',
+                                        columns=KernelProfile.COLUMNS)
+        return dframe.sort_values('self_seconds', ascending=False)
+
+    def report(self):
+        """
+        Return string containing a table of the statistics with one row
+        for each function sorted by decreasing self time.
+        """
+        lines = [f'{"function":<28}{"calls":>7}{"secs":>10}'
+                 f'{"selfsecs":>10}{"records":>12}{"MB":>10}']
+        for name, row in self.dataframe().iterrows():
+            lines.append(f'{name:<28}{int(row.calls):>7}'
+                         f'{row.seconds:>10.3f}{row.self_seconds:>10.3f}'
+                         f'{int(row.records):>12}{row.bytes / 1e6:>10.1f}')
+        return '\n'.join(lines) + '\n'
+
+
+# KernelProfile object that accumulates the calls of the functions created
+# by iterate_jit and fused_jit and of the functions decorated by profiled;
+# None, which implies no profiling and no profiling overhead, except within
+# the scope of a profile_kernels context manager
+PROFILE = None
+
+
+@contextlib.contextmanager
+def profile_kernels(profile):
+    """
+    Context manager that specifies the KernelProfile object that
+    accumulates the calls of the profiled functions while in its scope,
+    which is used like this:
+        with profile_kernels(KernelProfile()) as prof:
+            calc.calc_all()
+        sys.stdout.write(prof.report())
+    When profile is None, whether or not calls are profiled, and by which
+    KernelProfile object, is unchanged.
+    """
+    global PROFILE  # pylint: disable=global-statement
+    saved_profile = PROFILE
+    if profile is not None:
+        PROFILE = profile
+    try:
+        yield PROFILE
+    finally:
+        PROFILE = saved_profile
+
+
+def argument_sizes(pm, pf, names):
+    """
+    Return (records, nbytes) tuple containing the number of filing units
+    and the total bytes of the pm and pf arrays that are named in names.
+    """
+    records = 0
+    nbytes = 0
+    for name in names:
+        if hasattr(pm, name):
+            nbytes += np.asarray(getattr(pm, name)).nbytes
+        elif hasattr(pf, name):
+            value = get_values(getattr(pf, name))
+            records = len(value)
+            nbytes += value.nbytes
+    return records, nbytes
+
+
+def profiled(func):
+    """
+    Decorator for a function whose first argument is a Calculator object,
+    which makes the current KernelProfile object (if any) accumulate the
+    calls of the function.
+    """
+    @functools.wraps(func)
+    def wrapper(calc, *args):
+        """
+        wrapper function nested in profiled decorator.
+        """
+        if PROFILE is None:
+            return func(calc, *args)
+        return PROFILE.call(func.__name__, calc.array_len, 0,
+                            func, calc, *args)
+    return wrapper
+
+
+# Directory in which the functions that are generated from strings are
+# written as Python source files, so that numba can save their compiled
+# code in its on-disk cache and reuse it in later Python processes; set
+# by the TAXCALCCACHEDIR environment variable, and when it is not set,
+# generated functions are not written to disk and not cached by numba
+CACHE_DIR = os.environ.get('TAXCALCCACHEDIR')
+
+
+@functools.lru_cache(maxsize=None)
+def source_file_digest(file_path):
+    """
+    Return SHA-256 digest of the contents of the specified source file.
+    """
+    with open(file_path, 'rb') as sfile:
+        return hashlib.sha256(sfile.read()).digest()
+
+
+def generated_function(func_str, func_name, funcglobals, called_funcs):
+    """
+    Return the function named func_name that is defined by the code in the
+    func_str string and that has the funcglobals dictionary as its global
+    variables.
+
+    When CACHE_DIR is not None, the code is written to a source file in a
+    CACHE_DIR subdirectory specific to the taxcalc version (unless the file
+    is already there), so that the returned function can be jitted with
+    cache=True.  The file name contains a digest of the code and of the
+    source files that define the called_funcs, so changing either one
+    implies a different file and, therefore, a new numba cache entry.
+    """
+    module_name = generated_module_name(func_str, func_name, called_funcs)
+    if CACHE_DIR is None:
+        func_code = compile(func_str, "<string>", "exec")
+        fakeglobals = {}
+        eval(func_code,  # pylint: disable=eval-used
+             funcglobals, fakeglobals)
+        gfunc = fakeglobals[func_name]
+    else:
+        module = generated_module(func_str, module_name, funcglobals)
+        gfunc = getattr(module, func_name)
+    gfunc.generated_name = module_name
+    return gfunc
+
+
+def generated_module_name(func_str, func_name, called_funcs):
+    """
+    Return name of the module that contains the generated function named
+    func_name, which contains a digest of the func_str code and of the
+    source files that define the called_funcs.
+    """
+    digest = hashlib.sha256(func_str.encode('utf-8'))
+    for func in called_funcs:
+        func = getattr(func, 'py_func', func)
+        digest.update(source_file_digest(inspect.getsourcefile(func)))
+    return f'{func_name}_{digest.hexdigest()[:24]}'
+
+
+def generated_module(func_str, module_name, funcglobals):
+    """
+    Return module named module_name that is imported from the source file
+    in CACHE_DIR containing the func_str code (which is written only when
+    the file does not exist) after adding funcglobals to its globals.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from taxcalc import __version__
+    module_dir = os.path.join(CACHE_DIR, f'taxcalc-{__version__}')
+    module_path = os.path.join(module_dir, module_name + '.py')
+    if not os.path.isfile(module_path):
+        os.makedirs(module_dir, exist_ok=True)
+        # write to a temporary file first so that other processes sharing
+        # the cache directory never see a partially written file
+        temp_path = f'{module_path}.{os.getpid()}'
+        with open(temp_path, 'w', encoding='utf-8') as gfile:
+            gfile.write(func_str)
+        os.replace(temp_path, module_path)
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    module.__dict__.update(funcglobals)
+    spec.loader.exec_module(module)
+    # numba looks up the module of a cached function when loading it
+    sys.modules[module_name] = module
+    return module
+
+
+# Name of the optional ahead-of-time compiled bundle of generated functions
+# (see the aotbuild.py module), which is an extension module in the taxcalc
+# package accompanied by a JSON file that contains the argument types of
+# each function in the bundle; the bundle is used when it exists unless the
+# NOTAXCALCAOT environment variable is set
+AOT_BUNDLE_NAME = '_aotkernels'
+USE_AOT_BUNDLE = 'NOTAXCALCAOT' not in os.environ
+
+# Generated functions jitted by jit_generated_function (which are the
+# functions compiled into the ahead-of-time bundle by aotbuild.py)
+GENERATED_DISPATCHERS = []
+
+
+@functools.lru_cache(maxsize=None)
+def aot_bundle():
+    """
+    Return (module, arg_types) tuple for the ahead-of-time compiled bundle,
+    where arg_types is a dictionary of the string representations of the
+    numba types of the arguments of each bundle function indexed by its
+    name, or return None when there is no bundle.
+    """
+    types_path = os.path.join(os.path.dirname(__file__),
+                              AOT_BUNDLE_NAME + '.json')
+    try:
+        module = importlib.import_module('taxcalc.' + AOT_BUNDLE_NAME)
+        with open(types_path, 'r', encoding='utf-8') as tfile:
+            arg_types = json.load(tfile)
+    except (ImportError, OSError):
+        return None
+    return module, arg_types
+
+
+def jit_generated_function(gfunc, signature=None, **kwargs):
+    """
+    Return jitted version of the specified function returned by the
+    generated_function function using the specified JIT keyword arguments,
+    which is compiled immediately when signature (a tuple of numba types of
+    the function arguments) is not None.
+
+    When the ahead-of-time compiled bundle contains a serial version of the
+    function, calls with arguments of exactly the types used to compile it
+    execute the bundle version, while other calls execute the jitted
+    version, so using the bundle never changes results.
+    """
+    jit_args = [] if signature is None else [signature]
+    jitted = JIT(*jit_args, cache=CACHE_DIR is not None, **kwargs)(gfunc)
+    if not isinstance(jitted, numba.core.dispatcher.Dispatcher):
+        return jitted
+    if kwargs.get('parallel'):
+        return jitted
+    GENERATED_DISPATCHERS.append(jitted)
+    bundle = aot_bundle() if USE_AOT_BUNDLE else None
+    if bundle is None or gfunc.generated_name not in bundle[1]:
+        return jitted
+    aot_func = getattr(bundle[0], gfunc.generated_name)
+    aot_arg_types = bundle[1][gfunc.generated_name]
+
+    def aot_or_jitted(*args):
+        """
+        aot_or_jitted function nested in jit_generated_function.
+        """
+        # the bundle function does not check the types of its arguments
+        if [str(numba.typeof(arg)) for arg in args] == aot_arg_types:
+            return aot_func(*args)
+        return jitted(*args)
+
+    return aot_or_jitted
+
 
 class GetReturnNode(ast.NodeVisitor):
     """
@@ -58,7 +407,7 @@ class GetReturnNode(ast.NodeVisitor):
         return [node.value.id]
 
 
-def create_apply_function_string(sigout, sigin, parameters):
+def create_apply_function_string(sigout, sigin, parameters, parallel=False):
     """
     Create a string for a function of the form::
 
@@ -68,7 +417,8 @@ def create_apply_function_string(sigout, sigin, parameters):
            return x_0[i], ...
 
     where the specific args to jitted_f and the number of
-    values to return is determined by sigout and sigin.
+    values to return is determined by sigout and sigin,
+    and where the loop uses prange instead of range when parallel is True.
 
     Parameters
     ----------
@@ -80,6 +430,8 @@ def create_apply_function_string(sigout, sigin, parameters):
                 variables (as opposed to column records). This influences
                 how we construct the apply-style function
 
+    parallel: Bool, if True, loop over the records with numba.prange
+
     Returns
     -------
     a String representing the function
@@ -90,7 +442,8 @@ def create_apply_function_string(sigout, sigin, parameters):
     in_args = ["x_" + str(i) for i in range(len(sigout), total_len)]
 
     fstr.write(f"def ap_func({','.join(out_args + in_args)}):\n")
-    fstr.write("  for i in range(len(x_0)):\n")
+    loop_range = "prange" if parallel else "range"
+    fstr.write(f"  for i in {loop_range}(len(x_0)):\n")
     out_index = [x + "[i]" for x in out_args]
     in_index = []
     for arg, _var in zip(in_args, sigin):
@@ -101,14 +454,27 @@ def create_apply_function_string(sigout, sigin, parameters):
     return fstr.getvalue()
 
 
+def get_values(x):
+    """
+    Return the numpy array underlying x when x is a Pandas Series;
+    otherwise, return x unchanged.
+    """
+    if isinstance(x, pd.Series):
+        return x.values
+    return x
+
+
 def create_toplevel_function_string(args_out, args_in, pm_or_pf):
     """
     Create a string for a function of the form:
 
-        def hl_func(x_0, x_1, x_2, ...):
+        def hl_func(pm, pf):
             outputs = (...) = calc_func(...)
-            header = [...]
-            return DataFrame(data, columns=header)
+            return outputs
+
+    The returned outputs are the very arrays that calc_func updated in
+    place (a tuple of them when there is more than one output), so no
+    new arrays are allocated when calling the function.
 
     Parameters
     ----------
@@ -125,19 +491,7 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf):
     fstr = io.StringIO()
     fstr.write("def hl_func(pm, pf")
     fstr.write("):\n")
-    fstr.write("    from pandas import DataFrame\n")
-    fstr.write("    import numpy as np\n")
-    fstr.write("    import pandas as pd\n")
-    fstr.write("    def get_values(x):\n")
-    fstr.write("        if isinstance(x, pd.Series):\n")
-    fstr.write("            return x.values\n")
-    fstr.write("        else:\n")
-    fstr.write("            return x\n")
     fstr.write("    outputs = \\\n")
-
-    outs = []
-    for ppp, attr in zip(pm_or_pf, args_out + args_in):
-        outs.append(ppp + "." + attr + ", ")
     outs = [m_or_f + "." + arg for m_or_f, arg in zip(pm_or_pf, args_out)]
     fstr.write("        (" + ", ".join(outs) + ") = \\\n")
     fstr.write("        " + "applied_f(")
@@ -147,16 +501,7 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf):
             attr += "[0]"
         fstr.write("get_values(" + ppp + "." + attr + ")" + ", ")
     fstr.write(")\n")
-    fstr.write("    header = [")
-    col_headers = ["'" + out + "'" for out in args_out]
-    fstr.write(", ".join(col_headers))
-    fstr.write("]\n")
-    if len(args_out) == 1:
-        fstr.write("    return DataFrame(data=outputs,"
-                   "columns=header)")
-    else:
-        fstr.write("    return DataFrame(data=np.column_stack("
-                   "outputs),columns=header)")
+    fstr.write("    return outputs")
     return fstr.getvalue()
 
 
@@ -180,22 +525,29 @@ def make_apply_function(func, out_args, in_args, parameters,
 
     do_jit: Bool, if True, jit the resulting apply-style function
 
+    kwargs: numba.jit keyword arguments, where parallel=True implies that
+            the apply-style function loops over the records in parallel
+            threads (even when do_jit is False)
+
     Returns
     -------
     apply-style function
     """
+    parallel = kwargs.pop('parallel', False)
     if do_jit:
         jitted_f = JIT(**kwargs)(func)
     else:
         jitted_f = func
-    apfunc = create_apply_function_string(out_args, in_args, parameters)
-    func_code = compile(apfunc, "<string>", "exec")
-    fakeglobals = {}
-    eval(func_code,  # pylint: disable=eval-used
-         {"jitted_f": jitted_f}, fakeglobals)
+    apfunc = create_apply_function_string(out_args, in_args, parameters,
+                                          parallel=parallel)
+    ap_func = generated_function(apfunc, "ap_func",
+                                 {"jitted_f": jitted_f,
+                                  "prange": numba.prange}, [func])
     if do_jit:
-        return JIT(**kwargs)(fakeglobals['ap_func'])
-    return fakeglobals['ap_func']
+        if parallel:
+            kwargs = dict(kwargs, parallel=True)
+        return jit_generated_function(ap_func, **kwargs)
+    return ap_func
 
 
 def apply_jit(dtype_sig_out, dtype_sig_in, parameters=None, **kwargs):
@@ -237,6 +589,354 @@ def apply_jit(dtype_sig_out, dtype_sig_in, parameters=None, **kwargs):
     return make_wrapper
 
 
+@functools.lru_cache(maxsize=None)
+def records_variable_dtypes():
+    """
+    Return dictionary of the numpy dtypes of the Records variables indexed
+    by variable name, as specified in the records_variables.json file.
+    """
+    path = os.path.join(os.path.dirname(__file__), 'records_variables.json')
+    with open(path, 'r', encoding='utf-8') as vfile:
+        vardict = json.load(vfile)
+    dtypes = {}
+    for vartype in ['read', 'calc']:
+        for name, info in vardict[vartype].items():
+            if info['type'] == 'int':
+                dtypes[name] = np.dtype(np.int32)
+            else:
+                dtypes[name] = np.dtype(np.float64)
+    return dtypes
+
+
+@functools.lru_cache(maxsize=None)
+def policy_parameter_types():
+    """
+    Return dictionary of the numba types of the values of the policy
+    parameters for one year, which are the values that the calc-style
+    functions are called with, indexed by parameter name (with and without
+    its leading underscore character), as specified by the types and value
+    labels in the policy_current_law.json file.
+    """
+    path = os.path.join(Policy.DEFAULTS_FILE_PATH, Policy.DEFAULTS_FILE_NAME)
+    with open(path, 'r', encoding='utf-8') as pfile:
+        paramdict = json.load(pfile)
+    scalar_types = {'float': numba.float64,
+                    'int': numba.from_dtype(np.array(0).dtype),
+                    'bool': numba.boolean}
+    ptypes = {}
+    for name, info in paramdict.items():
+        if name == 'schema':
+            continue
+        ptype = scalar_types[info['type']]
+        # a parameter with values for each label value (such as each MARS
+        # value) has a one-dimensional array of values for one year
+        if any(set(val) - {'year', 'value'} for val in info['value']):
+            ptype = numba.types.Array(ptype, 1, 'C')
+        ptypes[name] = ptype
+        ptypes['_' + name] = ptype
+    return ptypes
+
+
+@functools.lru_cache(maxsize=None)
+def array_type(dtype, readonly):
+    """
+    Return numba type of a one-dimensional C-contiguous array of the
+    specified numpy dtype, which is read-only when readonly is True.
+    """
+    return numba.types.Array(numba.from_dtype(dtype), 1, 'C',
+                             readonly=readonly)
+
+
+def argument_signature(arg_names, pm_or_pf, values, pm):
+    """
+    Return tuple of the numba types of the values of the arguments named in
+    arg_names, which are held by the objects specified in pm_or_pf.
+
+    The types of policy parameters (when pm is a Policy object) are those
+    in policy_parameter_types and the types of Records variable arrays
+    are those of arrays of their dtypes (which coerce_records_arrays makes
+    the dtypes specified in records_variables.json or narrower dtypes of
+    the same kind), so the signature is found without calling numba.typeof
+    except for other arguments.
+    """
+    ptypes = policy_parameter_types() if isinstance(pm, Policy) else {}
+    dtypes = records_variable_dtypes()
+    signature = []
+    for ppp, name, value in zip(pm_or_pf, arg_names, values):
+        if ppp == "pm" and name in ptypes:
+            signature.append(ptypes[name])
+        elif (ppp == "pf" and name in dtypes and
+              isinstance(value, np.ndarray) and value.ndim == 1 and
+              value.flags.c_contiguous):
+            signature.append(array_type(value.dtype,
+                                        not value.flags.writeable))
+        else:
+            signature.append(numba.typeof(value))
+    return tuple(signature)
+
+
+# Number of times each signature mismatch has been found by the functions
+# created by iterate_jit and fused_jit indexed by a mismatch description
+SIGNATURE_MISMATCHES = collections.Counter()
+
+
+def signature_mismatches():
+    """
+    Return dictionary of the number of times each signature mismatch has
+    been found indexed by a description of the mismatch.  A mismatch is
+    found when a Records variable array does not have the dtype specified
+    in records_variables.json (or a narrower dtype of the same kind), so
+    the array is coerced to that dtype, and when a function is called with
+    a parameter value of a different type than in earlier calls, so the
+    function is compiled for an additional signature.
+    """
+    return dict(SIGNATURE_MISMATCHES)
+
+
+def coerce_records_arrays(func_name, pf, names):
+    """
+    Replace each pf array named in names that does not have the dtype of
+    the Records variable with that name by a copy that has that dtype,
+    recording the signature mismatch.  An array of a narrower dtype of the
+    same kind (such as the float32 and int8 arrays of a Records object
+    with compact storage) is left as it is, so the functions are compiled
+    for its dtype rather than widening it.
+    """
+    dtypes = records_variable_dtypes()
+    for name in names:
+        dtype = dtypes.get(name)
+        if dtype is None:
+            continue
+        value = getattr(pf, name)
+        narrower = (value.dtype.kind == dtype.kind and
+                    value.dtype.itemsize < dtype.itemsize)
+        if value.dtype != dtype and not narrower:
+            SIGNATURE_MISMATCHES[
+                f'{func_name}: {name} array of {value.dtype} type '
+                f'coerced to {dtype} type'
+            ] += 1
+            setattr(pf, name, np.asarray(get_values(value), dtype=dtype))
+
+
+def check_signature(func_name, arg_names, arg_types, earlier_arg_types):
+    """
+    Record the signature mismatch, if any, between arg_types and each of
+    the earlier_arg_types used to compile the function named func_name.
+    """
+    for other_types in earlier_arg_types:
+        for name, atype, otype in zip(arg_names, arg_types, other_types):
+            if atype != otype:
+                SIGNATURE_MISMATCHES[
+                    f'{func_name}: {name} of {atype} type instead of '
+                    f'{otype} type, so compiled for another signature'
+                ] += 1
+
+
+def apply_vectorized(vfunc, arg_names, pm_or_pf, pm, pf, num_outputs):
+    """
+    Call the vectorized function vfunc (see vectorize.py) with the values of
+    all but the first num_outputs of the arguments named in arg_names, which
+    are held by the objects specified in pm_or_pf, and store its results in
+    the first num_outputs arguments.
+
+    Returns
+    -------
+    the output arrays (a tuple of them when there is more than one output),
+    just like the functions created by create_toplevel_function_string
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    objs = {"pm": pm, "pf": pf}
+    values = []
+    for ppp, name in zip(pm_or_pf, arg_names):
+        value = getattr(objs[ppp], name)
+        # Bring Policy parameter values down a dimension.
+        values.append(get_values(value[0] if ppp == "pm" else value))
+    # the values computed for the filing units that do not take a branch of
+    # an if statement are discarded, so floating-point errors in them (such
+    # as division by zero) are ignored
+    with np.errstate(all="ignore"):
+        results = vfunc(*values[num_outputs:])
+    if num_outputs == 1:
+        results = (results,)
+    outputs = values[:num_outputs]
+    for ppp, name, output, result in zip(pm_or_pf, arg_names,
+                                         outputs, results):
+        output[...] = result
+        if ppp == "pm":
+            setattr(pm, name, output)
+    if num_outputs == 1:
+        return outputs[0]
+    return tuple(outputs)
+
+
+# Description of a calc-style function decorated by iterate_jit: its
+# possibly-jitted version, the names of its in and out arguments, the names
+# of its in arguments that are parameters, and its numba.jit arguments
+Kernel = collections.namedtuple(
+    'Kernel', ['jitted_f', 'in_args', 'out_args', 'parameters', 'jit_kwargs']
+)
+
+
+@functools.lru_cache(maxsize=None)
+def policy_parameter_names():
+    """
+    Return set of policy parameter names, each with and without its leading
+    underscore character, which is created only once for all calc-style
+    functions decorated by iterate_jit.
+    """
+    param_list = Policy.parameter_list()
+    return frozenset(param_list + [arg[1:] for arg in param_list])
+
+
+def outputs_or_dataframe(outputs, out_args, return_dataframe):
+    """
+    Return the outputs of a function created by iterate_jit or, when
+    return_dataframe is True, a Pandas DataFrame that contains a copy of
+    the outputs in columns named by out_args.
+    """
+    if not return_dataframe:
+        return outputs
+    if len(out_args) == 1:
+        return pd.DataFrame(data=outputs, columns=out_args)
+    return pd.DataFrame(data=np.column_stack(outputs), columns=out_args)
+
+
+def make_kernel(func, parameters, decorator_kwargs):
+    """
+    Return a Kernel that describes the calc-style function func decorated
+    by iterate_jit with the specified parameters and keyword arguments.
+    """
+    # Get the input arguments from the function
+    in_args = inspect.getfullargspec(func).args
+    # Get the numba.jit arguments
+    jit_args_list = inspect.getfullargspec(JIT).args + ['nopython']
+    kwargs_for_jit = {key: val for key, val in decorator_kwargs.items()
+                      if key in jit_args_list}
+
+    # Any name that is a parameter
+    # Boolean flag is given special treatment.
+    # Identify those names here
+    allowed_parameters = policy_parameter_names()
+    additional_parameters = [arg for arg in in_args if
+                             arg in allowed_parameters]
+    additional_parameters += parameters
+    # Remote duplicates
+    all_parameters = list(set(additional_parameters))
+
+    src = inspect.getsourcelines(func)[0]
+
+    # Discover the return arguments by walking
+    # the AST of the function
+    grn = GetReturnNode()
+    all_out_args = None
+    for node in ast.walk(ast.parse(''.join(src))):
+        all_out_args = grn.visit(node)
+        if all_out_args:
+            break
+    if not all_out_args:
+        raise ValueError("Can't find return statement in function!")
+
+    # Now create the possibly-jitted calc-style function
+    if DO_JIT:
+        jitted_f = JIT(**kwargs_for_jit)(func)
+    else:
+        jitted_f = func
+    return Kernel(jitted_f, in_args, all_out_args,
+                  all_parameters, kwargs_for_jit)
+
+
+@functools.lru_cache(maxsize=None)
+def vectorized_function(func):
+    """
+    Return the vectorized version of the calc-style function func (see
+    vectorize.py), or None when func cannot be vectorized, in which case
+    the apply-style function that loops over the filing units is used even
+    when VECTORIZED is True.
+    """
+    try:
+        return vectorize(func)
+    except ValueError:
+        return None
+
+
+def make_applied_function(kern, parallel, signature):
+    """
+    Return the apply-style possibly-jitted function for the Kernel kern,
+    which calls the possibly-jitted calc-style function and which is
+    compiled for the explicit signature.
+    """
+    applied_f = make_apply_function(kern.jitted_f,
+                                    list(reversed(kern.out_args)),
+                                    kern.in_args,
+                                    parameters=kern.parameters,
+                                    do_jit=False,
+                                    parallel=parallel)
+    if DO_JIT:
+        if parallel:
+            return jit_generated_function(applied_f, signature,
+                                          parallel=True,
+                                          **kern.jit_kwargs)
+        return jit_generated_function(applied_f, signature,
+                                      **kern.jit_kwargs)
+    return applied_f
+
+
+def argument_holders(names, pm, pf):
+    """
+    Return list that contains "pm" or "pf" for each of the arguments named
+    in names that is held by the pm or pf object.
+    """
+    pm_or_pf = []
+    for farg in names:
+        if hasattr(pm, farg):
+            pm_or_pf.append("pm")
+        elif hasattr(pf, farg):
+            pm_or_pf.append("pf")
+    return pm_or_pf
+
+
+def high_level_function(wrapper, func_name, pm_or_pf, signature):
+    """
+    Return the high level function of the wrapper function created by
+    iterate_jit for the layout of arguments specified by pm_or_pf, the
+    looping mode, and the signature, creating it and remembering it in
+    wrapper.hl_func_cache only on the first call.
+    """
+    layout = (tuple(pm_or_pf), PARALLEL, signature)
+    high_level_fn = wrapper.hl_func_cache.get(layout)
+    if high_level_fn is not None:
+        wrapper.hl_func_cache_hits += 1
+        return high_level_fn
+    kern = wrapper.kernel()
+    check_signature(func_name, kern.out_args + kern.in_args, signature,
+                    [key[2] for key in wrapper.hl_func_cache
+                     if key[:2] == layout[:2]])
+    high_level_func = create_toplevel_function_string(
+        kern.out_args, list(kern.in_args), pm_or_pf
+    )
+    func_code = compile(high_level_func, "<string>", "exec")
+    fakeglobals = {}
+    eval(func_code,  # pylint: disable=eval-used
+         {"applied_f": make_applied_function(kern, PARALLEL, signature),
+          "get_values": get_values}, fakeglobals)
+    high_level_fn = fakeglobals['hl_func']
+    wrapper.hl_func_cache[layout] = high_level_fn
+    return high_level_fn
+
+
+def call_profiled(name, names, func, pm, pf, *args, **kwargs):
+    """
+    Return func(pm, pf, *args, **kwargs) after adding its call, with the
+    sizes of the pm and pf arrays named in names, to the statistics for
+    the name in the current KernelProfile object (if any).
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if PROFILE is None:
+        return func(pm, pf, *args, **kwargs)
+    records, nbytes = argument_sizes(pm, pf, names)
+    return PROFILE.call(name, records, nbytes, func, pm, pf, *args, **kwargs)
+
+
 def iterate_jit(parameters=None, **kwargs):
     """
     Public decorator for a calc-style function (see calcfunctions.py) that
@@ -252,79 +952,349 @@ def iterate_jit(parameters=None, **kwargs):
         make_wrapper function nested in iterate_jit decorator
         wraps specified func using apply_jit.
         """
-        # pylint: disable=too-many-locals
-        # Get the input arguments from the function
-        in_args = inspect.getfullargspec(func).args
-        # Get the numba.jit arguments
-        jit_args_list = inspect.getfullargspec(JIT).args + ['nopython']
-        kwargs_for_jit = {}
-        for key, val in kwargs.items():
-            if key in jit_args_list:
-                kwargs_for_jit[key] = val
-
-        # Any name that is a parameter
-        # Boolean flag is given special treatment.
-        # Identify those names here
-        param_list = Policy.parameter_list()
-        allowed_parameters = param_list
-        allowed_parameters += list(arg[1:] for arg in param_list)
-        additional_parameters = [arg for arg in in_args if
-                                 arg in allowed_parameters]
-        additional_parameters += parameters
-        # Remote duplicates
-        all_parameters = list(set(additional_parameters))
-
-        src = inspect.getsourcelines(func)[0]
-
-        # Discover the return arguments by walking
-        # the AST of the function
-        grn = GetReturnNode()
-        all_out_args = None
-        for node in ast.walk(ast.parse(''.join(src))):
-            all_out_args = grn.visit(node)
-            if all_out_args:
-                break
-        if not all_out_args:
-            raise ValueError("Can't find return statement in function!")
-
-        # Now create the apply-style possibly-jitted function
-        applied_jitted_f = make_apply_function(func,
-                                               list(reversed(all_out_args)),
-                                               in_args,
-                                               parameters=all_parameters,
-                                               do_jit=DO_JIT,
-                                               **kwargs_for_jit)
-
-        def wrapper(*args, **kwargs):
+        @functools.lru_cache(maxsize=None)
+        def kernel():
+            """
+            kernel function nested in make_wrapper function nested in
+            iterate_jit decorator.
+
+            Returns a Kernel that describes func, which is created on the
+            first call rather than when func is decorated, so that the work
+            is done only for functions that are used (and not at all when
+            taxcalc is imported by code that does no tax calculations).
+            """
+            return make_kernel(func, parameters, kwargs)
+
+        def wrapper(*args, return_dataframe=False, **kwargs):
             """
             wrapper function nested in make_wrapper function nested
             in iterate_jit decorator.
+
+            Returns the output arrays, which have been updated in place,
+            or when return_dataframe is True, a Pandas DataFrame that
+            contains a copy of the output arrays.
             """
             # os TESTING environment only accepts string arguments
             if os.getenv('TESTING') == 'True':
                 return func(*args, **kwargs)
+            kern = kernel()
+            outputs = call_profiled(func.__name__,
+                                    kern.out_args + kern.in_args,
+                                    apply_kernel, *args, **kwargs)
+            return outputs_or_dataframe(outputs, kern.out_args,
+                                        return_dataframe)
 
-            in_arrays = []
-            pm_or_pf = []
-            for farg in all_out_args + in_args:
-                if hasattr(args[0], farg):
-                    in_arrays.append(getattr(args[0], farg))
-                    pm_or_pf.append("pm")
-                elif hasattr(args[1], farg):
-                    in_arrays.append(getattr(args[1], farg))
-                    pm_or_pf.append("pf")
-            # Create the high level function
-            high_level_func = create_toplevel_function_string(all_out_args,
-                                                              list(in_args),
-                                                              pm_or_pf)
-            func_code = compile(high_level_func, "<string>", "exec")
-            fakeglobals = {}
-            eval(func_code,  # pylint: disable=eval-used
-                 {"applied_f": applied_jitted_f}, fakeglobals)
-            high_level_fn = fakeglobals['hl_func']
-            ans = high_level_fn(*args, **kwargs)
-            return ans
+        def apply_kernel(*args, **kwargs):
+            """
+            apply_kernel function nested in make_wrapper function nested
+            in iterate_jit decorator.
+
+            Returns the output arrays after updating them in place.
+            """
+            kern = kernel()
+            arg_names = kern.out_args + kern.in_args
+            pm_or_pf = argument_holders(arg_names, args[0], args[1])
+            # Coerce Records arrays to their specified dtypes and find the
+            # signature of the apply-style function for these arguments
+            coerce_records_arrays(func.__name__, args[1],
+                                  [name for ppp, name in zip(pm_or_pf,
+                                                             arg_names)
+                                   if ppp == "pf"])
+            if VECTORIZED and vectorized_function(func) is not None:
+                return apply_vectorized(vectorized_function(func),
+                                        arg_names, pm_or_pf, args[0],
+                                        args[1], len(kern.out_args))
+            pm_or_pf_values = [
+                get_values(getattr(args[0], name)[0]) if ppp == "pm" else
+                get_values(getattr(args[1], name))
+                for ppp, name in zip(pm_or_pf, arg_names)
+            ]
+            signature = argument_signature(arg_names, pm_or_pf,
+                                           pm_or_pf_values, args[0])
+            high_level_fn = high_level_function(wrapper, func.__name__,
+                                                pm_or_pf, signature)
+            return high_level_fn(*args, **kwargs)
 
+        # cache of high level functions keyed by argument layout, looping
+        # mode, and signature and the number of calls that found their key
+        # in the cache
+        wrapper.hl_func_cache = {}
+        wrapper.hl_func_cache_hits = 0
+        # what is needed to call the calc-style function one filing unit
+        # at a time in a fused function (see fused_jit)
+        wrapper.kernel = kernel
         return wrapper
 
     return make_wrapper
+
+
+def kernel_variables(func):
+    """
+    Return (inputs, outputs) tuple of the sets of names of the Records
+    variables that are arguments of, and that are returned by, the
+    calc-style function wrapped by func, which is an apply-style function
+    created by the iterate_jit decorator.
+    """
+    kern = func.kernel()
+    inputs = frozenset(kern.in_args) - frozenset(kern.parameters)
+    return (inputs, frozenset(kern.out_args))
+
+
+def code_names(code):
+    """
+    Return two lists of the variable names in the specified code string:
+    the names that are used anywhere in the code and the names that are
+    assigned a value in the code.
+    """
+    used = []
+    assigned = []
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Name):
+            if node.id not in used:
+                used.append(node.id)
+            if isinstance(node.ctx, ast.Store) and node.id not in assigned:
+                assigned.append(node.id)
+    return used, assigned
+
+
+def create_fused_function_string(steps, arrays, params, dtypes,
+                                 parallel=False, vectorized=False):
+    """
+    Create a string for a function of the form::
+
+       def fused_func(a_v, a_w, ..., p, q, ...):
+           for i in range(len(a_v)):
+               v = a_v[i]
+               w = a_w[i]
+               ...
+               (v, ...) = jitted_F(p, w, ...)
+               v = float64(v)
+               ...
+               a_v[i] = v
+               ...
+
+    which calls in sequence, one filing unit at a time, the calc-style
+    functions in steps, keeping all intermediate values in local scalar
+    variables rather than storing them in arrays between the calls.
+
+    When vectorized is True, the function has the same body without the
+    loop and returns a tuple of the values of the assigned arrays instead
+    of storing them, which is the form translated by vectorize.py.
+
+    Parameters
+    ----------
+    steps: iterable of steps, where each step is one of the following:
+           (a) a function returned by the iterate_jit decorator,
+           (b) a string of Python code that uses scalar variables, or
+           (c) a (condition, if_steps, else_steps) tuple, where condition
+               is a string containing a Python expression and if_steps
+               (else_steps) are executed when the condition is (is not)
+               true.
+
+    arrays: iterable of variable names that are arrays of filing-unit
+            values (as opposed to parameters or local variables)
+
+    params: iterable of variable names that are parameters
+
+    dtypes: dictionary of numpy dtype names indexed by array name, which
+            are used to cast each value returned by a calc-style function
+            just as storing the value in its array would
+
+    parallel: Bool, if True, loop over the filing units with numba.prange
+
+    vectorized: Bool, if True, create the function without the loop
+
+    Returns
+    -------
+    a String representing the function
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    arrays = list(arrays)
+    assigned = set()
+
+    def write_steps(fstr, steps, indent):
+        """
+        write_steps function nested in create_fused_function_string.
+        """
+        for step in steps:
+            if isinstance(step, str):
+                for line in step.splitlines():
+                    fstr.write(indent + line + "\n")
+                assigned.update(code_names(step)[1])
+            elif isinstance(step, tuple):
+                condition, if_steps, else_steps = step
+                fstr.write(indent + "if " + condition + ":\n")
+                write_steps(fstr, if_steps, indent + "    ")
+                fstr.write(indent + "else:\n")
+                write_steps(fstr, else_steps, indent + "    ")
+            else:
+                kern = step.kernel()
+                if len(kern.out_args) == 1:
+                    outs = kern.out_args[0]
+                else:
+                    outs = "(" + ", ".join(kern.out_args) + ")"
+                fstr.write(indent + outs + " = jitted_" +
+                           kern.jitted_f.__name__ + "(" +
+                           ", ".join(kern.in_args) + ")\n")
+                for out in kern.out_args:
+                    if out in dtypes:
+                        fstr.write(f"{indent}{out} = {dtypes[out]}({out})\n")
+                assigned.update(kern.out_args)
+
+    body = io.StringIO()
+    write_steps(body, steps, "    " if vectorized else "        ")
+    fstr = io.StringIO()
+    args = ["a_" + name for name in arrays] + list(params)
+    fstr.write("def fused_func(" + ", ".join(args) + "):\n")
+    if vectorized:
+        for name in arrays:
+            fstr.write("    " + name + " = a_" + name + "\n")
+        fstr.write(body.getvalue())
+        fstr.write("    return (" +
+                   "".join(name + ", " for name in arrays
+                           if name in assigned) + ")\n")
+        return fstr.getvalue()
+    loop_range = "prange" if parallel else "range"
+    fstr.write(f"    for i in {loop_range}(len(a_{arrays[0]})):\n")
+    for name in arrays:
+        fstr.write("        " + name + " = a_" + name + "[i]\n")
+    fstr.write(body.getvalue())
+    for name in arrays:
+        if name in assigned:
+            fstr.write("        a_" + name + "[i] = " + name + "\n")
+    return fstr.getvalue()
+
+
+def fused_jit(steps):
+    """
+    Return a function that can be called with (pm, pf) arguments like the
+    functions returned by the iterate_jit decorator, but that executes all
+    the specified steps (see create_fused_function_string for the kinds of
+    steps) in a single pass over the filing units.  The results are the
+    same as calling the steps one after the other, but the values computed
+    by one calc-style function and used by a later one never have to be
+    stored in, and then read back from, their arrays between the calls.
+    When VECTORIZED is True, the steps are instead executed by a vectorized
+    version of the fused function (see vectorize.py).
+    """
+    # pylint: disable=too-many-statements
+
+    def step_names(steps):
+        """
+        step_names function nested in fused_jit function.
+        """
+        names = []
+        for step in steps:
+            if isinstance(step, str):
+                step_vars = code_names(step)[0]
+            elif isinstance(step, tuple):
+                step_vars = (code_names(step[0])[0] +
+                             step_names(step[1]) + step_names(step[2]))
+            else:
+                step_vars = step.kernel().out_args + step.kernel().in_args
+            names.extend(var for var in step_vars if var not in names)
+        return names
+
+    def kernels(steps):
+        """
+        kernels function nested in fused_jit function.
+        """
+        for step in steps:
+            if isinstance(step, tuple):
+                yield from kernels(step[1])
+                yield from kernels(step[2])
+            elif not isinstance(step, str):
+                yield step
+
+    @functools.lru_cache(maxsize=None)
+    def all_names():
+        """
+        all_names function nested in fused_jit function, which finds the
+        names used in the steps on the first call (rather than when the
+        fused function is defined) for the reason given in iterate_jit.
+        """
+        return step_names(steps)
+
+    def wrapper(pm, pf):
+        """
+        wrapper function nested in fused_jit function.
+        """
+        call_profiled("fused_func", all_names(), apply_fused, pm, pf)
+
+    def apply_fused(pm, pf):
+        """
+        apply_fused function nested in fused_jit function.
+        """
+        params = [name for name in all_names() if hasattr(pm, name)]
+        arrays = [name for name in all_names()
+                  if name not in params and hasattr(pf, name)]
+        coerce_records_arrays("fused_func", pf, arrays)
+        values = ([get_values(getattr(pf, name)) for name in arrays] +
+                  [getattr(pm, name)[0] for name in params])
+        dtypes = {name: val.dtype.name for name, val in zip(arrays, values)}
+        if VECTORIZED:
+            apply_fused_vectorized(arrays, params, dtypes, values)
+            return
+        signature = argument_signature(arrays + params,
+                                       ["pf"] * len(arrays) +
+                                       ["pm"] * len(params), values, pm)
+        # Get the fused function for this layout of arguments, looping
+        # mode, and signature, creating and remembering it only on the
+        # first call
+        layout = (tuple(arrays + params), PARALLEL, signature)
+        fused_fn = wrapper.fused_func_cache.get(layout)
+        if fused_fn is None:
+            check_signature("fused_func", arrays + params, signature,
+                            [key[2] for key in wrapper.fused_func_cache
+                             if key[:2] == layout[:2]])
+            fused_func = create_fused_function_string(steps, arrays,
+                                                      params, dtypes,
+                                                      parallel=PARALLEL)
+            jitted_funcs = [step.kernel().jitted_f
+                            for step in kernels(steps)]
+            funcglobals = {"jitted_" + jfunc.__name__: jfunc
+                           for jfunc in jitted_funcs}
+            funcglobals.update({dtype: getattr(np, dtype)
+                                for dtype in set(dtypes.values())})
+            funcglobals["prange"] = numba.prange
+            fused_fn = generated_function(fused_func, "fused_func",
+                                          funcglobals, jitted_funcs)
+            if DO_JIT:
+                fused_fn = jit_generated_function(fused_fn, signature,
+                                                  nopython=True,
+                                                  parallel=PARALLEL)
+            wrapper.fused_func_cache[layout] = fused_fn
+        fused_fn(*values)
+
+    def apply_fused_vectorized(arrays, params, dtypes, values):
+        """
+        apply_fused_vectorized function nested in fused_jit function, which
+        does the calculations using the vectorized version of the fused
+        function (see vectorize.py) and stores the results in the arrays.
+        """
+        layout = (tuple(arrays + params), tuple(dtypes.items()))
+        vfunc = wrapper.vectorized_func_cache.get(layout)
+        if vfunc is None:
+            fused_func = create_fused_function_string(steps, arrays,
+                                                      params, dtypes,
+                                                      vectorized=True)
+            funcglobals = {"jitted_" + step.kernel().jitted_f.__name__:
+                           step.kernel().jitted_f
+                           for step in kernels(steps)}
+            funcglobals.update({dtype: getattr(np, dtype)
+                                for dtype in set(dtypes.values())})
+            vfunc = vectorize_source(fused_func, funcglobals)
+            vfunc.assigned_arrays = GetReturnNode().visit(
+                ast.parse(fused_func).body[0].body[-1]
+            )
+            wrapper.vectorized_func_cache[layout] = vfunc
+        # see apply_vectorized for why floating-point errors are ignored
+        with np.errstate(all="ignore"):
+            results = vfunc(*values)
+        array_values = dict(zip(arrays, values))
+        for name, result in zip(vfunc.assigned_arrays, results):
+            array_values[name][...] = result
+
+    wrapper.fused_func_cache = {}
+    wrapper.vectorized_func_cache = {}
+    return wrapper
@@ -6,6 +6,7 @@ Tax-Calculator tax-filing-unit Records class.
 # pylint --disable=locally-disabled records.py
 
 import os
+import importlib.resources as implibres
 from pathlib import Path
 import numpy as np
 import pandas as pd
@@ -36,6 +37,13 @@ class Records(Data):
                         gfactors=None, weights=None)
         NOTE: data=None is allowed but the returned instance contains only
               the data variable information in the specified VARINFO file.
+        NOTE: data can also name a directory written by the write_npy_files
+              method, whose input arrays are memory-mapped read-only and
+              shared by all the processes that use the directory until
+              increment_year (or a Calculator method that changes one of
+              them) makes private copies of them; the values in such a
+              directory are not checked again because they were checked
+              before they were written.
 
     start_year: integer
         specifies calendar year of the input data;
@@ -76,6 +84,21 @@ class Records(Data):
         while TMD input data generated in the tax-microdata repository
         use a 1.0 weights_scale value.
 
+    compact: boolean
+        specifies whether or not the input variables are stored in compact
+        form after they have been checked, which means that the variables
+        in COMPACT_INTEGER_VARS are stored as int8 values and the
+        non-integer input variables other than the s006 sample weights are
+        stored as float32 values; default value is false, which implies
+        int32 and float64 values.  Compact storage uses less memory at the
+        cost of rounding the input values to about seven significant
+        digits; the calculated variables are still stored as float64
+        values, so with the CPS input data the Records arrays use about a
+        fifth (not half) less memory.  The tax calculations use the
+        compact arrays without widening them.  The NPY files written by the
+        write_npy_files method of a compact object contain compact arrays,
+        so they can be read only when compact is true.
+
     Raises
     ------
     ValueError:
@@ -108,6 +131,9 @@ class Records(Data):
 
     Use Records.tmd_constructor() to get a Records object instantiated
     with TMD input data developed in the tax-microdata repository.
+
+    Use Records.read_chunks() to get Records objects that each contain a
+    block of input data that are too large to be held in memory at once.
     """
     # suppress pylint warning about constructor having too many arguments:
     # pylint: disable=too-many-arguments
@@ -124,6 +150,7 @@ class Records(Data):
     PUF_RATIOS_FILENAME = 'puf_ratios.csv'
     CPS_WEIGHTS_FILENAME = 'cps_weights.csv.gz'
     CPS_RATIOS_FILENAME = None
+    COMPACT_INTEGER_VARS = frozenset(['MARS', 'EIC', 'agi_bin'])
     CODE_PATH = os.path.abspath(os.path.dirname(__file__))
     VARINFO_FILE_NAME = 'records_variables.json'
     VARINFO_FILE_PATH = CODE_PATH
@@ -135,11 +162,13 @@ class Records(Data):
                  weights=PUF_WEIGHTS_FILENAME,
                  adjust_ratios=PUF_RATIOS_FILENAME,
                  exact_calculations=False,
-                 weights_scale=0.01):
+                 weights_scale=0.01,
+                 compact=False):
         # pylint: disable=too-many-positional-arguments
-        # pylint: disable=no-member,too-many-branches
+        # pylint: disable=no-member
         if isinstance(weights, str):
             weights = os.path.join(Records.CODE_PATH, weights)
+        self.__compact = compact
         super().__init__(data, start_year, gfactors, weights, weights_scale)
         if data is None:
             return  # because there are no data
@@ -149,60 +178,19 @@ class Records(Data):
         # specify exact value based on exact_calculations
         self.exact[:] = np.where(exact_calculations is True, 1, 0)
         # specify FLPDYR value based on start_year
+        self._unmap(['FLPDYR'])
         self.FLPDYR.fill(start_year)
-        # check for valid MARS values
-        if not np.all(np.logical_and(np.greater_equal(self.MARS, 1),
-                                     np.less_equal(self.MARS, 5))):
-            raise ValueError('not all MARS values in [1,5] range')
         # create variables derived from MARS, which is in MUST_READ_VARS
         self.num[:] = np.where(self.MARS == 2, 2, 1)
         self.sep[:] = np.where(self.MARS == 3, 2, 1)
-        # check for valid EIC values
-        if not np.all(np.logical_and(np.greater_equal(self.EIC, 0),
-                                     np.less_equal(self.EIC, 3))):
-            raise ValueError('not all EIC values in [0,3] range')
-        # check that three sets of split-earnings variables have valid values
-        msg = 'expression "{0} == {0}p + {0}s" is not true for every record'
-        tol = 0.020001  # handles "%.2f" rounding errors
-        if not np.allclose(self.e00200, (self.e00200p + self.e00200s),
-                           rtol=0.0, atol=tol):
-            raise ValueError(msg.format('e00200'))
-        if not np.allclose(self.e00900, (self.e00900p + self.e00900s),
-                           rtol=0.0, atol=tol):
-            raise ValueError(msg.format('e00900'))
-        if not np.allclose(self.e02100, (self.e02100p + self.e02100s),
-                           rtol=0.0, atol=tol):
-            raise ValueError(msg.format('e02100'))
-        # check that spouse income variables have valid values
-        nospouse = self.MARS != 2
-        zeros = np.zeros_like(self.MARS[nospouse])
-        msg = '{} is not always zero for non-married filing unit'
-        if not np.allclose(self.e00200s[nospouse], zeros):
-            raise ValueError(msg.format('e00200s'))
-        if not np.allclose(self.e00900s[nospouse], zeros):
-            raise ValueError(msg.format('e00900s'))
-        if not np.allclose(self.e02100s[nospouse], zeros):
-            raise ValueError(msg.format('e02100s'))
-        if not np.allclose(self.k1bx14s[nospouse], zeros):
-            raise ValueError(msg.format('k1bx14s'))
-        # check that ordinary dividends are no less than qualified dividends
-        other_dividends = np.maximum(0., self.e00600 - self.e00650)
-        if not np.allclose(self.e00600, self.e00650 + other_dividends,
-                           rtol=0.0, atol=tol):
-            msg = 'expression "e00600 >= e00650" is not true for every record'
-            raise ValueError(msg)
-        del other_dividends
-        # check that total pension income is no less than taxable pension inc
-        nontaxable_pensions = np.maximum(0., self.e01500 - self.e01700)
-        if not np.allclose(self.e01500, self.e01700 + nontaxable_pensions,
-                           rtol=0.0, atol=tol):
-            msg = 'expression "e01500 >= e01700" is not true for every record'
-            raise ValueError(msg)
-        del nontaxable_pensions
-        # check that PT_SSTB_income has valid value
-        if not np.all(np.logical_and(np.greater_equal(self.PT_SSTB_income, 0),
-                                     np.less_equal(self.PT_SSTB_income, 1))):
-            raise ValueError('not all PT_SSTB_income values are 0 or 1')
+        # check the values of the input variables, except when they were
+        # read from NPY files written by the write_npy_files method, whose
+        # values were checked before they were written
+        if not (isinstance(data, str) and os.path.isdir(data)):
+            self._check_read_vars()
+        # store input variables in compact form
+        if compact:
+            self._compact_read_vars()
 
     @staticmethod
     def cps_constructor(data=None,
@@ -265,15 +253,77 @@ class Records(Data):
             weights_scale=1.0,
         )
 
-    def increment_year(self):
+    @staticmethod
+    def read_chunks(chunk_size,
+                    data='puf.csv',
+                    start_year=PUFCSV_YEAR,
+                    gfactors=GrowFactors(),
+                    weights=PUF_WEIGHTS_FILENAME,
+                    adjust_ratios=PUF_RATIOS_FILENAME,
+                    exact_calculations=False,
+                    weights_scale=0.01):
+        """
+        Generator that returns, one at a time, Records objects that each
+        contain a block of at most chunk_size consecutive records, so that
+        input data that do not fit in memory can be used one block at a
+        time (see Calculator.calc_chunks).  The other arguments are the
+        same as those of the Records class constructor, except that when
+        weights is not None it must contain one row for each record
+        because the weights of a block of records cannot be scaled up to
+        the weights of all the records as they are for a data subsample.
+        When data or weights is the name of a CSV file, the file is read
+        one block at a time.
+
+        Raises
+        ------
+        ValueError:
+            if chunk_size is not a positive integer.
+            if data or weights names a CSV file that cannot be found.
+            if data and weights contain different numbers of records.
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError('chunk_size is not a positive integer')
+        if isinstance(weights, str):
+            weights = os.path.join(Records.CODE_PATH, weights)
+        data_chunks = Records._frame_chunks(data, chunk_size)
+        if weights is None:
+            weights_chunks = None
+        else:
+            weights_chunks = Records._frame_chunks(weights, chunk_size)
+        msg = 'data and weights contain different numbers of records'
+        for data_chunk in data_chunks:
+            weights_chunk = None
+            if weights_chunks is not None:
+                weights_chunk = next(weights_chunks, None)
+                if (weights_chunk is None or
+                        len(weights_chunk.index) != len(data_chunk.index)):
+                    raise ValueError(msg)
+                weights_chunk = weights_chunk.reset_index(drop=True)
+            yield Records(data=data_chunk.reset_index(drop=True),
+                          start_year=start_year,
+                          gfactors=gfactors,
+                          weights=weights_chunk,
+                          adjust_ratios=adjust_ratios,
+                          exact_calculations=exact_calculations,
+                          weights_scale=weights_scale)
+        if weights_chunks is not None:
+            if next(weights_chunks, None) is not None:
+                raise ValueError(msg)
+
+    def increment_year(self, num_years=1):
         """
         Add one to current year, and also does
         extrapolation, reweighting, adjusting for new current year.
+        When num_years is greater than one, add num_years to current year
+        and do the extrapolation and adjusting for all the years in one
+        pass (see Data.increment_year).
         """
-        super().increment_year()
+        super().increment_year(num_years)
         self.FLPDYR.fill(self.current_year)  # pylint: disable=no-member
         # apply variable adjustment ratios
-        self._adjust(self.current_year)
+        self._adjust(self.current_year,
+                     first_year=self.current_year - num_years + 1)
 
     @staticmethod
     def read_cps_data():
@@ -289,15 +339,79 @@ class Records(Data):
 
     # ----- begin private methods of Records class -----
 
-    def _extrapolate(self, year):
+    def _check_read_vars(self):
         """
-        Apply to variables the grow factor values for specified calendar year.
+        Raise ValueError if the values of the input variables are not
+        valid.
+        """
+        # pylint: disable=no-member
+        # check for valid MARS values
+        if not np.all(np.logical_and(np.greater_equal(self.MARS, 1),
+                                     np.less_equal(self.MARS, 5))):
+            raise ValueError('not all MARS values in [1,5] range')
+        # check for valid EIC values
+        if not np.all(np.logical_and(np.greater_equal(self.EIC, 0),
+                                     np.less_equal(self.EIC, 3))):
+            raise ValueError('not all EIC values in [0,3] range')
+        # check that three sets of split-earnings variables have valid values
+        msg = 'expression "{0} == {0}p + {0}s" is not true for every record'
+        tol = 0.020001  # handles "%.2f" rounding errors
+        if not np.allclose(self.e00200, (self.e00200p + self.e00200s),
+                           rtol=0.0, atol=tol):
+            raise ValueError(msg.format('e00200'))
+        if not np.allclose(self.e00900, (self.e00900p + self.e00900s),
+                           rtol=0.0, atol=tol):
+            raise ValueError(msg.format('e00900'))
+        if not np.allclose(self.e02100, (self.e02100p + self.e02100s),
+                           rtol=0.0, atol=tol):
+            raise ValueError(msg.format('e02100'))
+        # check that spouse income variables have valid values
+        nospouse = self.MARS != 2
+        zeros = np.zeros_like(self.MARS[nospouse])
+        msg = '{} is not always zero for non-married filing unit'
+        if not np.allclose(self.e00200s[nospouse], zeros):
+            raise ValueError(msg.format('e00200s'))
+        if not np.allclose(self.e00900s[nospouse], zeros):
+            raise ValueError(msg.format('e00900s'))
+        if not np.allclose(self.e02100s[nospouse], zeros):
+            raise ValueError(msg.format('e02100s'))
+        if not np.allclose(self.k1bx14s[nospouse], zeros):
+            raise ValueError(msg.format('k1bx14s'))
+        # check that ordinary dividends are no less than qualified dividends
+        other_dividends = np.maximum(0., self.e00600 - self.e00650)
+        if not np.allclose(self.e00600, self.e00650 + other_dividends,
+                           rtol=0.0, atol=tol):
+            msg = 'expression "e00600 >= e00650" is not true for every record'
+            raise ValueError(msg)
+        del other_dividends
+        # check that total pension income is no less than taxable pension inc
+        nontaxable_pensions = np.maximum(0., self.e01500 - self.e01700)
+        if not np.allclose(self.e01500, self.e01700 + nontaxable_pensions,
+                           rtol=0.0, atol=tol):
+            msg = 'expression "e01500 >= e01700" is not true for every record'
+            raise ValueError(msg)
+        del nontaxable_pensions
+        # check that PT_SSTB_income has valid value
+        if not np.all(np.logical_and(np.greater_equal(self.PT_SSTB_income, 0),
+                                     np.less_equal(self.PT_SSTB_income, 1))):
+            raise ValueError('not all PT_SSTB_income values are 0 or 1')
+
+    def _extrapolate(self, year, first_year=None):
+        """
+        Apply to variables the grow factor values for specified calendar year
+        or, when first_year is not None, the cumulative grow factor values
+        for the calendar years from first_year through year.
         """
         # pylint: disable=too-many-statements,no-member
+        if first_year is None:
+            first_year = year
         # put values in local dictionary
+        # (the sign-dependent factors, like ASCHCI and ASCHCL, can be
+        # cumulated separately because no factor changes a value's sign)
         gfv = {}
         for name in GrowFactors.VALID_NAMES:
-            gfv[name] = self.gfactors.factor_value(name, year)
+            gfv[name] = np.prod([self.gfactors.factor_value(name, yr)
+                                 for yr in range(first_year, year + 1)])
         # apply values to Records variables
         self.PT_binc_w2_wages *= gfv['AWAGE']
         self.e00200 *= gfv['AWAGE']
@@ -390,15 +504,51 @@ class Records(Data):
         # remove local dictionary
         del gfv
 
-    def _adjust(self, year):
+    def _adjust(self, year, first_year=None):
         """
         Adjust value of income variables to match SOI distributions
+        for specified year or, when first_year is not None, for each
+        year from first_year through year.
         Note: adjustment must leave variables as numpy.ndarray type
         """
         # pylint: disable=no-member
+        if first_year is None:
+            first_year = year
         if self.ADJ.size > 0:
             # Interest income
-            self.e00300 *= self.ADJ[f'INT{year}'].iloc[self.agi_bin].values
+            ratios = np.prod(
+                [self.ADJ[f'INT{yr}'].iloc[self.agi_bin].values
+                 for yr in range(first_year, year + 1)],
+                axis=0, dtype=np.float64
+            )
+            self.e00300 *= ratios
+
+    def _read_dtypes(self):
+        """
+        Return dictionary that contains for each of the USABLE_READ_VARS
+        the dtype of its array (see Data._read_dtypes), which is int8 for
+        the COMPACT_INTEGER_VARS and float32 for the non-integer variables
+        (except for the s006 sample weights, which are replaced by float64
+        weights each year) when the variables are stored in compact form.
+        """
+        dtypes = super()._read_dtypes()
+        if self.__compact:
+            for varname, dtype in dtypes.items():
+                if varname in Records.COMPACT_INTEGER_VARS:
+                    dtypes[varname] = np.int8
+                elif dtype == np.float64 and varname != 's006':
+                    dtypes[varname] = np.float32
+        return dtypes
+
+    def _compact_read_vars(self):
+        """
+        Store COMPACT_INTEGER_VARS as int8 arrays and the non-integer read
+        variables as float32 arrays, leaving unchanged (and not copying)
+        the arrays that are already stored in compact form.
+        """
+        for varname, dtype in self._read_dtypes().items():
+            setattr(self, varname,
+                    getattr(self, varname).astype(dtype, copy=False))
 
     def _read_ratios(self, ratios):
         """
@@ -431,3 +581,29 @@ class Records(Data):
         self.ADJ = pd.DataFrame()
         setattr(self, 'ADJ', ADJ.astype(np.float32))
         del ADJ
+
+    @staticmethod
+    def _frame_chunks(frame, chunk_size):
+        """
+        Generator that returns, one at a time, DataFrames that each contain
+        a block of at most chunk_size consecutive rows of the specified
+        frame, which is either a DataFrame or the name of a CSV file that
+        is read one block at a time even when it is in the package.
+        """
+        if isinstance(frame, str):
+            path = Path(frame)
+            if not path.is_file():
+                # find file in conda package
+                path = implibres.files('taxcalc').joinpath(path.name)
+                if not path.is_file():
+                    msg = f'could not read {frame} data from package'
+                    raise ValueError(msg)
+            with implibres.as_file(path) as csv_path, \
+                    pd.read_csv(csv_path, chunksize=chunk_size) as reader:
+                yield from reader
+            return
+        if not isinstance(frame, pd.DataFrame):
+            msg = 'frame is neither a string nor a Pandas DataFrame'
+            raise ValueError(msg)
+        for start in range(0, len(frame.index), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
@@ -0,0 +1,172 @@
+"""
+Tax-Calculator function that keeps on disk the Records data extrapolated
+to a year so that later runs can map them instead of reading, checking,
+and extrapolating the input data again.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle recordscache.py
+# pylint --disable=locally-disabled recordscache.py
+
+import os
+import shutil
+import hashlib
+import inspect
+import tempfile
+import pandas as pd
+from taxcalc.growfactors import GrowFactors
+from taxcalc.records import Records
+
+
+RECORDS_CACHE_BYTES = 4 * 1024**3
+
+
+def cached_records(cache_dir, year, max_cache_bytes=RECORDS_CACHE_BYTES,
+                   **records_args):
+    """
+    Return Records object that contains the data specified by the
+    records_args extrapolated to the specified year, which are read from
+    the specified cache directory when an earlier call has placed them
+    there.
+
+    Each cache entry is a subdirectory of cache_dir that contains the
+    NPY files written by the Records write_npy_files method.  The name of
+    the subdirectory is a hash of the year, the taxcalc version, and the
+    contents of the data, weights, adjustment ratios, and growth factors
+    (including any growth differences applied to them), so any change in
+    what the extrapolated data depend on implies a different cache entry.
+    After adding an entry, the least recently used entries are removed
+    until the entries use no more than max_cache_bytes of disk space.
+
+    Parameters
+    ----------
+    cache_dir: string
+        directory that contains the cache entries, which is created if it
+        does not exist
+
+    year: integer
+        calendar year to which the data are extrapolated
+
+    max_cache_bytes: integer
+        maximum size of the cache entries in bytes; the entry just added
+        is never removed; default value is RECORDS_CACHE_BYTES
+
+    records_args: keyword arguments
+        arguments of the Records class constructor that specify the data,
+        where gfactors cannot be None (because data that are not aged are
+        never cached) and where data cannot be a DataFrame with an index
+        other than the default range index
+
+    Returns
+    -------
+    class instance: Records
+        whether or not the data are read from the cache, the returned
+        object has the data_year specified by the records_args and a
+        current_year equal to year; when the data are read from the cache,
+        the input arrays are mapped read-only from the cache entry without
+        being checked again, and are copied only when a Records or
+        Calculator method changes them
+    """
+    bound_args = inspect.signature(Records).bind(**records_args)
+    bound_args.apply_defaults()
+    records_args = bound_args.arguments
+    if not isinstance(records_args['gfactors'], GrowFactors):
+        raise ValueError('cached records must have GrowFactors gfactors')
+    data = records_args['data']
+    if (isinstance(data, pd.DataFrame) and
+            not isinstance(data.index, pd.RangeIndex)):
+        raise ValueError('cached data must have a range index')
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = os.path.join(cache_dir, _cache_key(year, records_args))
+    if os.path.isdir(entry):
+        os.utime(entry)  # which marks the entry as recently used
+        recs = Records(**dict(records_args, data=entry, start_year=year))
+        recs._set_data_year(  # pylint: disable=protected-access
+            records_args['start_year'])
+        return recs
+    recs = Records(**records_args)
+    if recs.current_year > year:
+        raise ValueError(f'year {year} is before start year of records')
+    while recs.current_year < year:
+        recs.increment_year()
+    # write the entry to a temporary directory that is hidden from other
+    # processes, whose entries are not removed, until it is complete
+    tmpdir = tempfile.mkdtemp(prefix='.', dir=cache_dir)
+    recs.write_npy_files(tmpdir)
+    try:
+        os.rename(tmpdir, entry)
+    except OSError:
+        # another process has added the same entry
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    _evict(cache_dir, max_cache_bytes, keep=entry)
+    return recs
+
+
+def _cache_key(year, records_args):
+    """
+    Return hexadecimal hash of the year, the taxcalc version, and the
+    contents of each of the Records constructor arguments.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    import taxcalc  # for its version, which is set after its imports
+    hasher = hashlib.sha256()
+    hasher.update(f'{year} {taxcalc.__version__}'.encode('utf-8'))
+    for name in sorted(records_args):
+        hasher.update(name.encode('utf-8'))
+        _hash_value(hasher, records_args[name])
+    return hasher.hexdigest()
+
+
+def _hash_value(hasher, value):
+    """
+    Update hasher with the contents of the specified Records constructor
+    argument value.
+    """
+    if isinstance(value, GrowFactors):
+        value = value.gfdf
+    if isinstance(value, pd.DataFrame):
+        hasher.update(repr(list(value.columns)).encode('utf-8'))
+        hasher.update(pd.util.hash_pandas_object(value).values.tobytes())
+        return
+    if isinstance(value, str):
+        code_path = os.path.join(Records.CODE_PATH, value)
+        for path in [value, code_path]:
+            if os.path.isdir(path):
+                for fname in sorted(os.listdir(path)):
+                    hasher.update(fname.encode('utf-8'))
+                    _hash_file(hasher, os.path.join(path, fname))
+                return
+            if os.path.isfile(path):
+                _hash_file(hasher, path)
+                return
+    hasher.update(repr(value).encode('utf-8'))
+
+
+def _hash_file(hasher, path):
+    """
+    Update hasher with the contents of the file at the specified path.
+    """
+    with open(path, 'rb') as bfile:
+        for block in iter(lambda: bfile.read(1024**2), b''):
+            hasher.update(block)
+
+
+def _evict(cache_dir, max_cache_bytes, keep):
+    """
+    Remove the least recently used entries in cache_dir, except for the
+    keep entry, until all the entries use no more than max_cache_bytes.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith('.') or not os.path.isdir(path):
+            continue
+        size = sum(os.path.getsize(os.path.join(path, fname))
+                   for fname in os.listdir(path))
+        entries.append((os.path.getmtime(path), path, size))
+    total_bytes = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total_bytes <= max_cache_bytes:
+            break
+        if path != keep:
+            shutil.rmtree(path, ignore_errors=True)
+            total_bytes -= size
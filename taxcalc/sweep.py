@@ -0,0 +1,252 @@
+"""
+Tax-Calculator function that calculates taxes under many reforms in a
+pool of worker processes that share the extrapolated input data.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle sweep.py
+# pylint --disable=locally-disabled sweep.py
+#
+# pylint: disable=protected-access
+
+import copy
+import concurrent.futures
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+import paramtools as pt
+from taxcalc.policy import Policy
+from taxcalc.records import Records
+from taxcalc.calculator import Calculator
+from taxcalc.utils import DIFF_VARIABLES, create_difference_table
+
+
+SWEEP_TAXES = ['iitax', 'payrolltax', 'combined']
+
+# state of each worker process, which is set by the _init_worker function
+_WORKER = {}
+
+
+def reform_sweep(records, reforms, years, num_workers=None,
+                 groupby='weighted_deciles', tax_to_diff='combined'):
+    """
+    Calculate taxes under current-law policy and under each of the
+    specified reforms for each of the specified years, doing the reform
+    calculations in a pool of worker processes.
+
+    The records are extrapolated to each year only once, and their arrays
+    are placed in shared memory that every worker process uses without
+    copying, so the workers neither read nor extrapolate the input data.
+    Each worker process has its own copies of only the arrays that are
+    written by the Calculator.calc_all() method.
+
+    Parameters
+    ----------
+    records: Records class object
+        contains the input data in their data year; this object is
+        left unchanged
+
+    reforms: list of dictionaries
+        each dictionary is a policy reform in the format expected by the
+        Policy.implement_reform() method
+
+    years: list of integers
+        calendar years for which taxes are calculated
+
+    num_workers: None or integer
+        number of worker processes; default value is None, which implies
+        the number of processors on the machine
+
+    groupby: string
+        groupby argument of the Calculator.difference_table() method;
+        default value is 'weighted_deciles'
+
+    tax_to_diff: string
+        tax_to_diff argument of the Calculator.difference_table() method;
+        default value is 'combined'
+
+    Returns
+    -------
+    aggregates: Pandas DataFrame
+        contains a row for each year and each reform (and for current-law
+        policy, which has a reform value of None) with year and reform
+        columns (reform is the index of the reform in reforms) followed by
+        a column containing the weighted total of each of the SWEEP_TAXES
+
+    diff_tables: dictionary
+        contains, for each (year, reform) pair, the difference table
+        returned by the Calculator.difference_table() method for the
+        current-law and reform Calculator objects
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-locals
+    assert isinstance(records, Records)
+    assert isinstance(reforms, list)
+    recs = copy.deepcopy(records)
+    policy = Policy()
+    year_policy = copy.deepcopy(policy)
+    rows = []
+    diff_tables = {}
+    for year in sorted(set(years)):
+        while recs.current_year < year:
+            recs.increment_year()
+        if recs.current_year != year:
+            raise ValueError(f'year {year} is before current year of records')
+        # place input arrays in shared memory
+        names = sorted(recs.USABLE_READ_VARS | recs.CALCULATED_VARS)
+        inputs = {name: np.asarray(getattr(recs, name)) for name in names}
+        inputs_shm, inputs_layout = _publish(inputs)
+        try:
+            skeleton = copy.copy(recs)
+            for name in names:
+                setattr(skeleton, name, None)
+            skeleton.WT = None
+            # calculate current-law taxes and place them in shared memory
+            year_policy.set_year(year)
+            base = _calculator(year_policy, skeleton, inputs)
+            del inputs
+            baseline = base._with_policy(policy)
+            baseline.calc_all()
+            rows.append(_aggregates(year, None, baseline))
+            baseline_diff = {name: baseline.array(name)
+                             for name in DIFF_VARIABLES}
+            baseline_shm, baseline_layout = _publish(baseline_diff)
+            del base, baseline, baseline_diff
+            try:
+                # calculate reform taxes in worker processes
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=num_workers, initializer=_init_worker,
+                        initargs=(year, skeleton,
+                                  inputs_shm.name, inputs_layout,
+                                  baseline_shm.name, baseline_layout)) as pool:
+                    futures = [pool.submit(_run_reform, idx, reform,
+                                           groupby, tax_to_diff)
+                               for idx, reform in enumerate(reforms)]
+                    for idx, future in enumerate(futures):
+                        aggregates, diff_table = future.result()
+                        rows.append(aggregates)
+                        diff_tables[(year, idx)] = diff_table
+            finally:
+                _release(baseline_shm)
+        finally:
+            _release(inputs_shm)
+    return (pd.DataFrame(rows, columns=['year', 'reform'] + SWEEP_TAXES),
+            diff_tables)
+
+
+def _publish(arrays):
+    """
+    Return shared memory block containing copies of the arrays in the
+    specified dictionary, and the layout dictionary that contains the
+    (offset, dtype, shape) of each array in the block.
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = (offset, array.dtype.str, array.shape)
+        offset += -(-array.nbytes // 8) * 8  # keeps each array aligned
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    try:
+        views = _attach(shm, layout)
+        for name, array in arrays.items():
+            views[name][...] = array
+    except BaseException:
+        views = None  # so that no array uses the block
+        _release(shm)
+        raise
+    return (shm, layout)
+
+
+def _release(shm):
+    """
+    Close and unlink the specified shared memory block, which is freed as
+    soon as no process uses it.  Closing the block raises BufferError when
+    an array in this process still uses it, but the block is unlinked
+    anyway.
+    """
+    try:
+        shm.close()
+    finally:
+        shm.unlink()
+
+
+def _attach(shm, layout):
+    """
+    Return dictionary containing an array that uses the specified shared
+    memory block, shm, for each item of the specified layout dictionary.
+    """
+    return {name: np.ndarray(shape, dtype=np.dtype(dtype),
+                             buffer=shm.buf, offset=offset)
+            for name, (offset, dtype, shape) in layout.items()}
+
+
+def _calculator(policy, skeleton, arrays):
+    """
+    Return Calculator object with the specified policy that embeds a copy
+    of the skeleton Records object, which contains no arrays, in which the
+    arrays in the specified dictionary are used without copying.
+    """
+    calc = Calculator(policy=policy, records=skeleton)
+    for name, array in arrays.items():
+        calc.array(name, array)
+    return calc
+
+
+def _aggregates(year, reform, calc):
+    """
+    Return list containing year, reform and weighted total of each of the
+    SWEEP_TAXES calculated by specified Calculator object, calc.
+    """
+    return [year, reform] + [calc.weighted_total(tax) for tax in SWEEP_TAXES]
+
+
+def _init_worker(year, skeleton, inputs_name, inputs_layout,
+                 baseline_name, baseline_layout):
+    """
+    Set the state of a worker process for the specified year.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    inputs_shm = _shared_memory(inputs_name)
+    baseline_shm = _shared_memory(baseline_name)
+    policy = Policy()
+    _WORKER['shm'] = (inputs_shm, baseline_shm)
+    _WORKER['year'] = year
+    _WORKER['policy'] = copy.deepcopy(policy)
+    policy.set_year(year)
+    _WORKER['base'] = _calculator(policy, skeleton,
+                                  _attach(inputs_shm, inputs_layout))
+    _WORKER['baseline'] = _attach(baseline_shm, baseline_layout)
+
+
+def _shared_memory(name):
+    """
+    Return the existing shared memory block with the specified name without
+    letting the worker process unlink it when the process ends.
+    """
+    # pylint: disable=unexpected-keyword-arg
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # pragma: no cover
+        # Python before 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(getattr(shm, '_name'), 'shared_memory')
+        return shm
+
+
+def _run_reform(reform_index, reform, groupby, tax_to_diff):
+    """
+    Calculate taxes under the specified reform in a worker process and
+    return its aggregates and difference table.
+    """
+    policy = copy.deepcopy(_WORKER['policy'])
+    try:
+        policy.implement_reform(reform, print_warnings=False)
+    except pt.ValidationError as err:
+        # a ValidationError cannot be passed back to the parent process
+        raise ValueError(f'reform {reform_index}: {err}') from None
+    calc = _WORKER['base']._with_policy(policy)
+    calc.calc_all()
+    baseline = pd.DataFrame(_WORKER['baseline'], columns=DIFF_VARIABLES)
+    diff_table = create_difference_table(baseline,
+                                         calc.dataframe(DIFF_VARIABLES),
+                                         groupby, tax_to_diff)
+    return (_aggregates(_WORKER['year'], reform_index, calc), diff_table)
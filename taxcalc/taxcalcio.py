@@ -14,6 +14,7 @@ import pandas as pd
 import paramtools
 from taxcalc.policy import Policy
 from taxcalc.records import Records
+from taxcalc.recordscache import cached_records
 from taxcalc.consumption import Consumption
 from taxcalc.growdiff import GrowDiff
 from taxcalc.growfactors import GrowFactors
@@ -80,11 +81,13 @@ class TaxCalcIO():
         if isinstance(input_data, str):
             # remove any leading directory path from INPUT filename
             fname = os.path.basename(input_data)
-            # check if fname ends with ".csv"
-            if fname.endswith('.csv'):
-                inp = f'{fname[:-4]}-{str(tax_year)[2:]}'
+            # check if fname ends with ".csv" or a columnar-file suffix
+            froot, fext = os.path.splitext(fname)
+            if fext in ('.csv',) + Records.COLUMNAR_SUFFIXES:
+                inp = f'{froot}-{str(tax_year)[2:]}'
             else:
-                msg = 'INPUT file name does not end in .csv'
+                msg = ('INPUT file name does not end in .csv, '
+                       '.parquet, .feather or .arrow')
                 self.errmsg += f'ERROR: {msg}\n'
             # check existence of INPUT file
             self.puf_input_data = input_data.endswith('puf.csv')
@@ -229,7 +232,7 @@ class TaxCalcIO():
         self.policy_dicts = []
 
     def init(self, input_data, tax_year, baseline, reform, assump,
-             aging_input_data, exact_calculations):
+             aging_input_data, exact_calculations, cache_dir=None):
         """
         TaxCalcIO class post-constructor method that completes initialization.
 
@@ -245,6 +248,11 @@ class TaxCalcIO():
         exact_calculations: boolean
             specifies whether or not exact tax calculations are done without
             any smoothing of "stair-step" provisions in the tax law.
+
+        cache_dir: None or string
+            directory in which the input data extrapolated to tax_year are
+            cached (see the cached_records function) when aging_input_data
+            is True; default value of None implies no caching.
         """
         # pylint: disable=too-many-arguments,too-many-positional-arguments
         # pylint: disable=too-many-statements,too-many-branches,too-many-locals
@@ -355,45 +363,44 @@ class TaxCalcIO():
         # read input file contents into Records objects
         if aging_input_data:
             if self.cps_input_data:
-                recs = Records.cps_constructor(
-                    gfactors=gfactors_ref,
-                    exact_calculations=exact_calculations
-                )
-                recs_base = Records.cps_constructor(
-                    gfactors=gfactors_base,
-                    exact_calculations=exact_calculations
-                )
+                recs_args = {
+                    'data': os.path.join(Records.CODE_PATH, 'cps.csv.gz'),
+                    'start_year': Records.CPSCSV_YEAR,
+                    'weights': os.path.join(Records.CODE_PATH,
+                                            Records.CPS_WEIGHTS_FILENAME),
+                    'adjust_ratios': Records.CPS_RATIOS_FILENAME,
+                }
             elif self.tmd_input_data:  # pragma: no cover
-                wghts = pd.read_csv(self.tmd_weights)
-                recs = Records(
-                    data=pd.read_csv(input_data),
-                    start_year=Records.TMDCSV_YEAR,
-                    weights=wghts,
-                    gfactors=gfactors_ref,
-                    adjust_ratios=None,
-                    exact_calculations=exact_calculations,
-                    weights_scale=1.0,
-                )
-                recs_base = Records(
-                    data=pd.read_csv(input_data),
-                    start_year=Records.TMDCSV_YEAR,
-                    weights=wghts,
-                    gfactors=gfactors_base,
-                    adjust_ratios=None,
-                    exact_calculations=exact_calculations,
-                    weights_scale=1.0,
-                )
+                recs_args = {
+                    'data': input_data,
+                    'start_year': Records.TMDCSV_YEAR,
+                    'weights': pd.read_csv(self.tmd_weights),
+                    'adjust_ratios': None,
+                    'weights_scale': 1.0,
+                }
             else:  # if not {cps|tmd}_input_data but aging_input_data: puf
-                recs = Records(
-                    data=input_data,
-                    gfactors=gfactors_ref,
-                    exact_calculations=exact_calculations
-                )
-                recs_base = Records(
-                    data=input_data,
-                    gfactors=gfactors_base,
-                    exact_calculations=exact_calculations
-                )
+                recs_args = {'data': input_data}
+            recs_args['exact_calculations'] = exact_calculations
+            # the baseline and reform data differ only when their growth
+            # factors differ (that is, when there is a growdiff_response)
+            same_gfactors = gfactors_ref.gfdf.equals(gfactors_base.gfdf)
+            if cache_dir is None:
+                recs = Records(gfactors=gfactors_ref, **recs_args)
+                if same_gfactors:
+                    recs_base = recs
+                else:
+                    # copy the data read for recs instead of reading again
+                    recs_base = copy.deepcopy(recs)
+                    recs_base.gfactors = gfactors_base
+            else:
+                recs = cached_records(cache_dir, tax_year,
+                                      gfactors=gfactors_ref, **recs_args)
+                if same_gfactors:
+                    recs_base = recs
+                else:
+                    recs_base = cached_records(cache_dir, tax_year,
+                                               gfactors=gfactors_base,
+                                               **recs_args)
         else:  # input_data are raw data that are not being aged
             recs = Records(data=input_data,
                            start_year=tax_year,
@@ -401,16 +408,22 @@ class TaxCalcIO():
                            weights=None,
                            adjust_ratios=None,
                            exact_calculations=exact_calculations)
-            recs_base = copy.deepcopy(recs)
+            recs_base = recs
         # create Calculator objects
         self.calc = Calculator(policy=pol, records=recs,
                                verbose=True,
                                consumption=con,
                                sync_years=aging_input_data)
-        self.calc_base = Calculator(policy=base, records=recs_base,
-                                    verbose=False,
-                                    consumption=con,
-                                    sync_years=aging_input_data)
+        if recs_base is recs:
+            # share the (extrapolated) input arrays of self.calc, giving
+            # self.calc_base its own copies of only the calculated arrays
+            # pylint: disable=protected-access
+            self.calc_base = self.calc._with_policy(base)
+        else:
+            self.calc_base = Calculator(policy=base, records=recs_base,
+                                        verbose=False,
+                                        consumption=con,
+                                        sync_years=aging_input_data)
 
     def custom_dump_variables(self, tcdumpvars_str):
         """
@@ -13,7 +13,11 @@ import copy
 import pytest
 import numpy as np
 import pandas as pd
-from taxcalc import GrowFactors, Policy, Records, Calculator, Consumption
+import taxcalc.decorators
+from taxcalc import (GrowFactors, Policy, Records, Calculator, Consumption,
+                     ChunkTotals)
+from taxcalc.decorators import signature_mismatches
+from taxcalc.calcfunctions import ComputeBenefit
 
 
 def test_make_calculator(cps_subsample):
@@ -125,6 +129,350 @@ def test_calculator_advance_to_year(cps_subsample):
         calc.advance_to_year(2015)
 
 
+def test_calculator_advance_to_year_direct(cps_subsample):
+    """
+    Test that Calculator advance_to_year method with direct=True gets the
+    same results as advancing one year at a time.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    calc1 = Calculator(policy=pol, records=rec)
+    calc2 = Calculator(policy=pol, records=rec)
+    calc1.advance_to_year(2030)
+    calc2.advance_to_year(2030, direct=True)
+    assert calc2.current_year == 2030
+    assert calc2.consump_param('MPC_e17500') == calc1.consump_param(
+        'MPC_e17500')
+    for calc in [calc1, calc2]:
+        calc.calc_all()
+    for varname in ['e00200', 'e00900', 'e02000', 's006', 'iitax',
+                    'payrolltax', 'combined']:
+        assert np.allclose(calc1.array(varname), calc2.array(varname),
+                           rtol=1e-12, atol=1e-6)
+
+
+def test_calculator_fused_kernel(cps_subsample):
+    """
+    Test that Calculator with fused_kernel=True produces exactly the
+    same results as Calculator with default fused_kernel=False.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    pol.implement_reform({'II_em': {2020: 1000},
+                          'ID_Charity_hc': {2020: 0.5}})
+    calc1 = Calculator(policy=pol, records=rec)
+    calc2 = Calculator(policy=pol, records=rec, fused_kernel=True)
+    for calc in [calc1, calc2]:
+        calc.advance_to_year(2021)
+        calc.calc_all()
+    for varname in sorted(rec.CALCULATED_VARS):
+        assert np.array_equal(calc1.array(varname), calc2.array(varname))
+
+
+def test_calculator_deduction_choice(cps_subsample):
+    """
+    Test that each filing unit has either the standard deduction or the
+    itemized deduction (and its components) after calc_all, and that the
+    fused kernel makes the same choices.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    pol.implement_reform({'STD': {2020: [6000, 12000, 6000, 9000, 12000]},
+                          'AGI_surtax_trt': {2020: 0.05},
+                          'AGI_surtax_thd': {2020: [50000] * 5}})
+    calc1 = Calculator(policy=pol, records=rec)
+    calc2 = Calculator(policy=pol, records=rec, fused_kernel=True)
+    for calc in [calc1, calc2]:
+        calc.advance_to_year(2020)
+        calc.calc_all()
+    itemizing = calc1.array('c04470') > 0.
+    assert itemizing.any() and not itemizing.all()
+    assert np.all(calc1.array('standard')[itemizing] == 0.)
+    assert np.all(calc1.array('c18300')[~itemizing] == 0.)
+    for varname in sorted(rec.CALCULATED_VARS):
+        assert np.array_equal(calc1.array(varname), calc2.array(varname))
+
+
+def test_calculator_parallel(cps_subsample):
+    """
+    Test that Calculator with parallel=True produces exactly the
+    same results as Calculator with parallel=False.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    calc1 = Calculator(policy=pol, records=rec, parallel=False)
+    calc2 = Calculator(policy=pol, records=rec, parallel=True)
+    for calc in [calc1, calc2]:
+        calc.calc_all()
+    for varname in sorted(rec.CALCULATED_VARS):
+        assert np.array_equal(calc1.array(varname), calc2.array(varname))
+
+
+def test_calculator_vectorized(cps_subsample):
+    """
+    Test that Calculator with vectorized=True produces exactly the
+    same results as Calculator with vectorized=False, with and without
+    the fused kernel.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    calc0 = Calculator(policy=pol, records=rec, vectorized=False)
+    calc0.calc_all()
+    for fused_kernel in [False, True]:
+        calc = Calculator(policy=pol, records=rec,
+                          fused_kernel=fused_kernel, vectorized=True)
+        calc.calc_all()
+        for varname in sorted(rec.CALCULATED_VARS):
+            assert np.array_equal(calc0.array(varname), calc.array(varname))
+
+
+def test_calculator_profile(cps_subsample):
+    """
+    Test that Calculator with profile=True records the calls of the
+    tax-calculation functions and that the recording does not change
+    the results.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    calc1 = Calculator(policy=pol, records=rec)
+    calc1.calc_all()
+    assert calc1.kernel_profile is None
+    calc2 = Calculator(policy=pol, records=rec, profile=True)
+    calc2.calc_all()
+    calc2.calc_all()
+    for varname in sorted(rec.CALCULATED_VARS):
+        assert np.array_equal(calc1.array(varname), calc2.array(varname))
+    dframe = calc2.kernel_profile.dataframe()
+    assert dframe.loc['IITAX', 'calls'] == 2
+    assert dframe.loc['IITAX', 'records'] == 2 * calc2.array_len
+    assert dframe.loc['TaxInc', 'calls'] == 4
+    assert dframe.loc['AMT', 'calls'] == 6
+    assert dframe.loc['BenefitSurtax', 'calls'] == 2
+    assert (dframe['self_seconds'] <= dframe['seconds'] + 1e-9).all()
+
+
+def test_store_and_restore_records(cps_subsample):
+    """
+    Test that restore_records restores the values of the Records arrays
+    changed in place and the Records arrays replaced after store_records
+    was called.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    calc = Calculator(policy=Policy(), records=rec)
+    calc.calc_all()
+    iitax = calc.array('iitax').copy()
+    e00200 = calc.array('e00200')
+    e17500 = calc.array('e17500').copy()
+    for _ in range(2):
+        calc.store_records()
+        calc.array('e00200', e00200 + 1000.)
+        calc.array('e17500')[:] += 100.
+        calc.calc_all()
+        assert not np.array_equal(calc.array('iitax'), iitax)
+        calc.restore_records()
+        assert calc.array('e00200') is e00200
+        assert np.array_equal(calc.array('e17500'), e17500)
+        assert np.array_equal(calc.array('iitax'), iitax)
+
+
+@pytest.mark.parametrize('changed', [['e00300'], ['e00200p', 'e00200'],
+                                     ['e18500'], ['e02400']])
+def test_calc_all_changed(cps_subsample, changed):
+    """
+    Test that calc_all with the changed argument calls only the functions
+    that depend on the changed variables and gets the same results as
+    calc_all without the changed argument.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    pol.implement_reform({'ID_BenefitCap_rt': {2014: 0.2},
+                          'AGI_surtax_trt': {2014: 0.05}})
+    calc1 = Calculator(policy=pol, records=rec)
+    calc1.calc_all()
+    calc2 = Calculator(policy=pol, records=rec, profile=True)
+    calc2.calc_all()
+    for varname in changed:
+        calc1.array(varname, calc1.array(varname) * 1.1 + 50.)
+        calc2.array(varname, calc2.array(varname) * 1.1 + 50.)
+    calc1.calc_all()
+    calc2.calc_all(changed=changed)
+    for varname in sorted(rec.CALCULATED_VARS):
+        assert np.array_equal(calc1.array(varname), calc2.array(varname))
+    # ComputeBenefit calls IITAX once in each BenefitLimitation call
+    calls = calc2.kernel_profile.dataframe()['calls']
+    assert calls['IITAX'] == 4
+    assert calls['UBI'] == 1
+    assert calls['BenefitLimitation'] == 2
+
+
+@pytest.mark.parametrize('rows', [slice(10, 400), slice(3, 900, 7),
+                                  'mask', 'index', 'consecutive'])
+def test_calc_all_rows(cps_subsample, rows):
+    """
+    Test that calc_all with the rows argument gets the same results as
+    calc_all without it for the specified rows and leaves the calculated
+    variables of the other rows unchanged.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    pol.implement_reform({'ID_BenefitCap_rt': {2014: 0.2}})
+    calc1 = Calculator(policy=pol, records=rec)
+    calc1.calc_all()
+    calc2 = Calculator(policy=pol, records=rec)
+    if rows == 'mask':
+        rows = calc2.array('e00200') > 50000.
+    elif rows == 'index':
+        rows = np.flatnonzero(calc2.array('MARS') == 2)
+    elif rows == 'consecutive':
+        rows = np.arange(20, 300)
+    selected = np.zeros(calc2.array_len, dtype=bool)
+    selected[rows] = True
+    calc2.calc_all(rows=rows)
+    for varname in ['iitax', 'payrolltax', 'c04470', 'expanded_income']:
+        assert np.array_equal(calc2.array(varname)[selected],
+                              calc1.array(varname)[selected])
+        assert np.all(calc2.array(varname)[~selected] == 0.)
+    assert np.any(calc2.array('iitax')[selected] != 0.)
+
+
+def test_calc_chunks(cps_subsample):
+    """
+    Test that the results for blocks of filing units accumulated by
+    ChunkTotals objects are the same as the results of Calculator objects
+    that contain all the filing units, except that the weighted-decile
+    tables are only close to them.
+    """
+    # pylint: disable=too-many-locals
+    rec = Records.cps_constructor(data=cps_subsample)
+    data = cps_subsample.reset_index(drop=True)
+    weights = rec.WT.reset_index(drop=True)
+    pol1 = Policy()
+    pol2 = Policy()
+    pol2.implement_reform({'II_rt4': {2020: 0.35}, 'STD': {2020: [0] * 5}})
+    calc1 = Calculator(policy=pol1, records=rec)
+    calc2 = Calculator(policy=pol2, records=rec)
+    for calc in [calc1, calc2]:
+        calc.advance_to_year(2020)
+        calc.calc_all()
+
+    def chunks():
+        return Records.read_chunks(1000, data=data,
+                                   start_year=Records.CPSCSV_YEAR,
+                                   weights=weights, adjust_ratios=None)
+
+    groupbys = ['standard_income_bins', 'weighted_deciles']
+    totals1 = [ChunkTotals(variables=['e00200'], groupby=groupby)
+               for groupby in groupbys]
+    totals2 = [ChunkTotals(groupby=groupby) for groupby in groupbys]
+    for chunk1, chunk2 in zip(Calculator.calc_chunks(pol1, chunks(), 2020),
+                              Calculator.calc_chunks(pol2, chunks(), 2020)):
+        for tot1, tot2 in zip(totals1, totals2):
+            tot1.add(chunk1)
+            tot2.add(chunk2, baseline=chunk1)
+    assert totals1[0].array_len == calc1.array_len
+    assert totals1[0].current_year == 2020
+    for totals, calc in [(totals1[0], calc1), (totals2[0], calc2)]:
+        for varname in ['iitax', 'combined']:
+            assert np.allclose(totals.weighted_total(varname),
+                               calc.weighted_total(varname))
+        assert np.allclose(totals.total_weight(), calc.total_weight())
+    assert np.allclose(totals1[0].weighted_total('e00200'),
+                       calc1.weighted_total('e00200'))
+    with pytest.raises(ValueError):
+        totals2[0].weighted_total('e00200')
+    for groupby, tot1, tot2 in zip(groupbys, totals1, totals2):
+        expect = calc1.distribution_tables(calc2, groupby)
+        actual = tot1.distribution_tables(tot2)
+        expect += (calc1.difference_table(calc2, groupby, 'iitax'),)
+        actual += (tot1.difference_table(tot2, 'iitax'),)
+        for expect_table, actual_table in zip(expect, actual):
+            assert list(actual_table.index) == list(expect_table.index)
+            expect_table = expect_table.astype('float')
+            actual_table = actual_table.astype('float')
+            if groupby == 'standard_income_bins':
+                assert np.allclose(expect_table.values, actual_table.values,
+                                   equal_nan=True)
+                continue
+            assert np.allclose(expect_table.loc['ALL'],
+                               actual_table.loc['ALL'], equal_nan=True)
+            # the Calculator tables put the last negative-income filing
+            # unit in the 0-10z row and split no filing unit between rows
+            expect_table = expect_table.drop('0-10n')
+            actual_table = actual_table.drop('0-10n')
+            for col in ['count', 'expanded_income', 'iitax', 'tot_change']:
+                if col in expect_table:
+                    assert np.allclose(
+                        expect_table[col], actual_table[col], rtol=0.0,
+                        atol=0.01 * abs(expect_table.loc['ALL', col])
+                    )
+    with pytest.raises(ValueError):
+        totals2[0].difference_table(totals1[0], 'iitax')
+    totals3 = ChunkTotals()
+    totals3.add(calc1)
+    with pytest.raises(ValueError):
+        totals3.distribution_tables(None)
+
+
+def test_calc_batch(cps_subsample):
+    """
+    Test that Calculator.calc_batch gets the same results as a Calculator
+    object constructed for each policy.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    reforms = [{},
+               {'II_rt4': {2020: 0.35}},
+               {'ID_BenefitSurtax_crt': {2020: 0.1},
+                'ID_BenefitSurtax_trt': {2020: 0.1}},
+               {'UBI_21': {2020: 1000}}]
+    policies = []
+    for reform in reforms:
+        pol = Policy()
+        pol.implement_reform(reform)
+        policies.append(pol)
+    varlist = ['iitax', 'payrolltax', 'ubi', 'e00200']
+    results = Calculator.calc_batch(policies, rec, 2020, varlist)
+    dframe = Calculator.calc_batch(policies, rec, 2020, varlist,
+                                   dataframe=True)
+    assert results.shape == (len(policies), len(varlist), rec.array_length)
+    assert list(dframe.columns) == ['policy'] + varlist
+    for idx, pol in enumerate(policies):
+        calc = Calculator(policy=pol, records=rec)
+        calc.advance_to_year(2020)
+        calc.calc_all()
+        policy_rows = dframe[dframe['policy'] == idx]
+        for vdx, varname in enumerate(varlist):
+            assert np.array_equal(results[idx, vdx], calc.array(varname))
+            assert np.array_equal(policy_rows[varname], calc.array(varname))
+    assert not np.array_equal(results[0, 0], results[1, 0])
+    assert policies[0].current_year == Policy.JSON_START_YEAR
+    with pytest.raises(ValueError):
+        Calculator.calc_batch([], rec, 2020, varlist)
+
+
+def test_calculator_coerces_array_dtypes(cps_subsample):
+    """
+    Test that Calculator calculations coerce Records arrays that do not
+    have the dtype specified in records_variables.json (or a narrower
+    dtype of the same kind) and that the coercions are reported as
+    signature mismatches.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    calc1 = Calculator(policy=pol, records=rec)
+    calc1.calc_all()
+    calc2 = Calculator(policy=pol, records=rec)
+    calc2.array('MARS', calc2.array('MARS').astype(np.int64))
+    calc2.array('XTOT', calc2.array('XTOT').astype(np.float64))
+    taxcalc.decorators.SIGNATURE_MISMATCHES.clear()
+    calc2.calc_all()
+    assert calc2.array('MARS').dtype == np.int32
+    assert calc2.array('XTOT').dtype == np.int32
+    mismatches = signature_mismatches()
+    assert len(mismatches) == 2
+    assert all('coerced' in mismatch for mismatch in mismatches)
+    assert np.array_equal(calc1.array('iitax'), calc2.array('iitax'))
+
+
 def test_make_calculator_raises_on_no_policy(cps_subsample):
     """
     Test Calculator ctor error with no policy argument.
@@ -215,6 +563,28 @@ def test_calculator_mtr_when_PT_rates_differ():
     assert np.allclose(mtr1, mtr2, rtol=0.0, atol=1e-06)
 
 
+def test_calculator_mtrs(cps_subsample):
+    """
+    Test Calculator mtrs method.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    calc = Calculator(policy=Policy(), records=rec)
+    calc.calc_all()
+    combined = calc.array('combined').copy()
+    variables = ['e00200p', 'e00200s', 'e00650', 'k1bx14p', 'e19800']
+    expected = {var: calc.mtr(variable_str=var, calc_all_already_called=True)
+                for var in variables}
+    mtrs = calc.mtrs(variables=variables, calc_all_already_called=True)
+    assert list(mtrs.keys()) == variables
+    for var in variables:
+        for actual, expect in zip(mtrs[var], expected[var]):
+            assert np.array_equal(actual, expect, equal_nan=True)
+    assert np.array_equal(calc.array('combined'), combined)
+    assert len(calc.mtrs()) == len(Calculator.MTR_VALID_VARIABLES)
+    with pytest.raises(ValueError):
+        calc.mtrs(variables=['e00200p', 'bad_income_type'])
+
+
 def test_make_calculator_increment_years_first(cps_subsample):
     """
     Test Calculator inflation indexing of policy parameters.
@@ -290,6 +660,35 @@ def test_ID_HC_vs_BS(cps_subsample):
     assert np.allclose(hc_taxes['iitax'], bs_taxes['iitax'])
 
 
+def test_compute_benefit_leaves_calculator_unchanged(cps_subsample):
+    """
+    Test that ComputeBenefit gets the same benefits as calculating taxes
+    with a copy of the Calculator object that has the haircut parameters
+    set to one, and that it does not change the Calculator object.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    pol = Policy()
+    pol.implement_reform({'ID_BenefitCap_rt': {2013: 0.2}})
+    calc = Calculator(policy=pol, records=rec)
+    calc.calc_all()
+    switch = [True, False, True, False, True, True, False]
+    expected_calc = copy.deepcopy(calc)
+    for name in ['ID_Medical_hc', 'ID_RealEstate_hc',
+                 'ID_Miscellaneous_hc', 'ID_InterestPaid_hc']:
+        expected_calc.policy_param(name, [1.])
+    expected_calc._calc_one_year()  # pylint: disable=protected-access
+    expected = np.maximum(expected_calc.array('iitax') - calc.array('iitax'),
+                          0.)
+    before = calc.dataframe([], all_vars=True)
+    benefit = ComputeBenefit(calc, switch)
+    assert np.array_equal(benefit, expected)
+    assert benefit.max() > 0.
+    after = calc.dataframe([], all_vars=True)
+    for varname in before:
+        assert np.array_equal(before[varname], after[varname])
+    assert calc.policy_param('ID_Medical_hc') == 0.
+
+
 def test_ID_StateLocal_HC_vs_CRT(cps_subsample):
     """
     Test that a cap on state/local income and sales tax deductions at 0 percent
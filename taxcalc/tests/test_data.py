@@ -78,11 +78,11 @@ def test_recs_class(recs_varinfo_file, cps_subsample):
         def __init__(self, data, start_year, gfactors, weights):
             super().__init__(data, start_year, gfactors, weights)
 
-        def _extrapolate(self, year):
+        def _extrapolate(self, year, first_year=None):
             val = getattr(self, 'e00300')
-            setattr(
-                self, 'e00300', val * self.gfactors.factor_value('AINTS', year)
-            )
+            for yr in range(first_year or year, year + 1):
+                val = val * self.gfactors.factor_value('AINTS', yr)
+            setattr(self, 'e00300', val)
 
     # test Recs class for incorrect instantiation:
     with pytest.raises(ValueError):
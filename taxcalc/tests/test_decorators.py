@@ -18,6 +18,14 @@ from taxcalc.decorators import (
     create_apply_function_string,
     create_toplevel_function_string,
     make_apply_function,
+    fused_jit,
+    parallel_apply,
+    vectorized_apply,
+    KernelProfile,
+    profile_kernels,
+    generated_function,
+    jit_generated_function,
+    signature_mismatches,
 )
 
 
@@ -41,27 +49,28 @@ def test_create_apply_function_string_with_params():
     assert ans == exp
 
 
+def test_create_apply_function_string_parallel():
+    """Test docstring"""
+    ans = create_apply_function_string(['a', 'b', 'c'], ['d', 'e'], ['d'],
+                                       parallel=True)
+    exp = ("def ap_func(x_0,x_1,x_2,x_3,x_4):\n"
+           "  for i in prange(len(x_0)):\n"
+           "    x_0[i],x_1[i],x_2[i] = jitted_f(x_3,x_4[i])\n"
+           "  return x_0,x_1,x_2\n")
+    assert ans == exp
+
+
 def test_create_toplevel_function_string_mult_outputs():
     """Test docstring"""
     ans = create_toplevel_function_string(['a', 'b'], ['d', 'e'],
                                           ['pm', 'pm', 'pf', 'pm'])
     exp = ''
     exp = ("def hl_func(pm, pf):\n"
-           "    from pandas import DataFrame\n"
-           "    import numpy as np\n"
-           "    import pandas as pd\n"
-           "    def get_values(x):\n"
-           "        if isinstance(x, pd.Series):\n"
-           "            return x.values\n"
-           "        else:\n"
-           "            return x\n"
            "    outputs = \\\n"
            "        (pm.a, pm.b) = \\\n"
            "        applied_f(get_values(pm.a[0]), get_values(pm.b[0]), "
            "get_values(pf.d), get_values(pm.e[0]), )\n"
-           "    header = ['a', 'b']\n"
-           "    return DataFrame(data=np.column_stack(outputs),"
-           "columns=header)")
+           "    return outputs")
 
     assert ans == exp
 
@@ -72,21 +81,11 @@ def test_create_toplevel_function_string():
                                           ['pm', 'pf', 'pm'])
     exp = ''
     exp = ("def hl_func(pm, pf):\n"
-           "    from pandas import DataFrame\n"
-           "    import numpy as np\n"
-           "    import pandas as pd\n"
-           "    def get_values(x):\n"
-           "        if isinstance(x, pd.Series):\n"
-           "            return x.values\n"
-           "        else:\n"
-           "            return x\n"
            "    outputs = \\\n"
            "        (pm.a) = \\\n"
            "        applied_f(get_values(pm.a[0]), get_values(pf.d), "
            "get_values(pm.e[0]), )\n"
-           "    header = ['a']\n"
-           "    return DataFrame(data=outputs,"
-           "columns=header)")
+           "    return outputs")
     assert ans == exp
 
 
@@ -208,7 +207,7 @@ def test_magic_iterate_jit():
     pf.x = np.ones((5,))
     pf.y = np.ones((5,))
     pf.z = np.ones((5,))
-    xx = magic_calc2(pm, pf)
+    xx = magic_calc2(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[[2.0, 3.0]] * 5, columns=["a", "b"])
     assert_frame_equal(xx, exp)
 
@@ -219,7 +218,8 @@ def test_faux_function_iterate_jit():
     pf = Foo()
     pf.mars = np.ones((5,))
     pf.var = np.ones((5,))
-    ans = faux_function(pm, pf)  # pylint: disable=too-many-function-args
+    # pylint: disable=too-many-function-args
+    ans = faux_function(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[2.0] * 5, columns=['var'])
     assert_frame_equal(ans, exp)
 
@@ -234,12 +234,227 @@ def test_ret_everything_iterate_jit():
     pf.d = np.ones((5,))
     pf.e = np.ones((5,))
     pf.f = np.ones((5,))
-    ans = ret_everything(pm, pf)
+    ans = ret_everything(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[[2.0, 2.0, 2.0, 2.0]] * 5,
                     columns=["c", "d", "e", "f"])
     assert_frame_equal(ans, exp)
 
 
+def test_iterate_jit_returns_updated_arrays():
+    """Test docstring"""
+    some_calc_ = iterate_jit(nopython=True)(some_calc)
+    pm = Foo()
+    pf = Foo()
+    pf.a = np.zeros((5,))
+    pf.b = np.zeros((5,))
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    a_array = pf.a
+    b_array = pf.b
+    ans = some_calc_(pm, pf)
+    assert isinstance(ans, tuple)
+    assert ans[0] is a_array
+    assert ans[1] is b_array
+    assert np.allclose(pf.a, 2.0)
+    assert np.allclose(pf.b, 3.0)
+    pf.mars = np.ones((5,))
+    pf.var = np.zeros((5,))
+    var_array = pf.var
+    # pylint: disable=too-many-function-args
+    ans = faux_function(pm, pf)
+    assert ans is var_array
+    assert np.allclose(pf.var, 2.0)
+
+
+def test_iterate_jit_caches_high_level_function():
+    """Test docstring"""
+    pm = Foo()
+    pf = Foo()
+    pf.a = np.ones((5,))
+    pf.b = np.ones((5,))
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    num_layouts = len(magic_calc2.hl_func_cache)
+    hits = magic_calc2.hl_func_cache_hits
+    for _ in range(3):
+        ans = magic_calc2(pm, pf, return_dataframe=True)
+    assert len(magic_calc2.hl_func_cache) == num_layouts + 1
+    assert magic_calc2.hl_func_cache_hits == hits + 2
+    exp = DataFrame(data=[[2.0, 3.0]] * 5, columns=["a", "b"])
+    assert_frame_equal(ans, exp)
+    # a different layout of arguments gets its own high level function
+    pm.x = np.ones((1, 5))
+    ans = magic_calc2(pm, pf, return_dataframe=True)
+    assert len(magic_calc2.hl_func_cache) == num_layouts + 2
+    assert magic_calc2.hl_func_cache_hits == hits + 2
+    assert_frame_equal(ans, exp)
+
+
+def test_fused_jit():
+    """Test docstring"""
+    pm = Foo()
+    pf = Foo()
+    pm.w = np.full((1, 5), 4.0)
+    pf.a = np.zeros((5,))
+    pf.b = np.zeros((5,))
+    pf.x = np.arange(5.0)
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    fused = fused_jit([
+        magic_calc3,
+        'a_kept = a',
+        ('x < 2.', ['b = a_kept + w[0]'], [magic_calc5]),
+    ])
+    fused(pm, pf)
+    fused(pm, pf)
+    assert len(fused.fused_func_cache) == 1
+    assert np.array_equal(pf.a, np.arange(5.0) + 1.0)
+    assert np.array_equal(pf.b, [5.0, 6.0, 8.0, 9.0, 10.0])
+
+
+def test_fused_jit_vectorized_apply():
+    """Test docstring"""
+    pm = Foo()
+    pf = Foo()
+    pm.w = np.full((1, 5), 4.0)
+    pf.a = np.zeros((5,))
+    pf.b = np.zeros((5,))
+    pf.x = np.arange(5.0)
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    fused = fused_jit([
+        magic_calc3,
+        'a_kept = a',
+        ('x < 2.', ['b = a_kept + w[0]'], [magic_calc5]),
+    ])
+    with vectorized_apply(True):
+        fused(pm, pf)
+    assert not fused.fused_func_cache
+    assert len(fused.vectorized_func_cache) == 1
+    assert np.array_equal(pf.a, np.arange(5.0) + 1.0)
+    assert np.array_equal(pf.b, [5.0, 6.0, 8.0, 9.0, 10.0])
+
+
+def test_iterate_jit_vectorized_apply():
+    """Test docstring"""
+    pm = Foo()
+    pf = Foo()
+    pf.mars = np.array([1, 2, 1, 3, 4], dtype=np.int32)
+    pf.var = np.zeros((5,))
+    # pylint: disable=too-many-function-args
+    exp = faux_function(pm, pf, return_dataframe=True)
+    pf.var = np.zeros((5,))
+    assert not taxcalc.decorators.VECTORIZED
+    with vectorized_apply(True):
+        assert taxcalc.decorators.VECTORIZED
+        ans = faux_function(pm, pf, return_dataframe=True)
+    assert not taxcalc.decorators.VECTORIZED
+    assert_frame_equal(ans, exp, check_exact=True)
+    assert np.array_equal(pf.var, [2., 1., 2., 1., 1.])
+
+
+def test_profile_kernels():
+    """Test docstring"""
+    pm = Foo()
+    pf = Foo()
+    pf.a = np.zeros((5,))
+    pf.b = np.zeros((5,))
+    pf.x = np.arange(5.0)
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    magic_calc2(pm, pf)
+    assert taxcalc.decorators.PROFILE is None
+    with profile_kernels(KernelProfile()) as prof:
+        magic_calc2(pm, pf)
+        with profile_kernels(None) as inner_prof:
+            assert inner_prof is prof
+            magic_calc2(pm, pf)
+    assert taxcalc.decorators.PROFILE is None
+    assert list(prof.stats) == ['magic_calc2']
+    dframe = prof.dataframe()
+    assert dframe.loc['magic_calc2', 'calls'] == 2
+    assert dframe.loc['magic_calc2', 'records'] == 10
+    assert dframe.loc['magic_calc2', 'bytes'] == 2 * 5 * 5 * 8
+    assert dframe.loc['magic_calc2', 'seconds'] > 0.
+    assert 'magic_calc2' in prof.report()
+
+
+def test_iterate_jit_parallel_apply():
+    """Test docstring"""
+    pm = Foo()
+    pf = Foo()
+    pf.a = np.zeros((1000,))
+    pf.b = np.zeros((1000,))
+    pf.x = np.linspace(0.1, 100.0, 1000)
+    pf.y = np.sqrt(pf.x)
+    pf.z = np.log(pf.x)
+    exp = magic_calc2(pm, pf, return_dataframe=True)
+    assert not taxcalc.decorators.PARALLEL
+    with parallel_apply(True):
+        assert taxcalc.decorators.PARALLEL
+        ans = magic_calc2(pm, pf, return_dataframe=True)
+    assert not taxcalc.decorators.PARALLEL
+    assert any(key[:2] == (('pf',) * 5, True)
+               for key in magic_calc2.hl_func_cache)
+    assert_frame_equal(ans, exp, check_exact=True)
+
+
+def test_generated_function_cache_dir(tmp_path, monkeypatch):
+    """Test docstring"""
+    monkeypatch.setattr(taxcalc.decorators, 'CACHE_DIR', str(tmp_path))
+    fstr = create_apply_function_string(['a', 'b'], ['x', 'y', 'z'], [])
+    funcglobals = {'jitted_f': some_calc}
+    ap_func = generated_function(fstr, 'ap_func', funcglobals, [some_calc])
+    version_dir = tmp_path / f'taxcalc-{taxcalc.__version__}'
+    paths = list(version_dir.glob('ap_func_*.py'))
+    assert len(paths) == 1
+    assert paths[0].read_text(encoding='utf-8') == fstr
+    ans = ap_func(np.zeros(3), np.zeros(3),
+                  np.ones(3), np.ones(3), np.ones(3))
+    assert np.array_equal(ans[1], [3.0, 3.0, 3.0])
+    # same code reuses the existing source file
+    generated_function(fstr, 'ap_func', funcglobals, [some_calc])
+    assert list(version_dir.glob('ap_func_*.py')) == paths
+    # a new taxcalc version uses a new directory
+    monkeypatch.setattr(taxcalc, '__version__', '0.0.0')
+    generated_function(fstr, 'ap_func', funcglobals, [some_calc])
+    assert len(list(tmp_path.glob('taxcalc-0.0.0/ap_func_*.py'))) == 1
+
+
+def test_jit_generated_function_uses_aot_bundle(monkeypatch):
+    """Test docstring"""
+    fstr = create_apply_function_string(['a', 'b'], ['x', 'y', 'z'], [])
+    jitted_f = magic_calc2.kernel().jitted_f
+    ap_func = generated_function(fstr, 'ap_func', {'jitted_f': jitted_f},
+                                 [jitted_f])
+    aot_calls = []
+
+    def aot_func(*args):
+        """Function docstring"""
+        aot_calls.append(args)
+        return ap_func(*args)
+
+    bundle = (Foo(), {ap_func.generated_name: ['array(float64, 1d, C)'] * 5})
+    setattr(bundle[0], ap_func.generated_name, aot_func)
+    monkeypatch.setattr(taxcalc.decorators, 'aot_bundle', lambda: bundle)
+    jitted = jit_generated_function(ap_func, nopython=True)
+    ans = jitted(np.zeros(3), np.zeros(3), np.ones(3), np.ones(3), np.ones(3))
+    assert len(aot_calls) == 1
+    assert np.array_equal(ans[1], [3.0, 3.0, 3.0])
+    # arguments of other types are not passed to the bundle function
+    ans = jitted(np.zeros(3), np.zeros(3), np.ones(3), np.ones(3),
+                 np.ones(3, dtype=np.int32))
+    assert len(aot_calls) == 1
+    assert np.array_equal(ans[1], [3.0, 3.0, 3.0])
+    # the bundle is not used when USE_AOT_BUNDLE is False
+    monkeypatch.setattr(taxcalc.decorators, 'USE_AOT_BUNDLE', False)
+    jitted = jit_generated_function(ap_func, nopython=True)
+    jitted(np.zeros(3), np.zeros(3), np.ones(3), np.ones(3), np.ones(3))
+    assert len(aot_calls) == 1
+
+
 @iterate_jit(nopython=True)
 def magic_calc3(x, y, z):
     """Function docstring"""
@@ -257,7 +472,7 @@ def test_function_takes_kwarg():
     pf.x = np.ones((5,))
     pf.y = np.ones((5,))
     pf.z = np.ones((5,))
-    ans = magic_calc3(pm, pf)
+    ans = magic_calc3(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[[2.0, 3.0]] * 5,
                     columns=["a", "b"])
     assert_frame_equal(ans, exp)
@@ -280,7 +495,7 @@ def test_function_no_parameters_listed():
     pf.x = np.ones((5,))
     pf.y = np.ones((5,))
     pf.z = np.ones((5,))
-    ans = magic_calc4(pm, pf)
+    ans = magic_calc4(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[[2.0, 3.0]] * 5,
                     columns=["a", "b"])
     assert_frame_equal(ans, exp)
@@ -304,7 +519,7 @@ def test_function_parameters_optional():
     pf.x = np.ones((5,))
     pf.y = np.ones((5,))
     pf.z = np.ones((5,))
-    ans = magic_calc5(pm, pf)
+    ans = magic_calc5(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[[2.0, 4.0]] * 5,
                     columns=["a", "b"])
     assert_frame_equal(ans, exp)
@@ -328,9 +543,49 @@ def unjittable_function2(w, x, y, z):
 
 def test_iterate_jit_raises_on_no_return():
     """Test docstring"""
+    ij = iterate_jit(parameters=['w'], nopython=True)
+    uf1 = ij(unjittable_function1)
+    pm = Foo()
+    pf = Foo()
+    pm.w = np.ones((1, 5))
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
     with pytest.raises(ValueError):
-        ij = iterate_jit(parameters=['w'], nopython=True)
-        ij(unjittable_function1)
+        uf1(pm, pf)
+
+
+def test_iterate_jit_reports_signature_mismatch():
+    """Test docstring"""
+    some_calc_ = iterate_jit(nopython=True)(some_calc)
+    pm = Foo()
+    pf = Foo()
+    pf.a = np.ones((5,))
+    pf.b = np.ones((5,))
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    some_calc_(pm, pf)
+    some_calc_(pm, pf)
+    mismatch = ('some_calc: z of array(int64, 1d, C) type instead of '
+                'array(float64, 1d, C) type, so compiled for another '
+                'signature')
+    assert mismatch not in signature_mismatches()
+    pf.z = np.ones((5,), dtype=np.int64)
+    some_calc_(pm, pf)
+    assert len(some_calc_.hl_func_cache) == 2
+    assert signature_mismatches()[mismatch] == 1
+
+
+def test_iterate_jit_is_lazy():
+    """Test docstring"""
+    some_calc_ = iterate_jit(nopython=True)(some_calc)
+    # pylint: disable=too-many-function-args
+    assert some_calc_.kernel.cache_info().currsize == 0
+    kern = some_calc_.kernel()
+    assert kern.in_args == ['x', 'y', 'z']
+    assert kern.out_args == ['a', 'b']
+    assert some_calc_.kernel() is kern
 
 
 def test_iterate_jit_raises_on_unknown_return_argument():
@@ -375,7 +630,7 @@ def test_force_no_jit():
     pf.x = np.ones((5,))
     pf.y = np.ones((5,))
     pf.z = np.ones((5,))
-    ans = magic_calc6_(pm, pf)
+    ans = magic_calc6_(pm, pf, return_dataframe=True)
     exp = DataFrame(data=[[2.0, 4.0]] * 5,
                     columns=["a", "b"])
     assert_frame_equal(ans, exp)
@@ -6,12 +6,13 @@ Test Records class and its methods.
 # pylint --disable=locally-disabled test_records.py
 
 import os
+import copy
 import json
 from io import StringIO
 import numpy as np
 import pandas as pd
 import pytest
-from taxcalc import GrowFactors, Policy, Records
+from taxcalc import Calculator, Consumption, GrowFactors, Policy, Records
 
 
 def test_incorrect_records_instantiation(cps_subsample, cps_fullsample):
@@ -60,6 +61,174 @@ def test_correct_records_instantiation(cps_subsample):
     assert getattr(rec2, 'current_year') == getattr(rec2, 'data_year')
 
 
+def test_read_chunks(cps_subsample, tmp_path):
+    """
+    Test that Records.read_chunks returns Records objects that contain
+    consecutive blocks of the records read from a DataFrame or a CSV file,
+    which may be in the package.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    data = cps_subsample.reset_index(drop=True)
+    weights = rec.WT.reset_index(drop=True)
+    data_path = os.path.join(tmp_path, 'data.csv')
+    data.to_csv(data_path, index=False)
+    weights_path = os.path.join(tmp_path, 'weights.csv')
+    weights.to_csv(weights_path, index=False)
+    for data_arg, weights_arg in [(data, weights),
+                                  (data_path, weights_path)]:
+        chunks = list(Records.read_chunks(1000, data=data_arg,
+                                          start_year=Records.CPSCSV_YEAR,
+                                          weights=weights_arg,
+                                          adjust_ratios=None))
+        assert [chunk.array_length for chunk in chunks] == [1000, 1000, 800]
+        for varname in ['e00200', 'MARS', 's006']:
+            assert np.allclose(
+                np.concatenate([getattr(chunk, varname) for chunk in chunks]),
+                getattr(rec, varname)
+            )
+    chunks = Records.read_chunks(1000, data='cps.csv.gz',
+                                 start_year=Records.CPSCSV_YEAR,
+                                 gfactors=None, weights=None,
+                                 adjust_ratios=None)
+    assert next(chunks).array_length == 1000
+    chunks.close()
+    with pytest.raises(ValueError):
+        _ = list(Records.read_chunks(300, data='no_such_file.csv'))
+    with pytest.raises(ValueError):
+        _ = list(Records.read_chunks(0, data=data))
+    with pytest.raises(ValueError):
+        _ = list(Records.read_chunks(300, data=data,
+                                     start_year=Records.CPSCSV_YEAR,
+                                     weights=weights.iloc[:-1],
+                                     adjust_ratios=None))
+    with pytest.raises(ValueError):
+        _ = list(Records.read_chunks(300, data=data.iloc[:-1],
+                                     start_year=Records.CPSCSV_YEAR,
+                                     weights=weights,
+                                     adjust_ratios=None))
+
+
+def test_read_columnar_data(cps_subsample, tmp_path):
+    """
+    Test that Records reads only the usable columns of Parquet and Feather
+    files into arrays that are the same as those read from a DataFrame.
+    """
+    pytest.importorskip('pyarrow')
+    data = cps_subsample.reset_index(drop=True)
+    data['unusable_var'] = 1.0
+    weights = Records.cps_constructor(data=cps_subsample).WT
+    weights = weights.reset_index(drop=True)
+    rec = Records(data=data, start_year=Records.CPSCSV_YEAR,
+                  weights=weights, adjust_ratios=None)
+    parquet_path = os.path.join(tmp_path, 'data.parquet')
+    data.to_parquet(parquet_path, index=False)
+    feather_path = os.path.join(tmp_path, 'data.feather')
+    data.to_feather(feather_path)
+    for path in [parquet_path, feather_path]:
+        crec = Records(data=path, start_year=Records.CPSCSV_YEAR,
+                       weights=weights, adjust_ratios=None)
+        assert crec.array_length == rec.array_length
+        assert crec.IGNORED_VARS == rec.IGNORED_VARS == {'unusable_var'}
+        assert crec.MARS.dtype == np.int32
+        assert crec.e00200.dtype == np.float64
+        for varname in rec.USABLE_READ_VARS | {'s006'}:
+            assert np.allclose(getattr(crec, varname), getattr(rec, varname))
+        crec.increment_year()  # the arrays read from the file are writable
+
+
+def test_npy_files(cps_subsample, tmp_path):
+    """
+    Test that Records memory-maps the NPY files written by write_npy_files
+    read-only, that Calculator objects share the mapped arrays, and that
+    the results are the same as those from Records that read a DataFrame.
+    """
+    data = cps_subsample.reset_index(drop=True)
+    weights = Records.cps_constructor(data=cps_subsample).WT
+    weights = weights.reset_index(drop=True)
+    rec = Records(data=data, start_year=Records.CPSCSV_YEAR,
+                  weights=weights, adjust_ratios=None)
+    rec.write_npy_files(str(tmp_path))
+    assert os.path.isfile(os.path.join(tmp_path, 'e00200.npy'))
+    assert not os.path.isfile(os.path.join(tmp_path, 'c00100.npy'))
+    mrec = Records(data=str(tmp_path), start_year=Records.CPSCSV_YEAR,
+                   weights=weights, adjust_ratios=None)
+    assert isinstance(mrec.e00200, np.memmap)
+    assert not mrec.e00200.flags.writeable
+    assert mrec.c00100.flags.writeable
+    mcalc = Calculator(policy=Policy(), records=mrec)
+    assert mcalc.array('e00200') is mrec.e00200
+    calc = Calculator(policy=Policy(), records=rec)
+    for this_calc in [calc, mcalc]:
+        this_calc.advance_to_year(2019)
+        this_calc.calc_all()
+    assert mcalc.array('e00200').flags.writeable
+    for varname in ['e00200', 'c00100', 'iitax', 'combined']:
+        assert np.allclose(mcalc.array(varname), calc.array(varname))
+    assert not mrec.e00200.flags.writeable
+    assert np.allclose(mrec.e00200, rec.e00200)
+    np.save(os.path.join(tmp_path, 'MARS.npy'), data['MARS'].values)
+    with pytest.raises(ValueError):
+        _ = Records(data=str(tmp_path), start_year=Records.CPSCSV_YEAR,
+                    weights=weights, adjust_ratios=None)
+
+
+def test_npy_files_mtr_and_response(cps_subsample, tmp_path):
+    """
+    Test that the calculations that change Records arrays in place (the
+    mtr method and the consumption response) work on arrays mapped from
+    NPY files and get the same results as on arrays read from a DataFrame.
+    """
+    data = cps_subsample.reset_index(drop=True)
+    weights = Records.cps_constructor(data=cps_subsample).WT
+    weights = weights.reset_index(drop=True)
+    rec = Records(data=data, start_year=Records.CPSCSV_YEAR,
+                  weights=weights, adjust_ratios=None)
+    rec.write_npy_files(str(tmp_path))
+    mrec = Records(data=str(tmp_path), start_year=Records.CPSCSV_YEAR,
+                   weights=weights, adjust_ratios=None)
+    consump = Consumption()
+    consump.update_consumption({'MPC_e17500': {Records.CPSCSV_YEAR: 0.2}})
+    results = []
+    for this_rec in [rec, mrec]:
+        calc = Calculator(policy=Policy(), records=this_rec,
+                          consumption=consump)
+        calc.calc_all()
+        mtrs = calc.mtr('e00200p')
+        results.append((calc.array('e17500'), calc.array('iitax')) + mtrs)
+    assert not mrec.e17500.flags.writeable
+    for value, mapped_value in zip(results[0], results[1]):
+        assert np.allclose(mapped_value, value)
+    with pytest.raises(ValueError):
+        Records(data=None, gfactors=None,
+                weights=None).write_npy_files(str(tmp_path))
+
+
+def test_increment_year_num_years(cps_subsample):
+    """
+    Test that Records.increment_year with num_years greater than one gets
+    the same results as num_years calls, including sign-dependent growth
+    factors and adjustment ratios.
+    """
+    ratios_path = os.path.join(Records.CODE_PATH, Records.PUF_RATIOS_FILENAME)
+    ratios_df = pd.read_csv(ratios_path, index_col=0).transpose()
+    rec1 = Records.cps_constructor(data=cps_subsample)
+    rec1.ADJ = ratios_df.astype(np.float32)
+    rec1.agi_bin[:] = np.arange(rec1.array_length) % len(ratios_df.index)
+    rec1.e00900p[:3] = [-1000., 0., 1000.]
+    rec1.e00900[:3] = rec1.e00900p[:3] + rec1.e00900s[:3]
+    rec2 = copy.deepcopy(rec1)
+    for _ in range(7):
+        rec1.increment_year()
+    rec2.increment_year(num_years=7)
+    assert rec2.current_year == rec1.current_year == Records.CPSCSV_YEAR + 7
+    for varname in sorted(rec1.USABLE_READ_VARS | rec1.CALCULATED_VARS):
+        assert np.allclose(getattr(rec1, varname), getattr(rec2, varname),
+                           rtol=1e-12, atol=0.)
+    assert rec2.e00900p[0] < 0. < rec2.e00900p[2]
+    with pytest.raises(ValueError):
+        rec2.increment_year(num_years=0)
+
+
 def test_read_cps_data(cps_fullsample):
     """Test docstring"""
     data = Records.read_cps_data()
@@ -0,0 +1,90 @@
+"""
+Tests of cached_records function.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle test_recordscache.py
+# pylint --disable=locally-disabled test_recordscache.py
+
+import os
+import numpy as np
+import pytest
+from taxcalc import GrowDiff, GrowFactors, Records, cached_records
+
+
+def test_cached_records(cps_subsample, tmp_path, monkeypatch):
+    """
+    Test that cached_records returns the same data whether or not they are
+    read from the cache, that the data read from the cache are neither
+    checked nor copied, and that it keeps the cache within its size.
+    """
+    data = cps_subsample.reset_index(drop=True)
+    weights = Records.cps_constructor(data=cps_subsample).WT
+    weights = weights.reset_index(drop=True)
+    args = {'data': data, 'start_year': Records.CPSCSV_YEAR,
+            'weights': weights, 'adjust_ratios': None}
+    cache_dir = str(tmp_path)
+    year = 2018
+    rec = cached_records(cache_dir, year, **args)
+    assert rec.data_year == Records.CPSCSV_YEAR
+    assert rec.current_year == year
+    assert len(os.listdir(cache_dir)) == 1
+    with monkeypatch.context() as mpatch:
+        mpatch.setattr(Records, '_check_read_vars', None)  # is not called
+        crec = cached_records(cache_dir, year, **args)
+    assert crec.data_year == Records.CPSCSV_YEAR
+    assert crec.current_year == year
+    assert isinstance(getattr(crec, 'e00200'), np.memmap)
+    assert not getattr(crec, 'e00200').flags.writeable
+    for varname in ['e00200', 'e00300', 'MARS', 'FLPDYR', 's006']:
+        assert np.allclose(getattr(crec, varname), getattr(rec, varname))
+    crec.increment_year()
+    rec.increment_year()
+    assert getattr(crec, 'e00200').flags.writeable
+    assert np.allclose(getattr(crec, 'e00200'), getattr(rec, 'e00200'))
+    assert np.allclose(crec.s006, rec.s006)
+    # different growth factors imply a different cache entry, and a zero
+    # cache size leaves only the entry just added
+    gfactors = GrowFactors()
+    gdiff = GrowDiff()
+    gdiff.update_growdiff({'AWAGE': {2016: 0.01}})
+    gdiff.apply_to(gfactors)
+    grec = cached_records(cache_dir, year, max_cache_bytes=0,
+                          gfactors=gfactors, **args)
+    assert len(os.listdir(cache_dir)) == 1
+    assert not np.allclose(getattr(grec, 'e00200'), getattr(crec, 'e00200'))
+    # incorrect usage
+    with pytest.raises(ValueError):
+        cached_records(cache_dir, year, gfactors=None, **args)
+    with pytest.raises(ValueError):
+        cached_records(cache_dir, year, data=cps_subsample,
+                       **{name: value for name, value in args.items()
+                          if name != 'data'})
+    with pytest.raises(ValueError):
+        cached_records(cache_dir, Records.CPSCSV_YEAR - 1, **args)
+
+
+def test_cached_compact_records(cps_subsample, tmp_path):
+    """
+    Test that cached_records returns the same compact data whether or not
+    they are read from the cache.
+    """
+    data = cps_subsample.reset_index(drop=True)
+    weights = Records.cps_constructor(data=cps_subsample).WT
+    args = {'data': data, 'start_year': Records.CPSCSV_YEAR,
+            'weights': weights.reset_index(drop=True), 'adjust_ratios': None,
+            'compact': True}
+    cache_dir = str(tmp_path)
+    year = 2018
+    rec = cached_records(cache_dir, year, **args)
+    crec = cached_records(cache_dir, year, **args)
+    assert len(os.listdir(cache_dir)) == 1
+    for varname, dtype in [('e00200', np.float32), ('EIC', np.int8),
+                           ('MARS', np.int8), ('FLPDYR', np.int32)]:
+        assert getattr(crec, varname).dtype == dtype
+        assert np.array_equal(getattr(crec, varname), getattr(rec, varname))
+    assert isinstance(getattr(crec, 'e00200'), np.memmap)
+    # the uncompacted data are a different cache entry
+    args['compact'] = False
+    urec = cached_records(cache_dir, year, **args)
+    assert len(os.listdir(cache_dir)) == 2
+    assert getattr(urec, 'e00200').dtype == np.float64
@@ -14,6 +14,7 @@ import pandas as pd
 from taxcalc.policy import Policy
 from taxcalc.records import Records
 from taxcalc.calculator import Calculator
+from taxcalc.decorators import SIGNATURE_MISMATCHES, signature_mismatches
 
 
 def test_2017_law_reform(tests_path):
@@ -358,6 +359,78 @@ def test_reforms(rid, test_reforms_init, tests_path, baseline_2017_law,
         afile.write(f'{actual}\n')
 
 
+def reform_aggregates(reform_dict, recs, reform_2017_law):
+    """
+    Return, for each of the specified Records objects, the weighted totals
+    of the output_type variable under the baseline and under the reform
+    specified by reform_dict in the reform's start_year.
+    """
+    start_year = reform_dict['start_year']
+    pol1 = Policy()
+    if reform_dict['baseline'] == '2017_law.json':
+        pol1.implement_reform(reform_2017_law)
+    pol1.set_year(start_year)
+    pol2 = Policy()
+    if reform_dict['baseline'] == '2017_law.json':
+        pol2.implement_reform(reform_2017_law)
+    pol2.implement_reform({name: {start_year: value}
+                           for name, value in reform_dict['value'].items()})
+    pol2.set_year(start_year)
+    results = []
+    for rec in recs:
+        totals = []
+        for pol in [pol1, pol2]:
+            calc = Calculator(policy=pol, records=rec, verbose=False)
+            calc.calc_all()
+            totals.append(calc.weighted_total(reform_dict['output_type']))
+        results.append(totals)
+    return results
+
+
+# test reforms used to measure the errors caused by compact Records storage
+COMPACT_RIDS = list(range(1, NUM_REFORMS + 1, 8))
+
+
+def test_compact_records(reforms_dict, baseline_2017_law, cps_subsample):
+    """
+    Measure, for a sample of the test reforms, the error in the aggregate
+    baseline and reform results caused by storing the input data in
+    compact form (see Records compact argument), and check that compact
+    storage still uses less memory after the calculations.  On the full CPS
+    file, compact storage saves about a fifth, not half, of the memory
+    used by the Records arrays, because the calculated variables, which
+    use most of the memory, are still stored as float64 values.
+    """
+    weights = Records.cps_constructor(data=cps_subsample).WT
+    recs = [Records(data=cps_subsample.reset_index(drop=True),
+                    start_year=Records.CPSCSV_YEAR,
+                    weights=weights.reset_index(drop=True),
+                    adjust_ratios=None,
+                    compact=compact)
+            for compact in [False, True]]
+    names = recs[0].USABLE_READ_VARS | recs[0].CALCULATED_VARS
+    SIGNATURE_MISMATCHES.clear()
+    nbytes = []
+    for rec in recs:
+        calc = Calculator(policy=Policy(), records=rec, verbose=False)
+        calc.calc_all()
+        nbytes.append(sum(calc.array(name).nbytes for name in names))
+    # calculations neither widen nor coerce the compact arrays
+    assert calc.array('MARS').dtype == np.int8
+    assert calc.array('e00200').dtype == np.float32
+    assert not any('coerced' in mismatch
+                   for mismatch in signature_mismatches())
+    assert nbytes[1] < 0.85 * nbytes[0]
+    max_error = 0.
+    for rid in COMPACT_RIDS:
+        results = reform_aggregates(reforms_dict[str(rid)], recs,
+                                    baseline_2017_law)
+        scale = max(abs(total) for total in results[0]) or 1.
+        for total, compact_total in zip(results[0], results[1]):
+            max_error = max(max_error, abs(compact_total - total) / scale)
+    assert max_error < 1e-6
+
+
 @pytest.mark.extend_tcja
 def test_ext_reform(tests_path):
     """
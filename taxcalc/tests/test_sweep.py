@@ -0,0 +1,83 @@
+"""
+Tests of reform_sweep function.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle test_sweep.py
+# pylint --disable=locally-disabled test_sweep.py
+
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+import taxcalc.sweep
+from taxcalc import Policy, Records, Calculator, reform_sweep
+
+
+def test_reform_sweep(cps_subsample):
+    """
+    Test that reform_sweep gets the same results as Calculator objects
+    constructed for current-law policy and for each reform.
+    """
+    rec = Records.cps_constructor(data=cps_subsample)
+    reforms = [{'II_rt4': {2020: 0.35}},
+               {'BEN_ssi_repeal': {2020: True}, 'UBI_21': {2020: 500}}]
+    years = [2021, 2020]
+    aggregates, diff_tables = reform_sweep(rec, reforms, years,
+                                           num_workers=2)
+    assert rec.current_year == Records.CPSCSV_YEAR
+    assert len(aggregates.index) == len(years) * (len(reforms) + 1)
+    for year in years:
+        calc1 = Calculator(policy=Policy(), records=rec)
+        calc1.advance_to_year(year)
+        calc1.calc_all()
+        for idx, reform in enumerate([None] + reforms):
+            if reform is None:
+                calc = calc1
+                row = aggregates[(aggregates['year'] == year) &
+                                 aggregates['reform'].isnull()]
+            else:
+                pol = Policy()
+                pol.implement_reform(reform)
+                calc = Calculator(policy=pol, records=rec)
+                calc.advance_to_year(year)
+                calc.calc_all()
+                row = aggregates[(aggregates['year'] == year) &
+                                 (aggregates['reform'] == idx - 1)]
+                diff = calc1.difference_table(calc, 'weighted_deciles',
+                                              'combined')
+                assert np.allclose(
+                    diff.values.astype('float'),
+                    diff_tables[(year, idx - 1)].values.astype('float'),
+                    equal_nan=True
+                )
+            assert len(row.index) == 1
+            for tax in ['iitax', 'payrolltax', 'combined']:
+                assert np.allclose(row[tax].values[0],
+                                   calc.weighted_total(tax))
+    with pytest.raises(ValueError):
+        reform_sweep(rec, reforms, [2013])
+
+
+def test_reform_sweep_releases_shared_memory(cps_subsample, monkeypatch):
+    """
+    Test that reform_sweep raises the error caused by a bad reform and
+    releases the shared memory blocks it created.
+    """
+    names = []
+
+    def publish(arrays):
+        """Record the name of each shared memory block"""
+        shm, layout = publish_arrays(arrays)
+        names.append(shm.name)
+        return (shm, layout)
+
+    publish_arrays = taxcalc.sweep._publish  # pylint: disable=protected-access
+    monkeypatch.setattr(taxcalc.sweep, '_publish', publish)
+    rec = Records.cps_constructor(data=cps_subsample)
+    reforms = [{'II_rt4': {2020: 0.35}},
+               {'II_rt4': {2020: 'bad'}}]
+    with pytest.raises(ValueError):
+        reform_sweep(rec, reforms, [2020], num_workers=2)
+    assert len(names) == 2
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -11,8 +11,9 @@ import os
 from io import StringIO
 import tempfile
 import pytest
+import numpy as np
 import pandas as pd
-from taxcalc import TaxCalcIO
+from taxcalc import Records, Calculator, TaxCalcIO
 
 
 RAWINPUT = (
@@ -345,6 +346,39 @@ def test_creation_with_aging(reformfile0):
     assert tcio.tax_year() == taxyear
 
 
+@pytest.mark.parametrize('growdiff_response, shared', [
+    ('{}', True),
+    ('{"AWAGE": {"2019": 0.05}}', False),
+])
+def test_init_shares_input_data(growdiff_response, shared, tmp_path):
+    """
+    Test that TaxCalcIO.init shares the extrapolated input data of the
+    baseline and reform Calculator objects unless their growth factors
+    differ, and that the calculated variables are never shared.
+    """
+    taxyear = 2021
+    assump = os.path.join(tmp_path, 'assump.json')
+    with open(assump, 'w', encoding='utf-8') as afile:
+        afile.write('{"consumption": {}, "growdiff_baseline": {}, '
+                    f'"growdiff_response": {growdiff_response}}}')
+    tcio = TaxCalcIO(input_data=pd.read_csv(StringIO(RAWINPUT)),
+                     tax_year=taxyear, baseline=None, reform=None,
+                     assump=assump)
+    assert not tcio.errmsg
+    tcio.init(input_data=pd.read_csv(StringIO(RAWINPUT)),
+              tax_year=taxyear, baseline=None, reform=None, assump=assump,
+              aging_input_data=True, exact_calculations=False)
+    assert not tcio.errmsg
+    assert tcio.calc_base.current_year == taxyear
+    assert (tcio.calc_base.array('e00200') is
+            tcio.calc.array('e00200')) == shared
+    assert tcio.calc_base.array('c00100') is not tcio.calc.array('c00100')
+    tcio.calc.calc_all()
+    tcio.calc_base.calc_all()
+    assert np.allclose(tcio.calc_base.array('combined'),
+                       tcio.calc.array('combined'))
+
+
 def test_ctor_init_with_cps_files():
     """
     Test use of CPS input files.
@@ -366,6 +400,82 @@ def test_ctor_init_with_cps_files():
     assert tcio.errmsg
 
 
+def test_init_with_cache_dir(cps_subsample, tmp_path):
+    """
+    Test that TaxCalcIO gets the same results whether or not the
+    extrapolated input data are read from a cache, including the marginal
+    tax rates in --dump output, which change input arrays.
+    """
+    txyr = 2020
+    data = cps_subsample.reset_index(drop=True)
+    cache_dir = str(tmp_path / 'cache')
+    dumps = []
+    for _ in range(2):
+        tcio = TaxCalcIO(data, txyr, None, None, None, outdir=str(tmp_path))
+        tcio.init(data, txyr, None, None, None,
+                  aging_input_data=True,
+                  exact_calculations=False,
+                  cache_dir=cache_dir)
+        assert not tcio.errmsg
+        assert tcio.tax_year() == txyr
+        assert tcio.calc.data_year == Records.PUFCSV_YEAR
+        assert len(os.listdir(cache_dir)) == 1
+        dumpvars = {'RECID', 'e00200', 's006', 'mtr_inctax', 'iitax'}
+        tcio.analyze(writing_output_file=True, output_dump=True,
+                     dump_varset=dumpvars)
+        dumps.append(pd.read_csv(tcio.output_filepath()))
+    assert dumps[0].equals(dumps[1])
+
+
+def test_consumption_response_with_shared_input_data(
+        cps_subsample, reformfile1, assumpfile1, monkeypatch):
+    """
+    Test that the consumption response in the mtr method of the reform
+    Calculator object, which shares the input arrays of the baseline
+    Calculator object, leaves the baseline results unchanged.
+    """
+    taxyear = 2021
+    data = cps_subsample.reset_index(drop=True)
+
+    def initialized_tcio(reform):
+        """Return TaxCalcIO object initialized with the reform"""
+        tcio = TaxCalcIO(input_data=data, tax_year=taxyear,
+                         baseline=None, reform=reform,
+                         assump=assumpfile1.name)
+        assert not tcio.errmsg
+        tcio.init(input_data=data, tax_year=taxyear,
+                  baseline=None, reform=reform, assump=assumpfile1.name,
+                  aging_input_data=True, exact_calculations=False)
+        assert not tcio.errmsg
+        return tcio
+
+    expect = initialized_tcio(None)
+    tcio = initialized_tcio(reformfile1.name)
+    assert tcio.calc.consump_param('MPC_e18400') > 0.
+    assert tcio.calc_base.array('e00200') is tcio.calc.array('e00200')
+    assert tcio.calc_base.array('e18400') is not tcio.calc.array('e18400')
+    expect.calc_base.calc_all()
+    e18400 = expect.calc_base.array('e18400')
+    restore_records = Calculator.restore_records
+    checks = []
+
+    def restore(calc):
+        """Check the baseline input values while they can be changed"""
+        checks.append(np.array_equal(tcio.calc_base.array('e18400'), e18400))
+        restore_records(calc)
+
+    monkeypatch.setattr(Calculator, 'restore_records', restore)
+    tcio.calc.calc_all()
+    tcio.calc.mtr()
+    assert checks and all(checks)
+    tcio.calc_base.calc_all()
+    for varname in ['e18400', 'iitax', 'combined']:
+        assert np.array_equal(tcio.calc_base.array(varname),
+                              expect.calc_base.array(varname))
+    assert not np.array_equal(tcio.calc.array('iitax'),
+                              expect.calc_base.array('iitax'))
+
+
 @pytest.mark.parametrize("dumpvar_str, str_valid, num_vars", [
     ("""
     MARS;iitax	payrolltax|combined,
@@ -463,7 +573,27 @@ def test_output_options(reformfile1, assumpfile1):
         os.remove(outfilepath)
 
 
-def test_write_doc_file(reformfile1, assumpfile1):
+def test_parquet_input_file(reformfile1, tmp_path):
+    """
+    Test TaxCalcIO with INPUT data read from a Parquet file.
+    """
+    pytest.importorskip('pyarrow')
+    taxyear = 2021
+    input_path = os.path.join(tmp_path, 'raw.parquet')
+    pd.read_csv(StringIO(RAWINPUT)).to_parquet(input_path, index=False)
+    tcio = TaxCalcIO(input_data=input_path, tax_year=taxyear,
+                     baseline=None, reform=reformfile1.name, assump=None,
+                     outdir=str(tmp_path))
+    assert not tcio.errmsg
+    assert os.path.basename(tcio.output_filepath()).startswith('raw-21-')
+    tcio.init(input_data=input_path, tax_year=taxyear,
+              baseline=None, reform=reformfile1.name, assump=None,
+              aging_input_data=False, exact_calculations=False)
+    assert not tcio.errmsg
+    assert tcio.calc.array('MARS').tolist() == [2, 1, 4, 3]
+
+
+def test_write_doc_file(reformfile1, assumpfile1, tmp_path):
     """
     Test write_doc_file with compound reform.
     """
@@ -473,7 +603,8 @@ def test_write_doc_file(reformfile1, assumpfile1):
                      tax_year=taxyear,
                      baseline=None,
                      reform=compound_reform,
-                     assump=assumpfile1.name)
+                     assump=assumpfile1.name,
+                     outdir=str(tmp_path))
     assert not tcio.errmsg
     tcio.init(input_data=pd.read_csv(StringIO(RAWINPUT)),
               tax_year=taxyear,
@@ -490,7 +621,7 @@ def test_write_doc_file(reformfile1, assumpfile1):
         os.remove(docfilepath)
 
 
-def test_sqldb_option(reformfile1, assumpfile1):
+def test_sqldb_option(reformfile1, assumpfile1, tmp_path):
     """
     Test TaxCalcIO output_sqldb option when not writing_output_file.
     """
@@ -499,7 +630,8 @@ def test_sqldb_option(reformfile1, assumpfile1):
                      tax_year=taxyear,
                      baseline=None,
                      reform=reformfile1.name,
-                     assump=assumpfile1.name)
+                     assump=assumpfile1.name,
+                     outdir=str(tmp_path))
     assert not tcio.errmsg
     tcio.init(input_data=pd.read_csv(StringIO(RAWINPUT)),
               tax_year=taxyear,
@@ -0,0 +1,70 @@
+"""
+Test vectorize.py module.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle test_vectorize.py
+# pylint --disable=locally-disabled test_vectorize.py
+
+import math
+import numpy as np
+import pytest
+from taxcalc.decorators import JIT
+from taxcalc.vectorize import vectorize
+
+
+@JIT(nopython=True)
+def helper_func(income, rate):
+    """Function docstring"""
+    return rate * max(0., income - 10.)
+
+
+def branchy_func(MARS, income, credit, rate, thd, flag):
+    """Function docstring"""
+    # pylint: disable=invalid-name,too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    base = income - thd[MARS - 1]
+    if base > 0. and flag:
+        credit = min(base, 5.) + helper_func(income, rate)
+    elif MARS in (1, 4):
+        credit = int(income > 2.)
+        extra = math.ceil(income / 3.)
+        credit += extra
+    else:
+        credit = round(max(0., -base) / 3., 2)
+    tax = credit if credit > 1. else -1.
+    return (credit, tax)
+
+
+def early_return_func(income, rate):
+    """Function docstring"""
+    if income > 10.:
+        return rate * (income - 10.)
+    return 0.
+
+
+def test_vectorize():
+    """Test docstring"""
+    mars = np.array([1, 2, 3, 4, 2, 1, 3], dtype=np.int32)
+    income = np.array([0., 1., 3.5, 7., 12., 20., 40.])
+    thd = np.array([10., 20., 5., 3., 15.])
+    vfunc = vectorize(branchy_func)
+    for flag in [True, False]:
+        vcredit, vtax = vfunc(mars, income, np.zeros(7), 0.5, thd, flag)
+        for idx in range(7):
+            credit, tax = branchy_func(mars[idx], income[idx], 0.,
+                                       0.5, thd, flag)
+            assert vcredit[idx] == credit
+            assert vtax[idx] == tax
+
+
+def test_vectorize_jitted_function():
+    """Test docstring"""
+    vfunc = vectorize(helper_func)
+    income = np.array([5., 15.])
+    assert np.array_equal(vfunc(income, 0.5), [0., 2.5])
+
+
+def test_vectorize_raises_on_early_return():
+    """Test docstring"""
+    with pytest.raises(ValueError):
+        vectorize(early_return_func)
@@ -323,7 +323,6 @@ def create_distribution_table(vdf, groupby, income_measure,
           positive (denoted by a 0-10p row label) values of the
           specified income_measure.
     """
-    # pylint: disable=too-many-statements,too-many-branches
     # nested function that returns calculated column statistics as a DataFrame
     def stat_dataframe(gdf):
         """
@@ -369,61 +368,12 @@ def create_distribution_table(vdf, groupby, income_measure,
     gdf = dframe.groupby('table_row', observed=False, as_index=False)
     dist_table = stat_dataframe(gdf)
     del dframe['table_row']
-    # compute sum row
-    sum_row = get_sums(dist_table)[dist_table.columns]
-    # handle placement of sum_row in table
-    if groupby == 'weighted_deciles':
-        # compute top-decile row
-        lenindex = len(dist_table.index)
-        assert lenindex == 14  # rows should be indexed from 0 to 13
-        topdec_row = get_sums(dist_table[11:lenindex])[dist_table.columns]
-        # move top-decile detail rows to make room for topdec_row and sum_row
-        dist_table = dist_table.reindex(index=range(0, lenindex + 2))
-        dist_table.iloc[15] = dist_table.iloc[13]
-        dist_table.iloc[14] = dist_table.iloc[12]
-        dist_table.iloc[13] = dist_table.iloc[11]
-        dist_table.iloc[12] = sum_row
-        dist_table.iloc[11] = topdec_row
-        del topdec_row
-    else:
-        dist_table.loc["ALL"] = sum_row
-    del sum_row
-    # ensure dist_table columns are in correct order
-    assert dist_table.columns.values.tolist() == DIST_TABLE_COLUMNS
-    # add row names to table if using weighted_deciles or standard_income_bins
-    if groupby == 'weighted_deciles':
-        rownames = DECILE_ROW_NAMES
-    elif groupby == 'standard_income_bins':
-        rownames = STANDARD_ROW_NAMES
-    else:
-        rownames = None
-    if rownames:
-        assert len(dist_table.index) == len(rownames)
-        dist_table.index = rownames
-        del rownames
     # delete intermediate Pandas DataFrame objects
     del gdf
     del dframe
-    # scale table elements
-    if scaling:
-        count_vars = ['count',
-                      'count_StandardDed',
-                      'count_ItemDed',
-                      'count_AMT']
-        for col in dist_table.columns:
-            # if col in count_vars:
-            #     dist_table[col] = np.round(dist_table[col] * 1e-6, 2)
-            # else:
-            #     dist_table[col] = np.round(dist_table[col] * 1e-9, 3)
-            if col in count_vars:
-                dist_table[col] *= 1e-6
-                dist_table.round({col: 2})
-            else:
-                dist_table[col] *= 1e-9
-                dist_table.round({col: 3})
-    # return table as Pandas DataFrame
     vdf.sort_index(inplace=True)
-    return dist_table
+    # return table as Pandas DataFrame
+    return create_distribution_table_from_sums(dist_table, groupby, scaling)
 
 
 def create_difference_table(vdf1, vdf2, groupby, tax_to_diff,
@@ -470,7 +420,6 @@ def create_difference_table(vdf1, vdf2, groupby, tax_to_diff,
           positive (denoted by a 0-10p row label) values of the
           specified income_measure.
     """
-    # pylint: disable=too-many-statements,too-many-locals,too-many-branches
     # nested function that creates dataframe containing additive statistics
     def additive_stats_dataframe(gdf):
         """
@@ -562,6 +511,116 @@ def create_difference_table(vdf1, vdf2, groupby, tax_to_diff,
     gdf = dframe.groupby('table_row', as_index=False, observed=False)
     # create additive difference table statistics from gdf
     diff_table = additive_stats_dataframe(gdf)
+    # delete intermediate Pandas DataFrame objects
+    del gdf
+    del dframe
+    return create_difference_table_from_sums(diff_table, groupby)
+
+
+def create_distribution_table_from_sums(sums, groupby, scaling=True):
+    """
+    Return the distribution table that is returned by the
+    create_distribution_table function given the sums of each of its
+    table rows before the summary rows are added.
+
+    Parameters
+    ----------
+    sums : Pandas DataFrame with DIST_TABLE_COLUMNS and one row for each
+        groupby bin in ascending order (14 rows for 'weighted_deciles'
+        because the bottom and top deciles are each split into three bins)
+        containing the weighted sums of the filing units in the bin, except
+        that the count columns contain unweighted sums of weighted counts
+
+    groupby : String object
+        options for input: 'weighted_deciles' or
+                           'standard_income_bins' or 'soi_agi_bins'
+
+    scaling : boolean
+        specifies whether or not table entry values are scaled
+
+    Returns
+    -------
+    distribution table as a Pandas DataFrame with DIST_TABLE_COLUMNS and
+    groupby rows (see create_distribution_table function).
+    """
+    dist_table = sums.reset_index(drop=True)
+    # compute sum row
+    sum_row = get_sums(dist_table)[dist_table.columns]
+    # handle placement of sum_row in table
+    if groupby == 'weighted_deciles':
+        # compute top-decile row
+        lenindex = len(dist_table.index)
+        assert lenindex == 14  # rows should be indexed from 0 to 13
+        topdec_row = get_sums(dist_table[11:lenindex])[dist_table.columns]
+        # move top-decile detail rows to make room for topdec_row and sum_row
+        dist_table = dist_table.reindex(index=range(0, lenindex + 2))
+        dist_table.iloc[15] = dist_table.iloc[13]
+        dist_table.iloc[14] = dist_table.iloc[12]
+        dist_table.iloc[13] = dist_table.iloc[11]
+        dist_table.iloc[12] = sum_row
+        dist_table.iloc[11] = topdec_row
+        del topdec_row
+    else:
+        dist_table.loc["ALL"] = sum_row
+    del sum_row
+    # ensure dist_table columns are in correct order
+    assert dist_table.columns.values.tolist() == DIST_TABLE_COLUMNS
+    # add row names to table if using weighted_deciles or standard_income_bins
+    if groupby == 'weighted_deciles':
+        rownames = DECILE_ROW_NAMES
+    elif groupby == 'standard_income_bins':
+        rownames = STANDARD_ROW_NAMES
+    else:
+        rownames = None
+    if rownames:
+        assert len(dist_table.index) == len(rownames)
+        dist_table.index = rownames
+        del rownames
+    # scale table elements
+    if scaling:
+        count_vars = ['count',
+                      'count_StandardDed',
+                      'count_ItemDed',
+                      'count_AMT']
+        for col in dist_table.columns:
+            # if col in count_vars:
+            #     dist_table[col] = np.round(dist_table[col] * 1e-6, 2)
+            # else:
+            #     dist_table[col] = np.round(dist_table[col] * 1e-9, 3)
+            if col in count_vars:
+                dist_table[col] *= 1e-6
+                dist_table.round({col: 2})
+            else:
+                dist_table[col] *= 1e-9
+                dist_table.round({col: 3})
+    return dist_table
+
+
+def create_difference_table_from_sums(sums, groupby):
+    """
+    Return the difference table that is returned by the
+    create_difference_table function given the additive statistics of each
+    of its table rows before the summary rows are added.
+
+    Parameters
+    ----------
+    sums : Pandas DataFrame with one row for each groupby bin in ascending
+        order (14 rows for 'weighted_deciles' because the bottom and top
+        deciles are each split into three bins) and these columns:
+        count, tax_cut, tax_inc, tot_change, ubi, benefit_cost_total,
+        benefit_value_total, atinc1, and atinc2 (which are the weighted
+        baseline and reform aftertax_income)
+
+    groupby : String object
+        options for input: 'weighted_deciles' or
+                           'standard_income_bins' or 'soi_agi_bins'
+
+    Returns
+    -------
+    difference table as a Pandas DataFrame with DIFF_TABLE_COLUMNS and
+    groupby rows (see create_difference_table function).
+    """
+    diff_table = sums.reset_index(drop=True)
     # calculate additive statistics on sums row
     sum_row = get_sums(diff_table)[diff_table.columns]
     # handle placement of sum_row in table
@@ -580,9 +639,6 @@ def create_difference_table(vdf1, vdf2, groupby, tax_to_diff,
         del topdec_row
     else:
         diff_table.loc["ALL"] = sum_row
-    # delete intermediate Pandas DataFrame objects
-    del gdf
-    del dframe
     # compute non-additive stats in each table cell
     count = diff_table['count'].values
     diff_table['perc_cut'] = np.divide(
@@ -0,0 +1,379 @@
+"""
+Translate the calc-style functions in the calcfunctions.py module, which do
+the calculations for one filing unit, into vectorized functions that do the
+same calculations for all the filing units at once using NumPy operations on
+whole arrays, which is much faster than looping over the filing units when
+the numba package cannot be used.
+
+Each if statement is translated into boolean masks of the filing units for
+which its condition is (is not) true and each assignment in the body of the
+if statement assigns the new value only for the filing units in the mask
+(using numpy.where), so the vectorized function computes the same values as
+the calc-style function does for each filing unit.
+"""
+# CODING-STYLE CHECKS:
+# pycodestyle vectorize.py
+# pylint --disable=locally-disabled vectorize.py
+
+import ast
+import math
+import inspect
+import textwrap
+import functools
+import numpy as np
+
+
+def _minimum(*args):
+    """
+    Vectorized version of the min builtin function.
+    """
+    return functools.reduce(np.minimum, args)
+
+
+def _maximum(*args):
+    """
+    Vectorized version of the max builtin function.
+    """
+    return functools.reduce(np.maximum, args)
+
+
+def _and(*args):
+    """
+    Vectorized version of the and operator.
+    """
+    return functools.reduce(np.logical_and, args)
+
+
+def _or(*args):
+    """
+    Vectorized version of the or operator.
+    """
+    return functools.reduce(np.logical_or, args)
+
+
+def _int(value):
+    """
+    Vectorized version of the int builtin function, which truncates toward
+    zero like int does.
+    """
+    if isinstance(value, np.ndarray):
+        return value.astype(np.int64)
+    return int(value)
+
+
+def _round(value, ndigits=0):
+    """
+    Vectorized version of the round builtin function.
+    """
+    return np.round(value, ndigits)
+
+
+def _any(mask):
+    """
+    Return True when any filing unit is in the mask.
+    """
+    return bool(np.any(mask))
+
+
+# Names of the functions that replace the builtin and math functions called
+# in calc-style functions
+BUILTIN_REPLACEMENTS = {
+    'min': '_minimum',
+    'max': '_maximum',
+    'int': '_int',
+    'round': '_round',
+    'abs': '_abs',
+    'math.ceil': '_ceil',
+    'math.floor': '_floor',
+}
+
+HELPERS = {
+    '_minimum': _minimum,
+    '_maximum': _maximum,
+    '_and': _and,
+    '_or': _or,
+    '_not': np.logical_not,
+    '_int': _int,
+    '_round': _round,
+    '_abs': np.abs,
+    '_ceil': np.ceil,
+    '_floor': np.floor,
+    '_isin': np.isin,
+    '_where': np.where,
+    '_any': _any,
+}
+
+
+def original_function(func):
+    """
+    Return the Python function that func wraps, which is func itself when
+    func is not a numba dispatcher or the result of another decorator.
+    """
+    func = getattr(func, 'py_func', func)
+    return inspect.unwrap(func)
+
+
+class _ExpressionTranslator(ast.NodeTransformer):
+    """
+    A NodeTransformer that translates an expression that uses scalar values
+    into an expression that uses arrays of values.
+    """
+    def __init__(self, funcglobals, called):
+        self.funcglobals = funcglobals
+        self.called = called
+
+    @staticmethod
+    def _call(name, args):
+        """
+        Return Call node that calls the function with the specified name.
+        """
+        return ast.Call(func=ast.Name(id=name, ctx=ast.Load()),
+                        args=args, keywords=[])
+
+    def visit_Call(self, node):  # pylint: disable=invalid-name
+        """
+        visit_Call is used by NodeTransformer.visit method.
+        """
+        self.generic_visit(node)
+        func_name = ast.unparse(node.func)
+        if func_name in BUILTIN_REPLACEMENTS:
+            node.func = ast.Name(id=BUILTIN_REPLACEMENTS[func_name],
+                                 ctx=ast.Load())
+            return node
+        func = self.funcglobals.get(func_name)
+        if not isinstance(node.func, ast.Name) or func is None:
+            raise ValueError(f'cannot vectorize call of {func_name}')
+        if inspect.isfunction(original_function(func)):
+            self.called[func_name] = func
+            node.func = ast.Name(id='_vec_' + func_name, ctx=ast.Load())
+        # other callables, such as numpy dtypes, apply to arrays as is
+        return node
+
+    def visit_BoolOp(self, node):  # pylint: disable=invalid-name
+        """
+        visit_BoolOp is used by NodeTransformer.visit method.
+        """
+        self.generic_visit(node)
+        name = '_and' if isinstance(node.op, ast.And) else '_or'
+        return self._call(name, node.values)
+
+    def visit_UnaryOp(self, node):  # pylint: disable=invalid-name
+        """
+        visit_UnaryOp is used by NodeTransformer.visit method.
+        """
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return self._call('_not', [node.operand])
+        return node
+
+    def visit_Compare(self, node):  # pylint: disable=invalid-name
+        """
+        visit_Compare is used by NodeTransformer.visit method.
+        """
+        self.generic_visit(node)
+        comparisons = []
+        left = node.left
+        for oper, right in zip(node.ops, node.comparators):
+            if isinstance(oper, (ast.In, ast.NotIn)):
+                comparison = self._call('_isin', [left, right])
+                if isinstance(oper, ast.NotIn):
+                    comparison = self._call('_not', [comparison])
+            else:
+                comparison = ast.Compare(left=left, ops=[oper],
+                                         comparators=[right])
+            comparisons.append(comparison)
+            left = right
+        if len(comparisons) == 1:
+            return comparisons[0]
+        return self._call('_and', comparisons)
+
+    def visit_IfExp(self, node):  # pylint: disable=invalid-name
+        """
+        visit_IfExp is used by NodeTransformer.visit method.
+        """
+        self.generic_visit(node)
+        return self._call('_where', [node.test, node.body, node.orelse])
+
+
+def _assigned_names(stmts):
+    """
+    Return list of the names assigned a value in the specified statements.
+    """
+    names = []
+    for stmt in stmts:
+        for node in ast.walk(stmt):
+            if (isinstance(node, ast.Name) and
+                    isinstance(node.ctx, ast.Store) and
+                    node.id not in names):
+                names.append(node.id)
+    return names
+
+
+class _FunctionTranslator():
+    """
+    Translator of the body of a calc-style function into the lines of the
+    body of the vectorized function.
+    """
+    def __init__(self, funcglobals):
+        self.funcglobals = funcglobals
+        self.called = {}
+        self.lines = []
+        self.num_masks = 0
+
+    def expression(self, node):
+        """
+        Return source code of the vectorized version of the expression.
+        """
+        translator = _ExpressionTranslator(self.funcglobals, self.called)
+        return ast.unparse(translator.visit(node))
+
+    def assign(self, name, value, mask, indent):
+        """
+        Add line that assigns value to name for the filing units in mask.
+        """
+        if mask is None:
+            self.lines.append(f'{indent}{name} = {value}')
+        else:
+            self.lines.append(
+                f'{indent}{name} = _where({mask}, {value}, {name})'
+            )
+
+    def assign_target(self, target, value, mask, indent):
+        """
+        Add lines that assign value to the target, which is a name or a
+        tuple of names.
+        """
+        if isinstance(target, ast.Name):
+            self.assign(target.id, value, mask, indent)
+        elif isinstance(target, ast.Tuple):
+            self.num_masks += 1
+            values = f'_v{self.num_masks}'
+            self.lines.append(f'{indent}{values} = {value}')
+            for idx, elt in enumerate(target.elts):
+                self.assign_target(elt, f'{values}[{idx}]', mask, indent)
+        else:
+            raise ValueError(
+                f'cannot vectorize assignment to {ast.unparse(target)}'
+            )
+
+    def statements(self, stmts, mask, defined, indent):
+        """
+        Add lines that execute the statements for the filing units in mask,
+        where mask is None for all filing units, and where defined is the
+        set of names that have been assigned a value for all filing units.
+        """
+        for stmt in stmts:
+            if isinstance(stmt, ast.Assign):
+                value = self.expression(stmt.value)
+                for target in stmt.targets:
+                    self.assign_target(target, value, mask, indent)
+            elif isinstance(stmt, ast.AugAssign):
+                value = self.expression(
+                    ast.BinOp(left=ast.Name(id=stmt.target.id,
+                                            ctx=ast.Load()),
+                              op=stmt.op, right=stmt.value)
+                )
+                self.assign(stmt.target.id, value, mask, indent)
+            elif isinstance(stmt, ast.If):
+                self.if_statement(stmt, mask, defined, indent)
+            elif isinstance(stmt, ast.Return) and mask is None:
+                self.lines.append(
+                    f'{indent}return {self.expression(stmt.value)}'
+                )
+            elif isinstance(stmt, ast.Pass) or (
+                    isinstance(stmt, ast.Expr) and
+                    isinstance(stmt.value, ast.Constant)):
+                continue  # docstring
+            else:
+                raise ValueError(
+                    f'cannot vectorize statement at line {stmt.lineno}'
+                )
+            if mask is None:
+                defined.update(_assigned_names([stmt]))
+
+    def if_statement(self, stmt, mask, defined, indent):
+        """
+        Add lines that execute the if statement for the filing units in
+        mask, which skip each branch when no filing unit takes it.
+        """
+        # names first assigned in a branch are zero for the filing units
+        # that do not take the branch
+        for name in _assigned_names([stmt]):
+            if name not in defined:
+                self.lines.append(f'{indent}{name} = 0')
+                defined.add(name)
+        self.num_masks += 1
+        cond = f'_c{self.num_masks}'
+        self.lines.append(f'{indent}{cond} = {self.expression(stmt.test)}')
+        for branch, branch_cond, stmts in [('t', cond, stmt.body),
+                                           ('f', f'_not({cond})',
+                                            stmt.orelse)]:
+            if not stmts:
+                continue
+            branch_mask = f'_m{self.num_masks}{branch}'
+            if mask is None:
+                self.lines.append(f'{indent}{branch_mask} = {branch_cond}')
+            else:
+                self.lines.append(
+                    f'{indent}{branch_mask} = _and({mask}, {branch_cond})'
+                )
+            self.lines.append(f'{indent}if _any({branch_mask}):')
+            self.statements(stmts, branch_mask, defined, indent + '    ')
+
+
+def vectorized_source(funcdef, funcglobals):
+    """
+    Return (source, called) tuple for the vectorized version of the function
+    defined by the funcdef node, where called is a dictionary of the
+    functions called by it indexed by name.
+    """
+    translator = _FunctionTranslator(funcglobals)
+    args = [arg.arg for arg in funcdef.args.args]
+    translator.statements(funcdef.body, None, set(args), '    ')
+    lines = [f'def {funcdef.name}({", ".join(args)}):'] + translator.lines
+    return '\n'.join(lines) + '\n', translator.called
+
+
+def vectorize_source(func_str, funcglobals):
+    """
+    Return vectorized version of the calc-style function that is defined by
+    the code in the func_str string and that has the funcglobals dictionary
+    as its global variables.
+
+    Raises
+    ------
+    ValueError:
+        if the function contains a statement or a function call that cannot
+        be vectorized.
+    """
+    funcdef = ast.parse(textwrap.dedent(func_str)).body[0]
+    source, called = vectorized_source(funcdef, funcglobals)
+    vecglobals = dict(funcglobals)
+    vecglobals.update(HELPERS)
+    vecglobals['math'] = math
+    for name, func in called.items():
+        vecglobals['_vec_' + name] = vectorize(func)
+    localvars = {}
+    exec(compile(source, '<vectorized>', 'exec'),  # pylint: disable=exec-used
+         vecglobals, localvars)
+    vfunc = localvars[funcdef.name]
+    vfunc.vectorized_source = source
+    return vfunc
+
+
+@functools.lru_cache(maxsize=None)
+def vectorize(func):
+    """
+    Return vectorized version of the specified calc-style function (or of
+    the function wrapped by the specified numba dispatcher), which returns
+    the same values as func does for each filing unit when called with
+    arrays of filing-unit values and with the same parameter values.
+
+    Raises
+    ------
+    ValueError:
+        if the function contains a statement or a function call that cannot
+        be vectorized.
+    """
+    func = original_function(func)
+    return vectorize_source(inspect.getsource(func), func.__globals__)